@@ -0,0 +1,63 @@
+from datetime import datetime, timezone
+from typing import List, Dict, Optional
+
+
+def publication_day(published_date: Optional[str]) -> Optional[str]:
+    """UTC calendar day (YYYY-MM-DD) of an ISO publication date, if parseable."""
+    if not published_date:
+        return None
+    try:
+        parsed = datetime.fromisoformat(published_date.replace('Z', '+00:00'))
+    except (ValueError, TypeError, AttributeError):
+        return None
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc)
+    return parsed.date().isoformat()
+
+
+class Aggregates:
+    """Running counts of articles by source, category, publication day and tag."""
+
+    def __init__(self):
+        self.total = 0
+        self.by_source = {}
+        self.by_category = {}
+        self.by_day = {}
+        self.by_tag = {}
+        self.categories = set()
+
+    def add(self, article: Dict):
+        self.total += 1
+        source = article.get('source') or 'Unknown'
+        self.by_source[source] = self.by_source.get(source, 0) + 1
+
+        if article.get('category'):
+            self.categories.add(article['category'])
+        category = article.get('category') or 'Unknown'
+        self.by_category[category] = self.by_category.get(category, 0) + 1
+
+        day = publication_day(article.get('published_date'))
+        if day:
+            self.by_day[day] = self.by_day.get(day, 0) + 1
+
+        for tag in set(t.lower() for t in (article.get('tags') or []) if isinstance(t, str)):
+            self.by_tag[tag] = self.by_tag.get(tag, 0) + 1
+
+    def result(self) -> Dict:
+        return {
+            'total_articles': self.total,
+            'categories': sorted(self.categories),
+            'by_source': self.by_source,
+            'by_category': self.by_category,
+            'by_day': dict(sorted(self.by_day.items())),
+            # Most used tags first
+            'by_tag': dict(sorted(self.by_tag.items(), key=lambda item: (-item[1], item[0])))
+        }
+
+
+def compute_aggregates(articles: List[Dict]) -> Dict:
+    """Count articles by source, category, publication day and tag."""
+    aggregates = Aggregates()
+    for article in articles:
+        aggregates.add(article)
+    return aggregates.result()
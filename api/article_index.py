@@ -0,0 +1,350 @@
+import os
+import json
+import time
+import heapq
+import base64
+import threading
+from bisect import bisect_left, bisect_right
+from collections import Counter, OrderedDict
+from itertools import chain
+from datetime import datetime, timezone
+
+# Dimensions articles can be filtered and faceted on (day is the UTC publication day)
+FACETS = ('source', 'category', 'tag', 'day')
+
+# Facet values returned per dimension, most frequent first
+FACET_LIMIT = 20
+
+# Dimensions an article can have several values of
+MULTI_VALUED = ('tag',)
+
+# Facets are counted with one bitset AND per value only while that is cheaper
+# than reading each selected article's values (word operations per position)
+BITMAP_FACET_COST = 8
+
+# Bit positions set in each byte value, for decoding bitmaps
+_BYTE_BITS = [tuple(bit for bit in range(8) if value >> bit & 1) for value in range(256)]
+
+
+if hasattr(int, 'bit_count'):  # Python 3.10+
+    _popcount = int.bit_count
+else:
+    def _popcount(bits):
+        return bin(bits).count('1')
+
+
+def bitmap_of(positions, size):
+    """Big-int bitset with the given positions set"""
+    data = bytearray((size + 7) // 8)
+    for position in positions:
+        data[position >> 3] |= 1 << (position & 7)
+    return int.from_bytes(data, 'little')
+
+
+def positions_of(bits, limit=None):
+    """Set positions of a big-int bitset, ascending (only the first limit if given)"""
+    data = bits.to_bytes((bits.bit_length() + 7) // 8, 'little')
+    positions = []
+    for index, value in enumerate(data):
+        if value:
+            base = index << 3
+            positions.extend([base + bit for bit in _BYTE_BITS[value]])
+            if limit is not None and len(positions) >= limit:
+                break
+    return positions
+
+
+class Selection:
+    """
+    Read-only sequence of the positions set in a bitset, in ascending order
+    Its length is a popcount and slices only decode as far as they reach,
+    so a page of an intersection never decodes the rest of it
+    """
+
+    def __init__(self, bits):
+        self.bits = bits
+        self._count = None
+        self._positions = None
+
+    def __len__(self):
+        if self._count is None:
+            self._count = _popcount(self.bits)
+        return self._count
+
+    def _decoded(self, stop=None):
+        if self._positions is not None:
+            return self._positions
+        if stop is None or stop >= len(self):
+            self._positions = positions_of(self.bits)
+            return self._positions
+        return positions_of(self.bits, stop)
+
+    def __iter__(self):
+        return iter(self._decoded())
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(len(self))
+            return self._decoded(stop if step > 0 else None)[start:stop:step]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("selection index out of range")
+        return self._decoded(index + 1)[index]
+
+
+def parse_timestamp(value):
+    """
+    Parse an ISO 8601 date into epoch seconds
+    Naive dates are treated as UTC. Returns None if the value can't be parsed
+    """
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except (ValueError, TypeError, AttributeError):
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
+
+
+def encode_cursor(key, version):
+    """Encode a feed sort key and snapshot version as an opaque cursor"""
+    sort_value = None if key[0] == float('inf') else key[0]
+    raw = json.dumps([sort_value, key[1], version], separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    """
+    Decode a cursor into (sort key, snapshot version)
+    Raises ValueError if the cursor is malformed
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        sort_value, url, version = json.loads(raw.decode('utf-8'))
+    except Exception:
+        raise ValueError("Invalid cursor")
+    if sort_value is None:
+        sort_value = float('inf')
+    if not isinstance(sort_value, (int, float)) or not isinstance(url, str):
+        raise ValueError("Invalid cursor")
+    return (sort_value, url), version
+
+
+class BitmapCache:
+    """
+    Bounded LRU of value bitsets, by their total size in bytes
+    Each bitset takes size/8 bytes, so caching one per tag or day would
+    otherwise grow with the vocabulary rather than with the traffic
+    """
+
+    def __init__(self, max_bytes=None):
+        if max_bytes is None:
+            max_bytes = int(os.getenv('INDEX_BITMAP_CACHE_BYTES', str(32 * 1024 * 1024)))
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def get(self, key, build):
+        with self._lock:
+            bits = self._entries.get(key)
+            if bits is not None:
+                self._entries.move_to_end(key)
+                return bits
+        bits = build()
+        nbytes = (bits.bit_length() + 7) // 8
+        with self._lock:
+            if key not in self._entries and nbytes <= self.max_bytes:
+                self._entries[key] = bits
+                self._size += nbytes
+                while self._size > self.max_bytes:
+                    _, evicted = self._entries.popitem(last=False)
+                    self._size -= (evicted.bit_length() + 7) // 8
+        return bits
+
+
+class ArticleIndex:
+    """
+    Secondary indexes over a snapshot's articles
+    Positions refer to the snapshot's article list, so results can be
+    returned in file order without copying the articles themselves
+    """
+
+    def __init__(self, articles):
+        self.size = len(articles)
+        self.epochs = []
+        # dimension -> lowercased value -> positions (ascending), and the value as first seen
+        self.postings = {dimension: {} for dimension in FACETS}
+        self.labels = {dimension: {} for dimension in FACETS}
+        # dimension -> each position's lowercased value (None if missing), or tuple of values
+        self.values = {}
+        # (dimension, value) -> big-int bitset of its positions, built on first use
+        self._bitmaps = BitmapCache()
+
+        for position, article in enumerate(articles):
+            epoch = parse_timestamp(article.get('published_date'))
+            self.epochs.append(epoch)
+            tags = article.get('tags') or []
+            values = (
+                ('source', [article.get('source')]),
+                ('category', [article.get('category')]),
+                ('tag', tags if isinstance(tags, (list, tuple)) else []),
+                ('day', [time.strftime('%Y-%m-%d', time.gmtime(epoch))] if epoch is not None else [])
+            )
+            for dimension, dimension_values in values:
+                postings = self.postings[dimension]
+                labels = self.labels[dimension]
+                for value in dimension_values:
+                    if not value or not isinstance(value, str):
+                        continue
+                    key = value.lower()
+                    posting = postings.get(key)
+                    if posting is None:
+                        postings[key] = [position]
+                        labels[key] = value
+                    elif posting[-1] != position:
+                        posting.append(position)
+
+        # The same values per position, sharing the postings' keys
+        for dimension in FACETS:
+            if dimension in MULTI_VALUED:
+                values = [() for _ in range(self.size)]
+                for key, posting in self.postings[dimension].items():
+                    key = (key,)
+                    for position in posting:
+                        values[position] += key
+            else:
+                values = [None] * self.size
+                for key, posting in self.postings[dimension].items():
+                    for position in posting:
+                        values[position] = key
+            self.values[dimension] = values
+
+        # Dated articles sorted by publication time, for bisect range queries
+        self.date_order = sorted(
+            (p for p in range(self.size) if self.epochs[p] is not None),
+            key=lambda p: self.epochs[p]
+        )
+        self.date_epochs = [self.epochs[p] for p in self.date_order]
+
+        # Feed order: newest first, ties broken by URL, undated articles last
+        keys = [
+            (-epoch if epoch is not None else float('inf'), article.get('url') or '')
+            for epoch, article in zip(self.epochs, articles)
+        ]
+        self.feed_order = sorted(range(self.size), key=keys.__getitem__)
+        self.feed_keys = [keys[p] for p in self.feed_order]
+        self.feed_rank = [0] * self.size
+        for rank, position in enumerate(self.feed_order):
+            self.feed_rank[position] = rank
+
+    def to_state(self):
+        """The index as builtin containers only, without its bitset cache"""
+        return {name: value for name, value in vars(self).items() if name != '_bitmaps'}
+
+    @classmethod
+    def from_state(cls, state):
+        index = cls.__new__(cls)
+        index.__dict__.update(state)
+        index._bitmaps = BitmapCache()
+        return index
+
+    def bitmap(self, dimension, key):
+        """Bitset of the articles whose dimension has the (lowercased) value key"""
+        return self._bitmaps.get(
+            (dimension, key),
+            lambda: bitmap_of(self.postings[dimension].get(key, ()), self.size)
+        )
+
+    def select(self, source=None, category=None, tag=None, day=None, date_from=None, date_to=None):
+        """
+        Positions matching every given filter, in file order
+        Returns None when no filter is given (i.e. every article matches)
+        """
+        keys = []
+        for dimension, value in (('source', source), ('category', category), ('tag', tag), ('day', day)):
+            if value:
+                key = value.lower()
+                if key not in self.postings[dimension]:
+                    return []
+                keys.append((dimension, key))
+        has_dates = date_from is not None or date_to is not None
+        if not keys and not has_dates:
+            return None
+
+        if not keys:
+            lo = bisect_left(self.date_epochs, date_from) if date_from is not None else 0
+            hi = bisect_right(self.date_epochs, date_to) if date_to is not None else len(self.date_epochs)
+            return sorted(self.date_order[lo:hi])
+
+        # Intersect the value filters with bitwise ANDs
+        if len(keys) == 1:
+            matches = self.postings[keys[0][0]][keys[0][1]]
+        else:
+            bits = self.bitmap(*keys[0])
+            for key in keys[1:]:
+                bits &= self.bitmap(*key)
+            matches = Selection(bits)
+            if not has_dates:
+                return matches
+
+        if has_dates:
+            return [
+                position for position in matches
+                if self.epochs[position] is not None
+                and (date_from is None or self.epochs[position] >= date_from)
+                and (date_to is None or self.epochs[position] <= date_to)
+            ]
+        return list(matches)
+
+    def facet_counts(self, positions, dimensions, limit=FACET_LIMIT):
+        """
+        Count the values of each dimension among positions (None for all articles)
+        Returns {dimension: {value: count}} with the limit most frequent values
+        """
+        facets = {}
+        for dimension in dimensions:
+            postings = self.postings[dimension]
+            if positions is None:
+                counts = ((-len(posting), key) for key, posting in postings.items())
+            elif len(postings) * (self.size >> 6) <= len(positions) * BITMAP_FACET_COST:
+                # Few values over a large selection: one bitset AND per value
+                if isinstance(positions, Selection):
+                    bits = positions.bits
+                else:
+                    bits = bitmap_of(positions, self.size)
+                counts = ((-_popcount(bits & self.bitmap(dimension, key)), key) for key in postings)
+            else:
+                # Otherwise read the values of the selected articles, never touching the others
+                values = map(self.values[dimension].__getitem__, positions)
+                if dimension in MULTI_VALUED:
+                    values = chain.from_iterable(values)
+                counts = ((-count, key) for key, count in Counter(values).items() if key is not None)
+            top = heapq.nsmallest(limit, counts)
+            labels = self.labels[dimension]
+            facets[dimension] = {labels[key]: -count for count, key in top if count}
+        return facets
+
+    def feed_page(self, positions=None, after=None, limit=10):
+        """
+        Seek a page in feed order
+        positions optionally restricts the page to a set of matches and
+        after is the sort key of the last article already returned.
+        Returns (page positions, sort key of the last one or None when done)
+        """
+        start = bisect_right(self.feed_keys, after) if after is not None else 0
+        if positions is None:
+            ranks = range(start, min(start + limit + 1, self.size))
+        else:
+            ranks = sorted(self.feed_rank[p] for p in positions)
+            offset = bisect_left(ranks, start)
+            ranks = ranks[offset:offset + limit + 1]
+
+        # One extra item tells whether another page exists
+        has_more = len(ranks) > limit
+        page = [self.feed_order[r] for r in ranks[:limit]]
+        next_key = self.feed_keys[ranks[limit - 1]] if has_more else None
+        return page, next_key
@@ -0,0 +1,221 @@
+from datetime import datetime
+
+from article import as_dict
+from article_index import FACETS, FACET_LIMIT, parse_timestamp, encode_cursor, decode_cursor
+from projection import SHAPES, Fragment, parse_fields, field_names, project, columns
+
+# Upper bound for per_page in cursor mode
+MAX_CURSOR_PAGE = 100
+
+# Upper bound for facet_limit
+MAX_FACET_LIMIT = 1000
+
+# Smaller projections are cheaper to serialize directly than to build fragments for
+MIN_FRAGMENT_ROWS = 256
+
+
+class ArticleQuery:
+    """
+    Parsed /api/articles query parameters
+    Raises ValueError with a client-facing message for invalid values
+    """
+
+    def __init__(self, args):
+        self.source = args.get('source')
+        self.category = args.get('category')
+        self.search = args.get('search')
+        self.tag = args.get('tag')
+        self.day = args.get('day')
+        if self.day:
+            try:
+                datetime.strptime(self.day, '%Y-%m-%d')
+            except ValueError:
+                raise ValueError("day must be a YYYY-MM-DD date")
+
+        # Parse the date bounds once per request
+        date_from = args.get('date_from')
+        date_to = args.get('date_to')
+        self.date_from = parse_timestamp(date_from)
+        self.date_to = parse_timestamp(date_to)
+        if (date_from and self.date_from is None) or (date_to and self.date_to is None):
+            raise ValueError("date_from and date_to must be ISO 8601 dates")
+
+        self.page = args.get('page', type=int)
+        self.per_page = args.get('per_page', type=int, default=10)
+        self.limit = args.get('limit', type=int)
+
+        # An empty cursor asks for the first page in feed order
+        self.cursor = args.get('cursor')
+        self.after = None
+        self.cursor_version = None
+        if self.cursor:
+            self.after, self.cursor_version = decode_cursor(self.cursor)
+        if self.cursor is not None:
+            self.per_page = max(1, min(self.per_page, MAX_CURSOR_PAGE))
+
+        # Projection to a subset of fields, and rows (objects) or columns (arrays per field)
+        self.fields = parse_fields(args.get('fields'))
+        self.shape = args.get('shape', 'rows')
+        if self.shape not in SHAPES:
+            raise ValueError("shape must be 'rows' or 'columns'")
+
+        # Value counts per dimension for the whole filtered result
+        facets = args.get('facets')
+        self.facets = None
+        if facets is not None:
+            self.facets = [name.strip() for name in facets.split(',') if name.strip()] or list(FACETS)
+            if not all(name in FACETS for name in self.facets):
+                raise ValueError(f"facets must be a comma-separated list of: {', '.join(FACETS)}")
+        self.facet_limit = max(1, min(args.get('facet_limit', type=int, default=FACET_LIMIT), MAX_FACET_LIMIT))
+
+    @property
+    def projected(self):
+        return self.fields is not None or self.shape != 'rows'
+
+
+def _shape_articles(query, articles):
+    """The page of articles as the response's articles list or columns object"""
+    if not query.projected:
+        return {"articles": [as_dict(article) for article in articles]}
+    fields = query.fields or field_names(articles)
+    if query.shape == 'columns':
+        return {"columns": columns(articles, fields)}
+    return {"articles": project(articles, fields)}
+
+
+def _shape_positions(snapshot, query, positions):
+    """Like _shape_articles, joined from the snapshot's serialized field fragments for large results"""
+    if not query.projected or Fragment is None or len(positions) < MIN_FRAGMENT_ROWS:
+        return _shape_articles(query, [snapshot.articles[p] for p in positions])
+    fields = query.fields or snapshot.field_names
+    if query.shape == 'columns':
+        return {"columns": snapshot.fragments.columns(positions, fields)}
+    return {"articles": snapshot.fragments.rows(positions, fields)}
+
+
+def _cursor_page(snapshot, query, rows, next_key, total):
+    return dict(rows, pagination={
+        "per_page": query.per_page,
+        "total": total,
+        "next_cursor": encode_cursor(next_key, snapshot.version) if next_key else None,
+        "has_more": next_key is not None,
+        "snapshot_changed": query.cursor_version is not None and query.cursor_version != snapshot.version
+    })
+
+
+def _numbered_page(query, rows, total):
+    return dict(rows, pagination={
+        "page": query.page,
+        "per_page": query.per_page,
+        "total": total,
+        "total_pages": (total + query.per_page - 1) // query.per_page
+    })
+
+
+def _matching_positions(snapshot, query):
+    """Positions matching a query's filters, or None for all articles"""
+    # Filter by source, category and date using the snapshot's indexes
+    positions = snapshot.index.select(
+        source=query.source,
+        category=query.category,
+        tag=query.tag,
+        day=query.day,
+        date_from=query.date_from,
+        date_to=query.date_to
+    )
+
+    # Full-text search over title, description and tags, ranked by relevance
+    if query.search:
+        positions = snapshot.search_index.search(
+            query.search,
+            allowed=None if positions is None else set(positions)
+        )
+    return positions
+
+
+def query_indexes(snapshot, query):
+    """Answer a query from an in-memory snapshot's indexes"""
+    positions = _matching_positions(snapshot, query)
+    data = _page_positions(snapshot, query, positions)
+    if query.facets:
+        # Counted with bitset intersections over the whole filtered result, not just the page
+        data["facets"] = snapshot.index.facet_counts(positions, query.facets, query.facet_limit)
+    return data
+
+
+def _page_positions(snapshot, query, positions):
+    # Cursor pagination: seek past the last returned article in feed order
+    if query.cursor is not None:
+        page_positions, next_key = snapshot.index.feed_page(positions, query.after, query.per_page)
+        total = snapshot.index.size if positions is None else len(positions)
+        return _cursor_page(snapshot, query, _shape_positions(snapshot, query, page_positions), next_key, total)
+
+    if positions is None:
+        positions = range(snapshot.index.size)
+    total = len(positions)
+
+    if query.page and query.per_page:
+        start = (query.page - 1) * query.per_page
+        return _numbered_page(query, _shape_positions(snapshot, query, positions[start:start + query.per_page]), total)
+    elif query.limit:
+        positions = positions[:query.limit]
+
+    return dict(_shape_positions(snapshot, query, positions), total=total)
+
+
+def iter_indexes(snapshot, query):
+    """Every article matching a query's filters (by relevance when searching, else in file order)"""
+    positions = _matching_positions(snapshot, query)
+    if positions is None:
+        return iter(snapshot.articles)
+    return (snapshot.articles[p] for p in positions)
+
+
+def _storage_filters(query):
+    return dict(
+        source=query.source,
+        category=query.category,
+        tag=query.tag,
+        day=query.day,
+        search=query.search,
+        date_from=query.date_from,
+        date_to=query.date_to
+    )
+
+
+def iter_storage(snapshot, query):
+    """Every article matching a query's filters, read from the database row by row"""
+    return snapshot.storage.iter_query(**_storage_filters(query))
+
+
+def query_storage(snapshot, query):
+    """Answer a query with SQL against a database snapshot's storage"""
+    filters = _storage_filters(query)
+    data = _page_storage(snapshot, query, filters)
+    if query.facets:
+        data["facets"] = snapshot.storage.facet_counts(query.facets, query.facet_limit, **filters)
+    return data
+
+
+def _page_storage(snapshot, query, filters):
+    if query.cursor is not None:
+        # Fetch one extra row to know whether another page exists
+        articles, total = snapshot.storage.query(
+            feed_order=True, after=query.after, limit=query.per_page + 1, **filters
+        )
+        next_key = None
+        if len(articles) > query.per_page:
+            articles = articles[:query.per_page]
+            last = articles[-1]
+            epoch = parse_timestamp(last.get('published_date'))
+            next_key = (-epoch if epoch is not None else float('inf'), last.get('url') or '')
+        return _cursor_page(snapshot, query, _shape_articles(query, articles), next_key, total)
+
+    if query.page and query.per_page:
+        articles, total = snapshot.storage.query(
+            limit=query.per_page, offset=(query.page - 1) * query.per_page, **filters
+        )
+        return _numbered_page(query, _shape_articles(query, articles), total)
+
+    articles, total = snapshot.storage.query(limit=query.limit or None, **filters)
+    return dict(_shape_articles(query, articles), total=total)
@@ -0,0 +1,328 @@
+import io
+import os
+import json
+import time
+import pickle
+import hashlib
+import threading
+
+from article_index import ArticleIndex
+from search_index import SearchIndex
+from aggregates import compute_aggregates
+from article import Article, to_articles
+from article_query import query_indexes, query_storage, iter_indexes, iter_storage
+from projection import FieldFragments, field_names
+
+# Bump when the layout of Snapshot.to_state() changes
+PREBUILT_FORMAT = 4
+
+
+def empty_data():
+    """Data returned when the articles file is missing or unreadable"""
+    return {
+        "sources": [],
+        "scraped_at": None,
+        "total_articles": 0,
+        "articles": []
+    }
+
+
+class Snapshot:
+    """One loaded version of the articles file and its indexes. Treat it as read-only."""
+
+    def __init__(self, data, version, modified_at=None):
+        # Compact Article records rather than the parsed dicts
+        self.articles = to_articles(data.get('articles', []))
+        self.data = dict(data, articles=self.articles)
+        self.version = version
+        # File modification time in epoch seconds, if known
+        self.modified_at = modified_at
+        self.loaded_at = time.time()
+        self.index = ArticleIndex(self.articles)
+        self._search_index = SearchIndex(self.articles)
+        self._search_state = None
+        self._fragments = None
+        self._field_names = None
+        # Use the aggregates written by the scraper when they match the articles
+        aggregates = data.get('aggregates')
+        if not isinstance(aggregates, dict) or aggregates.get('total_articles') != len(self.articles):
+            aggregates = compute_aggregates(self.articles)
+        self.aggregates = aggregates
+
+    @property
+    def search_index(self):
+        # A prebuilt snapshot keeps its (large) search index pickled until the first search
+        if self._search_index is None:
+            self._search_index = _restore(SearchIndex, _BuiltinsUnpickler(io.BytesIO(self._search_state)).load())
+            self._search_state = None
+        return self._search_index
+
+    @property
+    def fragments(self):
+        # Per-field serialized values for projected responses, built on first use
+        if self._fragments is None:
+            self._fragments = FieldFragments(self.articles)
+        return self._fragments
+
+    @property
+    def field_names(self):
+        if self._field_names is None:
+            self._field_names = field_names(self.articles)
+        return self._field_names
+
+    def query(self, query):
+        """Answer an ArticleQuery from the in-memory indexes"""
+        return query_indexes(self, query)
+
+    def iter_articles(self, query):
+        """Every article matching an ArticleQuery's filters, unpaged"""
+        return iter_indexes(self, query)
+
+    def urls(self):
+        return {article.get('url') for article in self.articles}
+
+    def to_state(self):
+        """The snapshot as builtin containers only, for the prebuilt file"""
+        return {
+            "data": self.data,
+            "index": self.index.to_state(),
+            "search_index": pickle.dumps(vars(self.search_index), protocol=pickle.HIGHEST_PROTOCOL),
+            "aggregates": self.aggregates
+        }
+
+    @classmethod
+    def from_state(cls, state, version, modified_at=None):
+        """Rebuild a snapshot from to_state() without re-indexing"""
+        snapshot = cls.__new__(cls)
+        snapshot.data = state['data']
+        snapshot.articles = snapshot.data.get('articles', [])
+        snapshot.version = version
+        snapshot.modified_at = modified_at
+        snapshot.loaded_at = time.time()
+        snapshot.index = ArticleIndex.from_state(state['index'])
+        snapshot._search_index = None
+        snapshot._search_state = state['search_index']
+        snapshot._fragments = None
+        snapshot._field_names = None
+        snapshot.aggregates = state['aggregates']
+        return snapshot
+
+
+def _restore(cls, attributes):
+    obj = cls.__new__(cls)
+    obj.__dict__.update(attributes)
+    return obj
+
+
+class _BuiltinsUnpickler(pickle.Unpickler):
+    """Refuses to load anything but builtin containers, scalars and Article records"""
+
+    def find_class(self, module, name):
+        if (module, name) == ('article', 'Article'):
+            return Article
+        raise pickle.UnpicklingError(f"Unexpected {module}.{name} in prebuilt snapshot")
+
+
+def prebuilt_path(json_path):
+    """Where the prebuilt snapshot of an articles file lives"""
+    return os.path.splitext(json_path)[0] + '.snapshot'
+
+
+def build_prebuilt(json_path):
+    """
+    Parse and index an articles file once and store the result next to it
+    The API loads this instead of parsing JSON when the file's SHA-1 matches
+    """
+    with open(json_path, 'rb') as f:
+        raw = f.read()
+    snapshot = Snapshot(json.loads(raw), 'prebuilt')
+    payload = {
+        "format": PREBUILT_FORMAT,
+        "source_sha1": hashlib.sha1(raw).hexdigest(),
+        "state": snapshot.to_state()
+    }
+    path = prebuilt_path(json_path)
+    with open(path + '.tmp', 'wb') as f:
+        pickle.dump(payload, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(path + '.tmp', path)
+    return path
+
+
+class ArticleStore:
+    """
+    Keeps the parsed articles file in memory and reloads it when it changes
+    The file is only re-parsed when its mtime or size differ from the loaded
+    snapshot; readers always get a complete snapshot, never a partial one
+    """
+
+    def __init__(self, path, check_interval=None):
+        self.path = path
+        # Seconds between stat() calls; 0 checks on every request
+        if check_interval is None:
+            check_interval = float(os.getenv('ARTICLES_RELOAD_INTERVAL', '1.0'))
+        self.check_interval = check_interval
+        self._snapshot = None
+        self._signature = None
+        self._last_check = 0.0
+        self._lock = threading.Lock()
+        # Seconds the current snapshot took to load, and snapshots loaded so far
+        self.load_seconds = None
+        self.loads = 0
+
+    def _stat_signature(self):
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def _load_prebuilt(self, raw, version, modified_at):
+        """Snapshot from the prebuilt file if it was built from exactly these bytes"""
+        try:
+            with open(prebuilt_path(self.path), 'rb') as f:
+                payload = _BuiltinsUnpickler(f).load()
+        except (OSError, pickle.UnpicklingError, EOFError, ValueError):
+            return None
+        if payload.get('format') != PREBUILT_FORMAT or payload.get('source_sha1') != hashlib.sha1(raw).hexdigest():
+            return None
+        return Snapshot.from_state(payload['state'], version, modified_at)
+
+    def _load(self, signature):
+        """Parse the file into a new snapshot, or None if it can't be read"""
+        if signature is None:
+            return Snapshot(empty_data(), 'missing')
+        try:
+            with open(self.path, 'rb') as f:
+                raw = f.read()
+        except FileNotFoundError:
+            return Snapshot(empty_data(), 'missing')
+
+        version = f"{signature[0]:x}-{signature[1]:x}"
+        modified_at = signature[0] / 1e9
+        snapshot = self._load_prebuilt(raw, version, modified_at)
+        if snapshot is not None:
+            return snapshot
+
+        try:
+            data = json.loads(raw)
+        except (json.JSONDecodeError, UnicodeDecodeError):
+            # Possibly caught mid-write; keep serving the previous snapshot
+            return None
+        return Snapshot(data, version, modified_at=modified_at)
+
+    def cached(self):
+        """The current snapshot if it was checked recently, else None (get() checks and may reload)"""
+        snapshot = self._snapshot
+        if snapshot is not None and time.monotonic() - self._last_check < self.check_interval:
+            return snapshot
+        return None
+
+    def get(self):
+        """Return the current snapshot, reloading it if the file changed"""
+        snapshot = self._snapshot
+        now = time.monotonic()
+        if snapshot is not None and now - self._last_check < self.check_interval:
+            return snapshot
+
+        # Only one thread reloads; the others keep using the old snapshot
+        if not self._lock.acquire(blocking=snapshot is None):
+            return snapshot
+        try:
+            snapshot = self._snapshot
+            self._last_check = time.monotonic()
+            signature = self._stat_signature()
+            if snapshot is not None and signature == self._signature:
+                return snapshot
+
+            started = time.perf_counter()
+            loaded = self._load(signature)
+            if loaded is None:
+                if snapshot is not None:
+                    return snapshot
+                loaded = Snapshot(empty_data(), 'invalid')
+            self.load_seconds = time.perf_counter() - started
+            self.loads += 1
+            self._signature = signature
+            self._snapshot = loaded
+            return loaded
+        finally:
+            self._lock.release()
+
+
+class DatabaseSnapshot:
+    """One revision of a SQLite article database; queries run against the database"""
+
+    def __init__(self, storage, revision):
+        metadata = storage.metadata()
+        self.storage = storage
+        self.data = {
+            "sources": metadata['sources'],
+            "scraped_at": metadata['scraped_at'],
+            "total_articles": metadata['total_articles']
+        }
+        self.aggregates = metadata['aggregates']
+        self.version = f"db-{revision}"
+        self.modified_at = None
+        self.loaded_at = time.time()
+
+    def query(self, query):
+        """Answer an ArticleQuery with SQL"""
+        return query_storage(self, query)
+
+    def iter_articles(self, query):
+        """Every article matching an ArticleQuery's filters, unpaged"""
+        return iter_storage(self, query)
+
+    def urls(self):
+        return self.storage.urls()
+
+
+class DatabaseStore:
+    """
+    Serves articles from a SQLite database written by the scraper
+    Metadata is cached per database revision; article queries always hit SQLite
+    """
+
+    def __init__(self, path, check_interval=None):
+        # Imported lazily so JSON deployments don't pay for it
+        from storage import SQLiteStorage
+        self.path = path
+        self.storage = SQLiteStorage(path)
+        if check_interval is None:
+            check_interval = float(os.getenv('ARTICLES_RELOAD_INTERVAL', '1.0'))
+        self.check_interval = check_interval
+        self._snapshot = None
+        self._last_check = 0.0
+        self._lock = threading.Lock()
+        self.load_seconds = None
+        self.loads = 0
+
+    def cached(self):
+        """The current snapshot if it was checked recently, else None (get() checks and may refresh)"""
+        snapshot = self._snapshot
+        if snapshot is not None and time.monotonic() - self._last_check < self.check_interval:
+            return snapshot
+        return None
+
+    def get(self):
+        """Return the current snapshot, refreshing it when the revision changed"""
+        snapshot = self._snapshot
+        if snapshot is not None and time.monotonic() - self._last_check < self.check_interval:
+            return snapshot
+        with self._lock:
+            self._last_check = time.monotonic()
+            revision = self.storage.revision()
+            if self._snapshot is None or self._snapshot.version != f"db-{revision}":
+                started = time.perf_counter()
+                self._snapshot = DatabaseSnapshot(self.storage, revision)
+                self.load_seconds = time.perf_counter() - started
+                self.loads += 1
+            return self._snapshot
+
+
+def create_store(json_path):
+    """Use the SQLite database named by ARTICLES_DB if set, otherwise the JSON file"""
+    database_path = os.getenv('ARTICLES_DB')
+    if database_path:
+        return DatabaseStore(database_path)
+    return ArticleStore(json_path)
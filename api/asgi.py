@@ -0,0 +1,415 @@
+"""
+ASGI variant of the articles API
+
+Serves the same JSON endpoints as app.py, built by the same snapshot, query
+and payload code, on an event loop so one worker can hold many keep-alive
+and long-poll connections. It also serves /api/updates, a long-poll that
+returns as soon as a new snapshot is loaded, and streams the NDJSON export
+and server-sent events without tying up a thread per client. Run it with uvicorn
+(pip install uvicorn) from the project root:
+
+    uvicorn asgi:app --app-dir api --host 0.0.0.0 --port 8000 --workers 4
+"""
+import os
+import sys
+import re
+import time
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from email.utils import formatdate
+from urllib.parse import parse_qsl
+
+from werkzeug.datastructures import MultiDict
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from article_store import create_store
+from http_cache import (CACHE_CONTROL, EXCLUDED_ENDPOINTS, MIN_COMPRESS_SIZE, normalized_query, compute_etag,
+                        _matching_etag, _not_modified_since, _choose_encoding, compress_body)
+from response_cache import ResponseCache
+from payloads import articles_payload, sources_payload, categories_payload, stats_payload, archive_payload
+from article_query import ArticleQuery
+from streaming import SSE_POLL_INTERVAL, ArticleEvents, dumps, ndjson_chunks
+from metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, UNMATCHED, Metrics
+from semantic import SemanticIndex, SemanticUnavailable
+from prerender import PrerenderedResponses, prerender_dir
+
+# Long-poll timing for /api/updates, in seconds
+LONG_POLL_TIMEOUT = 25
+MAX_LONG_POLL_TIMEOUT = 60
+LONG_POLL_INTERVAL = 0.5
+
+
+def get_json_path():
+    """Get the path to all_articles.json (ARTICLES_JSON, next to the api directory, or in the working directory)"""
+    if os.getenv('ARTICLES_JSON'):
+        return os.getenv('ARTICLES_JSON')
+    path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'all_articles.json')
+    if not os.path.exists(path) and os.path.exists(os.path.join(os.getcwd(), 'all_articles.json')):
+        path = os.path.join(os.getcwd(), 'all_articles.json')
+    return path
+
+
+JSON_FILE_PATH = get_json_path()
+
+# Day-partitioned history written by the scraper (see archive.py)
+ARCHIVE_DIR = os.getenv('ARTICLES_ARCHIVE_DIR', os.path.join(os.path.dirname(JSON_FILE_PATH), 'archive'))
+_article_archive = None
+
+
+def get_article_archive():
+    """Open the archive on first use"""
+    global _article_archive
+    if _article_archive is None:
+        from archive import ArticleArchive
+        _article_archive = ArticleArchive(ARCHIVE_DIR)
+    return _article_archive
+
+
+# One store and response cache per worker process, exactly as in app.py
+article_store = create_store(JSON_FILE_PATH)
+response_cache = ResponseCache(article_store)
+article_events = ArticleEvents(article_store)
+metrics = Metrics(article_store, response_cache)
+semantic_index = SemanticIndex(JSON_FILE_PATH)
+# Semantic views wait on Ollama (up to EMBED_TIMEOUT per query), so they get their own
+# threads: a slow or unreachable Ollama can't use up the pool every other render runs in
+semantic_executor = ThreadPoolExecutor(max_workers=int(os.getenv('SEMANTIC_WORKERS', '4')),
+                                       thread_name_prefix='semantic')
+prerendered = PrerenderedResponses(prerender_dir(JSON_FILE_PATH), article_store)
+
+# /api/articles/<id>/related
+RELATED_PATH = re.compile(r'^/api/articles/([^/]+)/related$')
+
+# Metric labels, named after the Flask app's endpoints so dashboards work for both
+ENDPOINTS = {
+    '/': 'home',
+    '/api/articles': 'get_articles',
+    '/api/articles/stream': 'stream_articles',
+    '/api/articles/events': 'get_article_events',
+    '/api/sources': 'get_sources',
+    '/api/categories': 'get_categories',
+    '/api/stats': 'get_stats',
+    '/api/archive': 'get_archive',
+    '/api/search/semantic': 'semantic_search',
+    '/api/updates': 'updates',
+    '/metrics': 'get_metrics',
+}
+
+
+class JSONResponse:
+    """A serialized JSON body, with the attributes ResponseCache reads from Flask responses"""
+    is_json = True
+    is_streamed = False
+
+    def __init__(self, payload, status_code=200):
+        self.status_code = status_code
+        self.body = dumps(payload)
+
+    def get_data(self):
+        return self.body
+
+
+def _error(message, status_code):
+    return JSONResponse({"success": False, "error": message}, status_code)
+
+
+def home(snapshot, args):
+    return {
+        "name": "Tech News Scraper API",
+        "version": "1.0.0",
+        "description": "REST API for accessing scraped tech news articles from The Verge, TechCrunch, and CNET (ASGI)",
+        "endpoints": {
+            "GET /": "API documentation",
+            "GET /api/articles": "Get articles (same parameters as the Flask API)",
+            "GET /api/articles/stream": "All matching articles as NDJSON, one per line (same filters and fields)",
+            "GET /api/articles/events": "Server-sent events for newly scraped articles (resume with Last-Event-ID)",
+            "GET /api/articles/<id>/related?limit=<number>": "Articles most similar to an article",
+            "GET /api/search/semantic?q=<query>&limit=<number>": "Articles ranked by meaning rather than keywords",
+            "GET /api/sources": "Get list of all sources",
+            "GET /api/categories": "Get list of all categories",
+            "GET /api/stats": "Get statistics about scraped articles",
+            "GET /api/archive": "Articles from all scrapes, by publication day",
+            "GET /api/updates?version=<version>&timeout=<seconds>": "Long-poll until the data version differs from version",
+            "GET /metrics": "Request and snapshot metrics in the Prometheus text format"
+        }
+    }
+
+
+# path -> (view building the payload from a snapshot and query parameters, cache the body,
+#          executor rendering it: None for the event loop's default one)
+VIEWS = {
+    '/': (home, False, None),
+    '/api/articles': (articles_payload, True, None),
+    '/api/sources': (lambda snapshot, args: sources_payload(snapshot), True, None),
+    '/api/categories': (lambda snapshot, args: categories_payload(snapshot), True, None),
+    '/api/stats': (lambda snapshot, args: stats_payload(snapshot), True, None),
+    '/api/archive': (lambda snapshot, args: archive_payload(get_article_archive(), args), False, None),
+    '/api/search/semantic': (lambda snapshot, args: semantic_index.search_payload(snapshot, args), True,
+                             semantic_executor),
+}
+
+
+def _related_view(article_id):
+    return (lambda snapshot, args: semantic_index.related_payload(snapshot, article_id, args), True,
+            semantic_executor)
+
+
+def _endpoint(path):
+    """Metric label of a request path"""
+    if RELATED_PATH.match(path):
+        return 'get_related_articles'
+    return ENDPOINTS.get(path, UNMATCHED)
+
+
+def _render(view, snapshot, args):
+    try:
+        return JSONResponse(view(snapshot, args))
+    except ValueError as e:
+        return _error(str(e), 400)
+    except LookupError as e:
+        return _error(str(e), 404)
+    except SemanticUnavailable as e:
+        return _error(str(e), 503)
+
+
+async def _send(send, status, headers, body=b'', head=False):
+    headers = list(headers) + [(b'access-control-allow-origin', b'*')]
+    if status != 304:
+        headers.append((b'content-length', str(len(body)).encode('latin-1')))
+    await send({'type': 'http.response.start', 'status': status, 'headers': headers})
+    await send({'type': 'http.response.body', 'body': b'' if head else body})
+
+
+async def _wait_for_disconnect(receive):
+    while (await receive())['type'] != 'http.disconnect':
+        pass
+
+
+async def updates(args, receive, send, head):
+    """Long-poll: answer once the snapshot version differs from ?version, or at the timeout"""
+    known = args.get('version')
+    timeout = args.get('timeout', type=float, default=LONG_POLL_TIMEOUT)
+    timeout = max(0.0, min(timeout, MAX_LONG_POLL_TIMEOUT))
+
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    snapshot = await _current_snapshot()
+    if snapshot.version == known:
+        disconnected = asyncio.ensure_future(_wait_for_disconnect(receive))
+        try:
+            while snapshot.version == known and loop.time() < deadline:
+                done, _ = await asyncio.wait({disconnected}, timeout=min(LONG_POLL_INTERVAL, deadline - loop.time()))
+                if done:
+                    return
+                # A reload parses the file, so keep it off the event loop
+                snapshot = await loop.run_in_executor(None, article_store.get)
+        finally:
+            disconnected.cancel()
+
+    response = JSONResponse({
+        "success": True,
+        "data": {
+            "version": snapshot.version,
+            "changed": snapshot.version != known,
+            "scraped_at": snapshot.data.get('scraped_at'),
+            "total_articles": snapshot.data.get('total_articles', 0)
+        }
+    })
+    await _send(send, 200, [(b'content-type', b'application/json'), (b'cache-control', b'no-store')],
+                response.body, head)
+
+
+async def stream_articles(snapshot, args, etag, send, head):
+    """NDJSON export of every matching article, sent chunk by chunk"""
+    try:
+        query = ArticleQuery(args)
+    except ValueError as e:
+        return await _send(send, 400, [(b'content-type', b'application/json')], _error(str(e), 400).body, head)
+
+    await send({'type': 'http.response.start', 'status': 200, 'headers': [
+        (b'content-type', b'application/x-ndjson'),
+        (b'cache-control', CACHE_CONTROL.encode('latin-1')),
+        (b'etag', f'"{etag}"'.encode('latin-1')),
+        (b'access-control-allow-origin', b'*')
+    ]})
+    if not head:
+        # send() waits while the client is slow, so only one chunk is held at a time
+        for chunk in ndjson_chunks(snapshot.iter_articles(query), query.fields):
+            await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+    await send({'type': 'http.response.body', 'body': b''})
+
+
+async def stream_events(args, headers, receive, send, head):
+    """Server-sent events for the articles added by each new snapshot"""
+    try:
+        query = ArticleQuery(args)
+    except ValueError as e:
+        return await _send(send, 400, [(b'content-type', b'application/json')], _error(str(e), 400).body, head)
+
+    await send({'type': 'http.response.start', 'status': 200, 'headers': [
+        (b'content-type', b'text/event-stream'),
+        (b'cache-control', b'no-store'),
+        (b'x-accel-buffering', b'no'),
+        (b'access-control-allow-origin', b'*')
+    ]})
+    if head:
+        return await send({'type': 'http.response.body', 'body': b''})
+
+    last_version = headers.get('last-event-id') or args.get('last_event_id')
+    events = article_events.events(last_version, query)
+    loop = asyncio.get_running_loop()
+    disconnected = asyncio.ensure_future(_wait_for_disconnect(receive))
+    try:
+        while True:
+            # Snapshot reloads and diffs can take a while, so run them off the event loop
+            chunk = await loop.run_in_executor(None, next, events, StopIteration)
+            if chunk is StopIteration:
+                break
+            if chunk is None:
+                done, _ = await asyncio.wait({disconnected}, timeout=SSE_POLL_INTERVAL)
+                if done:
+                    return
+            else:
+                await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+        await send({'type': 'http.response.body', 'body': b''})
+    finally:
+        disconnected.cancel()
+        events.close()
+
+
+async def _current_snapshot():
+    """The current snapshot; checking the file and reloading it run in a thread, off the event loop"""
+    snapshot = article_store.cached()
+    if snapshot is None:
+        snapshot = await asyncio.get_running_loop().run_in_executor(None, article_store.get)
+    return snapshot
+
+
+async def _lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            # Load the snapshot before accepting requests
+            article_store.get()
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def app(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        return await _lifespan(receive, send)
+    if scope['type'] != 'http':
+        return
+
+    # Record latency to the response headers and the size of unstreamed bodies, like the Flask app
+    started = time.perf_counter()
+    response = {}
+
+    async def send_and_record(message):
+        if message['type'] == 'http.response.start':
+            response['status'] = message['status']
+            response['seconds'] = time.perf_counter() - started
+            response['size'] = next((int(value) for name, value in message['headers'] if name == b'content-length'), None)
+        await send(message)
+
+    try:
+        await _handle(scope, receive, send_and_record)
+    finally:
+        if 'status' in response:
+            metrics.observe(_endpoint(scope['path']), scope['method'], response['status'],
+                            response['seconds'], response['size'])
+
+
+async def _handle(scope, receive, send):
+    method = scope['method']
+    path = scope['path']
+    headers = {name.decode('latin-1').lower(): value.decode('latin-1') for name, value in scope['headers']}
+    args = MultiDict(parse_qsl(scope['query_string'].decode('latin-1'), keep_blank_values=True))
+    head = method == 'HEAD'
+
+    if method == 'OPTIONS':
+        return await _send(send, 204, [
+            (b'access-control-allow-methods', b'GET, HEAD, OPTIONS'),
+            (b'access-control-allow-headers', headers.get('access-control-request-headers', '').encode('latin-1'))
+        ])
+    if method not in ('GET', 'HEAD'):
+        response = _error("Method not allowed", 405)
+        return await _send(send, 405, [(b'content-type', b'application/json'), (b'allow', b'GET, HEAD, OPTIONS')],
+                           response.body, head)
+    if path == '/api/updates':
+        return await updates(args, receive, send, head)
+    if path == '/api/articles/events':
+        return await stream_events(args, headers, receive, send, head)
+    if path == '/metrics':
+        return await _send(send, 200, [(b'content-type', METRICS_CONTENT_TYPE.encode('latin-1')),
+                                       (b'cache-control', b'no-store')],
+                           metrics.render().encode('utf-8'), head)
+
+    route = VIEWS.get(path)
+    related = RELATED_PATH.match(path)
+    if related:
+        route = _related_view(related.group(1))
+    if route is None and path != '/api/articles/stream':
+        response = _error("Endpoint not found", 404)
+        return await _send(send, 404, [(b'content-type', b'application/json')], response.body, head)
+
+    # Same validators as http_cache.init_app, so both variants share ETags
+    snapshot = await _current_snapshot()
+    query = normalized_query(args)
+    etag = compute_etag(snapshot.version, path, query)
+    # Endpoints http_cache excludes (the archive) get no validators or caching headers here either
+    validated = _endpoint(path) not in EXCLUDED_ENDPOINTS
+    if_none_match = headers.get('if-none-match')
+    matched = _matching_etag(etag, if_none_match)
+    if validated and (matched or (not if_none_match and _not_modified_since(snapshot.modified_at, headers.get('if-modified-since')))):
+        return await _send(send, 304, [
+            (b'etag', (matched or f'"{etag}"').encode('latin-1')),
+            (b'cache-control', CACHE_CONTROL.encode('latin-1')),
+            (b'vary', b'Accept-Encoding')
+        ])
+
+    # The scraper's pre-rendered body, already compressed, when this URL has one
+    found = prerendered.find(snapshot, path, query, headers.get('accept-encoding', ''))
+    if found is not None:
+        status, (body, encoding) = 200, found
+    elif route is None:
+        return await stream_articles(snapshot, args, etag, send, head)
+    else:
+        view, cacheable, executor = route
+        cached = cacheable and response_cache.max_entries > 0
+        result = response_cache.lookup(snapshot.version, (path, query)) if cached else None
+        if result is None:
+            # Only cache hits are answered on the event loop: rendering (e.g. a BM25 search) and
+            # waiting on another request's render both block, so they run in the executor
+            if cached:
+                compute = lambda: response_cache.get_or_compute(snapshot.version, (path, query),
+                                                                lambda: _render(view, snapshot, args))
+            else:
+                compute = lambda: _render(view, snapshot, args)
+            result = await asyncio.get_running_loop().run_in_executor(executor, compute)
+        if isinstance(result, bytes):
+            status, body = 200, result
+        else:
+            status, body = result.status_code, result.body
+        encoding = None
+
+    response_headers = [(b'content-type', b'application/json')]
+    if status == 200 and validated:
+        response_headers += [(b'cache-control', CACHE_CONTROL.encode('latin-1')), (b'vary', b'Accept-Encoding')]
+        if snapshot.modified_at is not None:
+            response_headers.append((b'last-modified', formatdate(snapshot.modified_at, usegmt=True).encode('latin-1')))
+        if encoding is None:
+            encoding = _choose_encoding(headers.get('accept-encoding', ''))
+            if encoding and len(body) >= MIN_COMPRESS_SIZE:
+                body = compress_body(body, encoding)
+            else:
+                encoding = None
+        if encoding:
+            response_headers.append((b'content-encoding', encoding.encode('latin-1')))
+            etag = f'{etag}-{encoding}'
+        response_headers.append((b'etag', f'"{etag}"'.encode('latin-1')))
+    await _send(send, status, response_headers, body, head)
@@ -0,0 +1,86 @@
+"""
+Measure API throughput in-process with Flask's test client
+
+Compares requests per second with the response cache disabled and enabled
+for a handful of typical URLs. Run from the project root:
+
+    python api/benchmark.py --scale 20 --requests 500
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+URLS = [
+    '/api/articles?limit=10',
+    '/api/articles?category=AI%20%26%20ML&limit=10',
+    '/api/articles?source=TechCrunch&page=1&per_page=10',
+    '/api/articles?search=ai&limit=10',
+    '/api/articles',
+    '/api/stats',
+    '/api/categories',
+]
+
+
+def build_dataset(source_path, scale):
+    """Write a copy of the articles file with every article repeated scale times"""
+    with open(source_path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    articles = []
+    for copy in range(scale):
+        for article in data.get('articles', []):
+            article = dict(article)
+            article['url'] = f"{article.get('url', '')}#{copy}"
+            articles.append(article)
+    data['articles'] = articles
+    data['total_articles'] = len(articles)
+    data.pop('aggregates', None)
+
+    handle, path = tempfile.mkstemp(suffix='.json')
+    with os.fdopen(handle, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False)
+    return path, len(articles)
+
+
+def run(client, url, requests):
+    start = time.perf_counter()
+    for _ in range(requests):
+        response = client.get(url)
+        response.get_data()
+    return requests / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--data', default=os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'all_articles.json'))
+    parser.add_argument('--scale', type=int, default=20, help='Repeat the articles this many times')
+    parser.add_argument('--requests', type=int, default=300, help='Requests per URL and mode')
+    args = parser.parse_args()
+
+    path, total = build_dataset(args.data, args.scale)
+    os.environ['ARTICLES_RELOAD_INTERVAL'] = '1000'
+    try:
+        import app as api
+        api.article_store.path = path
+        client = api.app.test_client()
+        client.get('/api/articles')  # load the snapshot
+
+        print(f"Articles: {total}, requests per URL: {args.requests}")
+        print(f"{'URL':<55} {'no cache':>10} {'cache':>10} {'speedup':>8}")
+        for url in URLS:
+            api.response_cache.max_entries = 0
+            uncached = run(client, url, args.requests)
+            api.response_cache.max_entries = 256
+            api.response_cache.clear()
+            cached = run(client, url, args.requests)
+            print(f"{url:<55} {uncached:>8.0f}/s {cached:>8.0f}/s {cached / uncached:>7.1f}x")
+    finally:
+        os.remove(path)
+
+
+if __name__ == '__main__':
+    main()
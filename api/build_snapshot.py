@@ -0,0 +1,31 @@
+"""
+Prebuild the API's in-memory snapshot of an articles file
+
+Parsing all_articles.json and building the filter and search indexes is
+most of a cold start's first-request time. This stores the finished
+snapshot next to the file (all_articles.snapshot) so the API can load it
+directly; it is ignored whenever the JSON file's content changes.
+
+    python api/build_snapshot.py [all_articles.json]
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from article_store import build_prebuilt
+
+
+def main():
+    json_path = sys.argv[1] if len(sys.argv) > 1 else os.path.join(
+        os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'all_articles.json')
+    start = time.perf_counter()
+    path = build_prebuilt(json_path)
+    print(f"✓ Prebuilt snapshot saved to {path} ({os.path.getsize(path) / 1024:.0f} KB, "
+          f"{time.perf_counter() - start:.2f}s)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,141 @@
+import os
+import hashlib
+from email.utils import formatdate, parsedate_to_datetime
+from urllib.parse import urlencode
+
+from flask import g, request
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; gzip is always available
+    brotli = None
+
+# Browsers revalidate after a minute; Vercel's CDN honours s-maxage and
+# keeps serving a stale copy while it revalidates in the background
+CACHE_CONTROL = os.getenv('API_CACHE_CONTROL', 'public, max-age=60, s-maxage=300, stale-while-revalidate=600')
+
+# Bodies smaller than this aren't worth compressing
+MIN_COMPRESS_SIZE = 512
+
+# Endpoints that are not derived from the snapshot, or are never cached, and handle caching themselves
+# (the archive is appended to after the snapshot is written, so the snapshot's validators don't cover it)
+EXCLUDED_ENDPOINTS = {'get_thumbnail', 'static', 'get_article_events', 'get_metrics', 'get_archive'}
+
+
+def normalized_query(args=None):
+    """Query parameters (the current request's by default) in a canonical order, so equivalent URLs share a key"""
+    if args is None:
+        args = request.args
+    return urlencode(sorted(args.items(multi=True)))
+
+
+def compute_etag(version, path, query):
+    digest = hashlib.sha1(f"{version}|{path}|{query}".encode('utf-8')).hexdigest()
+    return digest[:32]
+
+
+def _matching_etag(etag, header):
+    """
+    Find the If-None-Match entry matching etag, ignoring content-coding suffixes
+    Returns the entry as sent by the client, or None
+    """
+    if not header:
+        return None
+    if header.strip() == '*':
+        return f'"{etag}"'
+    for entry in header.split(','):
+        entry = entry.strip()
+        candidate = entry[2:] if entry.startswith('W/') else entry
+        candidate = candidate.strip('"')
+        for suffix in ('-br', '-gzip'):
+            if candidate.endswith(suffix):
+                candidate = candidate[:-len(suffix)]
+        if candidate == etag:
+            return entry
+    return None
+
+
+def _not_modified_since(modified_at, header):
+    if not header or modified_at is None:
+        return False
+    try:
+        return int(modified_at) <= parsedate_to_datetime(header).timestamp()
+    except (TypeError, ValueError):
+        return False
+
+
+def _choose_encoding(accept_encoding):
+    """Pick br or gzip from an Accept-Encoding header"""
+    offered = {}
+    for part in accept_encoding.split(','):
+        name, _, params = part.strip().partition(';')
+        quality = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        offered[name.strip().lower()] = quality
+    if brotli is not None and offered.get('br', 0) > 0:
+        return 'br'
+    if offered.get('gzip', 0) > 0:
+        return 'gzip'
+    return None
+
+
+def compress_body(body, encoding):
+    if encoding == 'br':
+        return brotli.compress(body, quality=5)
+    import gzip
+    return gzip.compress(body, compresslevel=6)
+
+
+def init_app(app, store):
+    """Add ETag/Last-Modified validation, Cache-Control and compression to an app"""
+
+    @app.before_request
+    def check_validators():
+        if request.method not in ('GET', 'HEAD') or request.endpoint in EXCLUDED_ENDPOINTS or request.endpoint is None:
+            return None
+
+        snapshot = store.get()
+        g.http_cache_modified_at = snapshot.modified_at
+        g.http_cache_etag = compute_etag(snapshot.version, request.path, normalized_query())
+
+        # If-None-Match takes precedence over If-Modified-Since
+        if_none_match = request.headers.get('If-None-Match')
+        matched = _matching_etag(g.http_cache_etag, if_none_match)
+        if matched or (not if_none_match and _not_modified_since(snapshot.modified_at, request.headers.get('If-Modified-Since'))):
+            response = app.response_class(status=304)
+            response.headers['ETag'] = matched or f'"{g.http_cache_etag}"'
+            response.headers['Cache-Control'] = CACHE_CONTROL
+            response.headers['Vary'] = 'Accept-Encoding'
+            return response
+        return None
+
+    @app.after_request
+    def add_cache_headers(response):
+        etag = g.get('http_cache_etag')
+        if etag is None or response.status_code != 200:
+            return response
+
+        response.headers['Cache-Control'] = CACHE_CONTROL
+        response.vary.add('Accept-Encoding')
+        if g.get('http_cache_modified_at') is not None:
+            response.headers['Last-Modified'] = formatdate(g.http_cache_modified_at, usegmt=True)
+
+        # Bodies that arrive compressed (pre-rendered responses) keep their coding
+        encoding = response.headers.get('Content-Encoding')
+        if not response.direct_passthrough and not response.is_streamed and encoding is None:
+            body = response.get_data()
+            encoding = _choose_encoding(request.headers.get('Accept-Encoding', ''))
+            if encoding and len(body) >= MIN_COMPRESS_SIZE:
+                response.set_data(compress_body(body, encoding))
+                response.headers['Content-Encoding'] = encoding
+            else:
+                encoding = None
+
+        # A compressed body is a different representation, so it gets its own tag
+        response.headers['ETag'] = f'"{etag}-{encoding}"' if encoding else f'"{etag}"'
+        return response
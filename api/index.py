@@ -1,8 +1,22 @@
-from flask import Flask, jsonify, request
+from flask import Flask, jsonify, request, send_from_directory, stream_with_context
 from flask_cors import CORS
-import json
 import os
-from datetime import datetime
+import sys
+
+# Make sibling API modules and the shared project modules importable however
+# this file is loaded (python api/app.py, a WSGI server, or the Vercel runtime)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from article_store import create_store
+import http_cache
+from response_cache import ResponseCache
+from payloads import articles_payload, sources_payload, categories_payload, stats_payload, archive_payload
+from article_query import ArticleQuery
+from streaming import ArticleEvents, ndjson_chunks
+from metrics import Metrics
+from semantic import SemanticIndex, SemanticUnavailable
+from prerender import PrerenderedResponses, prerender_dir
 
 app = Flask(__name__)
 CORS(app)  # Enable CORS for all routes
@@ -10,6 +24,10 @@ CORS(app)  # Enable CORS for all routes
 # Path to the JSON file - Vercel serverless environment
 def get_json_path():
     """Get the correct path to all_articles.json"""
+    # ARTICLES_JSON points the API at another articles file (e.g. a benchmark dataset)
+    if os.getenv('ARTICLES_JSON'):
+        return os.getenv('ARTICLES_JSON')
+    
     # Try multiple paths for Vercel serverless
     possible_paths = [
         os.path.join(os.path.dirname(__file__), '..', 'all_articles.json'),
@@ -27,25 +45,52 @@ def get_json_path():
 
 JSON_FILE_PATH = get_json_path()
 
+# Locally materialized thumbnails live next to the JSON file unless overridden
+THUMBNAIL_DIR = os.getenv('THUMBNAIL_DIR', os.path.join(os.path.dirname(JSON_FILE_PATH), 'thumbnails'))
+
+# Day-partitioned history written by the scraper (see archive.py)
+ARCHIVE_DIR = os.getenv('ARTICLES_ARCHIVE_DIR', os.path.join(os.path.dirname(JSON_FILE_PATH), 'archive'))
+_article_archive = None
+
+def get_article_archive():
+    """Open the archive on first use, keeping it off the cold start path"""
+    global _article_archive
+    if _article_archive is None:
+        from archive import ArticleArchive
+        _article_archive = ArticleArchive(ARCHIVE_DIR)
+    return _article_archive
+
+# Parsed once per file version (or a SQLite database when ARTICLES_DB is set)
+# and shared by all requests
+article_store = create_store(JSON_FILE_PATH)
+
+# Serialized responses, reused until the snapshot changes
+response_cache = ResponseCache(article_store)
+
+# Latency, size and status metrics plus snapshot gauges at /metrics; set up
+# first so it times the whole request and sees the final (compressed) body
+metrics = Metrics(article_store, response_cache)
+metrics.init_app(app)
+
+# ETag/Last-Modified validation, Cache-Control and gzip/brotli compression
+http_cache.init_app(app, article_store)
+
+response_cache.init_app(app)
+
+# Responses the scraper rendered and compressed ahead of time (see prerender.py),
+# answered before the view runs; after http_cache so conditional requests still get a 304
+prerendered = PrerenderedResponses(prerender_dir(JSON_FILE_PATH), article_store)
+prerendered.init_app(app)
+
+# Embeddings and precomputed related articles written next to the JSON file by the scraper
+semantic_index = SemanticIndex(JSON_FILE_PATH)
+
+# Pushes the articles added by each new snapshot to server-sent event clients
+article_events = ArticleEvents(article_store)
+
 def load_articles():
-    """Load articles from JSON file"""
-    try:
-        with open(JSON_FILE_PATH, 'r', encoding='utf-8') as f:
-            return json.load(f)
-    except FileNotFoundError:
-        return {
-            "sources": [],
-            "scraped_at": None,
-            "total_articles": 0,
-            "articles": []
-        }
-    except json.JSONDecodeError:
-        return {
-            "sources": [],
-            "scraped_at": None,
-            "total_articles": 0,
-            "articles": []
-        }
+    """Load articles from the in-memory snapshot of the JSON file"""
+    return article_store.get().data
 
 @app.route('/')
 def home():
@@ -61,144 +106,149 @@ def home():
             "GET /api/articles?category=<category>": "Filter by category (Trending, Technology, Education, Careers, AI & ML)",
             "GET /api/articles?limit=<number>": "Limit number of results",
             "GET /api/articles?page=<number>&per_page=<number>": "Paginate results",
+            "GET /api/articles?cursor=<cursor>&per_page=<number>": "Cursor pagination, newest first (start with an empty cursor)",
+            "GET /api/articles?fields=<field,...>&shape=<rows|columns>": "Return only some fields, as objects or one array per field",
+            "GET /api/articles?tag=<tag>&day=<YYYY-MM-DD>": "Filter by tag or publication day",
+            "GET /api/articles?facets=<source,category,tag,day>&facet_limit=<number>": "Also count matches per value of each facet (empty for all)",
+            "GET /api/articles/stream": "All matching articles as NDJSON, one per line (same filters and fields)",
+            "GET /api/articles/events": "Server-sent events for newly scraped articles (resume with Last-Event-ID)",
+            "GET /api/articles/<id>/related?limit=<number>": "Articles most similar to an article (id from semantic search or related results)",
+            "GET /api/search/semantic?q=<query>&limit=<number>": "Articles ranked by meaning rather than keywords",
             "GET /api/sources": "Get list of all sources",
             "GET /api/categories": "Get list of all categories",
-            "GET /api/stats": "Get statistics about scraped articles"
+            "GET /api/stats": "Get statistics about scraped articles",
+            "GET /api/archive?date_from=<date>&date_to=<date>&page=<number>": "Articles from all scrapes, by publication day",
+            "GET /thumbnails/<path>": "Locally stored thumbnail variant (see thumbnail_local.variants)",
+            "GET /metrics": "Request and snapshot metrics in the Prometheus text format"
         }
     })
 
 @app.route('/api/articles', methods=['GET'])
+@response_cache.cached
 def get_articles():
     """Get articles with optional filtering and pagination"""
-    data = load_articles()
-    articles = data.get('articles', [])
-    
-    # Filter by source
-    source = request.args.get('source')
-    if source:
-        articles = [a for a in articles if a.get('source', '').lower() == source.lower()]
-    
-    # Filter by category
-    category = request.args.get('category')
-    if category:
-        articles = [a for a in articles if a.get('category', '').lower() == category.lower()]
-    
-    # Search by keyword in title or description
-    search = request.args.get('search')
-    if search:
-        search_lower = search.lower()
-        articles = [a for a in articles if 
-                   search_lower in a.get('title', '').lower() or 
-                   search_lower in a.get('description', '').lower()]
+    try:
+        payload = articles_payload(article_store.get(), request.args)
+    except ValueError as e:
+        return jsonify({
+            "success": False,
+            "error": str(e)
+        }), 400
     
-    # Filter by date
-    date_from = request.args.get('date_from')
-    date_to = request.args.get('date_to')
-    if date_from or date_to:
-        filtered = []
-        for a in articles:
-            if a.get('published_date'):
-                try:
-                    article_date = datetime.fromisoformat(a['published_date'].replace('Z', '+00:00'))
-                    if date_from and article_date < datetime.fromisoformat(date_from):
-                        continue
-                    if date_to and article_date > datetime.fromisoformat(date_to):
-                        continue
-                    filtered.append(a)
-                except:
-                    continue
-        articles = filtered
+    return jsonify(payload)
+
+@app.route('/api/articles/stream', methods=['GET'])
+def stream_articles():
+    """Stream every matching article as newline-delimited JSON"""
+    try:
+        query = ArticleQuery(request.args)
+    except ValueError as e:
+        return jsonify({
+            "success": False,
+            "error": str(e)
+        }), 400
     
-    # Pagination
-    page = request.args.get('page', type=int)
-    per_page = request.args.get('per_page', type=int, default=10)
-    limit = request.args.get('limit', type=int)
+    snapshot = article_store.get()
+    chunks = ndjson_chunks(snapshot.iter_articles(query), query.fields)
+    return app.response_class(stream_with_context(chunks), mimetype='application/x-ndjson')
+
+@app.route('/api/articles/events', methods=['GET'])
+def get_article_events():
+    """Push newly scraped articles as server-sent events"""
+    try:
+        query = ArticleQuery(request.args)
+    except ValueError as e:
+        return jsonify({
+            "success": False,
+            "error": str(e)
+        }), 400
     
-    total_articles = len(articles)
+    # EventSource sends Last-Event-ID on reconnect; last_event_id works for the first connection
+    last_version = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+    response = app.response_class(
+        stream_with_context(article_events.stream(last_version, query)),
+        mimetype='text/event-stream'
+    )
+    response.headers['Cache-Control'] = 'no-store'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+@app.route('/api/articles/<article_id>/related', methods=['GET'])
+@response_cache.cached
+def get_related_articles(article_id):
+    """Get the articles most similar to one article"""
+    try:
+        payload = semantic_index.related_payload(article_store.get(), article_id, request.args)
+    except LookupError as e:
+        return jsonify({
+            "success": False,
+            "error": str(e)
+        }), 404
+    except SemanticUnavailable as e:
+        return jsonify({
+            "success": False,
+            "error": str(e)
+        }), 503
     
-    if page and per_page:
-        start = (page - 1) * per_page
-        end = start + per_page
-        articles = articles[start:end]
-        
+    return jsonify(payload)
+
+@app.route('/api/search/semantic', methods=['GET'])
+@response_cache.cached
+def semantic_search():
+    """Rank articles by similarity to a free-text query"""
+    try:
+        payload = semantic_index.search_payload(article_store.get(), request.args)
+    except ValueError as e:
         return jsonify({
-            "success": True,
-            "data": {
-                "articles": articles,
-                "pagination": {
-                    "page": page,
-                    "per_page": per_page,
-                    "total": total_articles,
-                    "total_pages": (total_articles + per_page - 1) // per_page
-                }
-            },
-            "scraped_at": data.get('scraped_at')
-        })
-    elif limit:
-        articles = articles[:limit]
+            "success": False,
+            "error": str(e)
+        }), 400
+    except SemanticUnavailable as e:
+        return jsonify({
+            "success": False,
+            "error": str(e)
+        }), 503
     
-    return jsonify({
-        "success": True,
-        "data": {
-            "articles": articles,
-            "total": total_articles
-        },
-        "scraped_at": data.get('scraped_at')
-    })
+    return jsonify(payload)
 
 @app.route('/api/sources', methods=['GET'])
+@response_cache.cached
 def get_sources():
     """Get list of all available sources"""
-    data = load_articles()
-    return jsonify({
-        "success": True,
-        "data": {
-            "sources": data.get('sources', [])
-        }
-    })
+    return jsonify(sources_payload(article_store.get()))
 
 @app.route('/api/categories', methods=['GET'])
+@response_cache.cached
 def get_categories():
     """Get list of all categories"""
-    data = load_articles()
-    articles = data.get('articles', [])
-    categories = list(set([a.get('category') for a in articles if a.get('category')]))
-    
-    return jsonify({
-        "success": True,
-        "data": {
-            "categories": sorted(categories)
-        }
-    })
+    return jsonify(categories_payload(article_store.get()))
 
 @app.route('/api/stats', methods=['GET'])
+@response_cache.cached
 def get_stats():
     """Get statistics about scraped articles"""
-    data = load_articles()
-    articles = data.get('articles', [])
-    
-    # Count by source
-    source_counts = {}
-    for article in articles:
-        source = article.get('source', 'Unknown')
-        source_counts[source] = source_counts.get(source, 0) + 1
-    
-    # Count by category
-    category_counts = {}
-    for article in articles:
-        category = article.get('category', 'Unknown')
-        category_counts[category] = category_counts.get(category, 0) + 1
+    return jsonify(stats_payload(article_store.get()))
+
+@app.route('/api/archive', methods=['GET'])
+def get_archive():
+    """Page through archived articles from all scrapes, newest first"""
+    try:
+        payload = archive_payload(get_article_archive(), request.args)
+    except ValueError as e:
+        return jsonify({
+            "success": False,
+            "error": str(e)
+        }), 400
     
-    return jsonify({
-        "success": True,
-        "data": {
-            "total_articles": data.get('total_articles', 0),
-            "sources": data.get('sources', []),
-            "scraped_at": data.get('scraped_at'),
-            "articles_by_source": source_counts,
-            "articles_by_category": category_counts
-        }
-    })
+    return jsonify(payload)
+
+@app.route('/thumbnails/<path:filename>', methods=['GET'])
+def get_thumbnail(filename):
+    """Serve a locally stored thumbnail variant"""
+    response = send_from_directory(THUMBNAIL_DIR, filename)
+    # Variants are content-addressed, so they never change once written
+    response.headers['Cache-Control'] = 'public, max-age=31536000, immutable'
+    return response
 
 @app.errorhandler(404)
 def not_found(error):
@@ -224,9 +274,16 @@ if __name__ == '__main__':
     print("\nAvailable endpoints:")
     print("  GET /                      - API documentation")
     print("  GET /api/articles          - Get all articles")
+    print("  GET /api/articles/stream   - Stream articles as NDJSON")
+    print("  GET /api/articles/events   - Server-sent events for new articles")
+    print("  GET /api/articles/<id>/related - Similar articles")
+    print("  GET /api/search/semantic   - Search by meaning")
     print("  GET /api/sources           - Get all sources")
     print("  GET /api/categories        - Get all categories")
     print("  GET /api/stats             - Get statistics")
+    print("  GET /api/archive           - Get archived articles")
+    print("  GET /thumbnails/<path>     - Stored thumbnail variants")
+    print("  GET /metrics               - Prometheus metrics")
     print("=" * 60)
     app.run(debug=True, host='0.0.0.0', port=5000)
 
@@ -0,0 +1,392 @@
+"""
+Load and latency harness for the API
+
+Starts the API locally (Flask's threaded server and/or the ASGI app under
+uvicorn) against synthetic article datasets of the given sizes and drives
+a weighted mix of /api/articles filters, search, pagination, /api/stats and
+/api/categories from concurrent keep-alive clients. Reports startup time,
+throughput, p50/p95/p99 latency and server RSS per mode and size, and
+writes them to a JSON file that later runs can be compared against.
+Run from the project root:
+
+    python api/loadtest.py --sizes 1000,100000 --modes flask,asgi --concurrency 64
+    python api/loadtest.py --sizes 1000 --baseline bench_results/<commit>.json
+    python api/loadtest.py --url http://localhost:8000 --duration 10
+
+Datasets are generated once per size and seed and reused from --data-dir.
+"""
+import os
+import sys
+import json
+import time
+import random
+import socket
+import asyncio
+import argparse
+import platform
+import subprocess
+import tempfile
+from datetime import datetime, timedelta, timezone
+from urllib.parse import urlsplit, quote
+
+API_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_DIR = os.path.dirname(API_DIR)
+
+SOURCES = ['The Verge', 'TechCrunch', 'CNET']
+CATEGORIES = ['Trending', 'Technology', 'Education', 'Careers', 'AI & ML']
+WORDS = (
+    'ai model chip startup funding launch review phone laptop robot cloud security privacy '
+    'data battery camera app update policy court regulation market stock quantum '
+    'energy climate space rocket satellite browser search social video streaming music game '
+    'console hardware software developer open source cyber hack breach network wireless'
+).split()
+
+# (label, weight) of the request mix; see build_mix()
+MIX = [
+    ('feed', 30),
+    ('page', 10),
+    ('cursor', 10),
+    ('source', 10),
+    ('category', 8),
+    ('source_category', 5),
+    ('search', 12),
+    ('date_range', 5),
+    ('stats', 5),
+    ('categories', 5),
+]
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
+
+
+# Datasets
+
+def synthetic_article(rng, number, now):
+    published = now - timedelta(seconds=rng.randrange(90 * 24 * 3600))
+    title = ' '.join(rng.choice(WORDS) for _ in range(rng.randint(5, 11))).capitalize()
+    return {
+        "title": title,
+        "url": f"https://example.com/{number // 1000}/article-{number}",
+        "description": ' '.join(rng.choice(WORDS) for _ in range(rng.randint(25, 45))).capitalize() + '.',
+        "author": f"Author {rng.randrange(400)}",
+        "published_date": published.isoformat(),
+        "category": rng.choice(CATEGORIES),
+        "tags": rng.sample(WORDS, rng.randint(2, 6)),
+        "source": rng.choice(SOURCES),
+        "thumbnail": f"https://images.example.com/{number:08d}.jpg?w=1080&q=80"
+    }
+
+
+def synthetic_dataset(size, data_dir, seed=42):
+    """Path of an all_articles.json-shaped file with size articles, generated if missing"""
+    os.makedirs(data_dir, exist_ok=True)
+    path = os.path.join(data_dir, f"articles-{size}-{seed}.json")
+    if os.path.exists(path):
+        return path
+
+    rng = random.Random(seed)
+    now = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    # Written article by article so generating a million doesn't hold them all in memory
+    with open(path + '.tmp', 'w', encoding='utf-8') as f:
+        header = {"sources": SOURCES, "scraped_at": now.isoformat(), "total_articles": size}
+        f.write(json.dumps(header, ensure_ascii=False)[:-1] + ', "articles": [')
+        for number in range(size):
+            if number:
+                f.write(',')
+            f.write(json.dumps(synthetic_article(rng, number, now), ensure_ascii=False))
+        f.write(']}')
+    os.replace(path + '.tmp', path)
+    return path
+
+
+def build_mix(count, seed=7):
+    """A shuffled pool of (label, path) requests following the MIX weights"""
+    rng = random.Random(seed)
+    labels = [label for label, _ in MIX]
+    weights = [weight for _, weight in MIX]
+    pool = []
+    for label in rng.choices(labels, weights, k=count):
+        if label == 'feed':
+            path = '/api/articles?limit=20'
+        elif label == 'page':
+            path = f'/api/articles?page={rng.randint(1, 50)}&per_page=20'
+        elif label == 'cursor':
+            path = '/api/articles?cursor=&per_page=20'
+        elif label == 'source':
+            path = f'/api/articles?source={quote(rng.choice(SOURCES))}&limit=20'
+        elif label == 'category':
+            path = f'/api/articles?category={quote(rng.choice(CATEGORIES))}&page=1&per_page=20'
+        elif label == 'source_category':
+            path = (f'/api/articles?source={quote(rng.choice(SOURCES))}'
+                    f'&category={quote(rng.choice(CATEGORIES))}&limit=20')
+        elif label == 'search':
+            words = ' '.join(rng.sample(WORDS, rng.randint(1, 2)))
+            path = f'/api/articles?search={quote(words)}&limit=20'
+        elif label == 'date_range':
+            day = datetime(2026, 1, 1) - timedelta(days=rng.randrange(90))
+            path = f'/api/articles?date_from={day.date()}&date_to={(day + timedelta(days=7)).date()}&limit=20'
+        elif label == 'stats':
+            path = '/api/stats'
+        else:
+            path = '/api/categories'
+        pool.append((label, path))
+    return pool
+
+
+# Load generation
+
+async def _read_response(reader):
+    """Read one HTTP/1.1 response; returns (status, keep_alive)"""
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionError("connection closed")
+    version, status = status_line.split(b' ', 2)[:2]
+    length = 0
+    keep_alive = version == b'HTTP/1.1'
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            break
+        name, _, value = line.partition(b':')
+        name = name.strip().lower()
+        if name == b'content-length':
+            length = int(value)
+        elif name == b'connection':
+            keep_alive = value.strip().lower() == b'keep-alive'
+    await reader.readexactly(length)
+    return int(status), keep_alive
+
+
+async def _client(host, port, pool, offset, deadline, latencies, errors):
+    reader = writer = None
+    index = offset
+    while time.perf_counter() < deadline:
+        label, path = pool[index % len(pool)]
+        index += 1
+        request = (f"GET {path} HTTP/1.1\r\nHost: {host}:{port}\r\n"
+                   f"Accept-Encoding: gzip\r\nConnection: keep-alive\r\n\r\n").encode('latin-1')
+        try:
+            if writer is None:
+                reader, writer = await asyncio.open_connection(host, port)
+            start = time.perf_counter()
+            writer.write(request)
+            status, keep_alive = await _read_response(reader)
+            latencies.setdefault(label, []).append(time.perf_counter() - start)
+            if status != 200:
+                errors[status] = errors.get(status, 0) + 1
+            if not keep_alive:
+                writer.close()
+                writer = None
+        except (OSError, ConnectionError, asyncio.IncompleteReadError, ValueError):
+            errors['connection'] = errors.get('connection', 0) + 1
+            if writer is not None:
+                writer.close()
+            writer = None
+            await asyncio.sleep(0.01)
+    if writer is not None:
+        writer.close()
+
+
+def _summarize(latencies, elapsed):
+    latencies = sorted(latencies)
+    return {
+        "requests": len(latencies),
+        "rps": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 2)
+    }
+
+
+async def load(base_url, pool, concurrency, duration):
+    """Drive the request pool from concurrent clients for duration seconds"""
+    parts = urlsplit(base_url)
+    latencies = {}
+    errors = {}
+    started = time.perf_counter()
+    deadline = started + duration
+    await asyncio.gather(*(
+        _client(parts.hostname, parts.port or 80, pool, n * len(pool) // concurrency, deadline, latencies, errors)
+        for n in range(concurrency)
+    ))
+    elapsed = time.perf_counter() - started
+    result = _summarize([value for values in latencies.values() for value in values], elapsed)
+    result["errors"] = {str(key): count for key, count in errors.items()}
+    result["endpoints"] = {label: _summarize(values, elapsed) for label, values in sorted(latencies.items())}
+    return result
+
+
+# Servers
+
+def rss_mb(pid):
+    """Current and peak resident set size of a process in MB (Linux only, else None)"""
+    try:
+        with open(f'/proc/{pid}/status') as f:
+            fields = dict(line.split(':', 1) for line in f if ':' in line)
+    except OSError:
+        return None, None
+    current = int(fields['VmRSS'].split()[0]) / 1024 if 'VmRSS' in fields else None
+    peak = int(fields['VmHWM'].split()[0]) / 1024 if 'VmHWM' in fields else None
+    return current, peak
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def _request(port, path, timeout):
+    with socket.create_connection(('127.0.0.1', port), timeout=timeout) as conn:
+        conn.sendall(f"GET {path} HTTP/1.1\r\nHost: 127.0.0.1\r\nConnection: close\r\n\r\n".encode('latin-1'))
+        return conn.recv(16)
+
+
+def _wait_until_ready(port, process, timeout):
+    """Wait until the server answers /api/stats (i.e. the dataset is loaded)"""
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError("server exited during startup")
+        try:
+            # The first request loads the snapshot, so it may take a while
+            if b' 200 ' in _request(port, '/api/stats', timeout):
+                return
+        except OSError:
+            pass
+        time.sleep(0.1)
+    raise RuntimeError("server did not start")
+
+
+MODES = {
+    'flask': lambda port, workers: [sys.executable, '-c',
+                                    f"import app; app.app.run(host='127.0.0.1', port={port}, threaded=True)"],
+    'asgi': lambda port, workers: [sys.executable, '-m', 'uvicorn', 'asgi:app', '--host', '127.0.0.1',
+                                   '--port', str(port), '--workers', str(workers),
+                                   '--log-level', 'warning', '--no-access-log'],
+}
+
+
+def run_server(mode, dataset, pool, args):
+    """Start one server on a dataset, load it, and return the measurements"""
+    port = _free_port()
+    env = dict(os.environ, ARTICLES_JSON=dataset, ARTICLES_DB='')
+    if args.no_cache:
+        env['RESPONSE_CACHE_SIZE'] = '0'
+    started = time.perf_counter()
+    process = subprocess.Popen(MODES[mode](port, args.workers), cwd=API_DIR, env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        _wait_until_ready(port, process, args.startup_timeout)
+        startup = time.perf_counter() - started
+        idle_rss, _ = rss_mb(process.pid)
+        result = asyncio.run(load(f"http://127.0.0.1:{port}", pool, args.concurrency, args.duration))
+        rss, peak_rss = rss_mb(process.pid)
+    finally:
+        process.terminate()
+        process.wait()
+    result.update({
+        "startup_s": round(startup, 3),
+        "rss_mb": round(rss, 1) if rss is not None else None,
+        "rss_idle_mb": round(idle_rss, 1) if idle_rss is not None else None,
+        "rss_peak_mb": round(peak_rss, 1) if peak_rss is not None else None
+    })
+    return result
+
+
+# Reporting
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=PROJECT_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_run(run, baseline=None):
+    rss = f"{run['rss_mb']:.0f} MB" if run.get('rss_mb') is not None else '-'
+    print(f"\n{run['mode']} / {run['size']} articles: startup {run['startup_s']:.2f}s, RSS {rss}, "
+          f"errors {run['errors'] or '-'}")
+    print(f"  {'endpoint':<16} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    rows = [('all', run)] + list(run['endpoints'].items())
+    for label, stats in rows:
+        line = (f"  {label:<16} {stats['rps']:>8.0f} {stats['p50_ms']:>8.1f} "
+                f"{stats['p95_ms']:>8.1f} {stats['p99_ms']:>8.1f}")
+        previous = None
+        if baseline:
+            previous = baseline if label == 'all' else baseline.get('endpoints', {}).get(label)
+        if previous and previous.get('rps') and previous.get('p99_ms'):
+            line += (f"   vs baseline: req/s {100 * (stats['rps'] / previous['rps'] - 1):+.0f}%, "
+                     f"p99 {100 * (stats['p99_ms'] / previous['p99_ms'] - 1):+.0f}%")
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', default='1000,100000', help='Comma-separated synthetic dataset sizes')
+    parser.add_argument('--data', help='Use this articles file instead of synthetic datasets')
+    parser.add_argument('--modes', default='flask', help='Comma-separated server modes: flask, asgi')
+    parser.add_argument('--url', help='Load a running server instead of starting one (no RSS)')
+    parser.add_argument('--concurrency', type=int, default=32, help='Concurrent keep-alive clients')
+    parser.add_argument('--duration', type=float, default=10, help='Seconds of load per mode and size')
+    parser.add_argument('--workers', type=int, default=1, help='uvicorn workers in asgi mode')
+    parser.add_argument('--no-cache', action='store_true', help='Disable the response cache in the servers')
+    parser.add_argument('--seed', type=int, default=42, help='Synthetic dataset seed')
+    parser.add_argument('--data-dir', default=os.path.join(tempfile.gettempdir(), 'api-loadtest'),
+                        help='Where generated datasets are kept')
+    parser.add_argument('--startup-timeout', type=float, default=600, help='Seconds to wait for a server to load')
+    parser.add_argument('--output', help='Results file (default: bench_results/<commit>.json)')
+    parser.add_argument('--baseline', help='Earlier results file to compare against')
+    args = parser.parse_args()
+
+    pool = build_mix(5000)
+    commit = git_commit()
+    results = {
+        "commit": commit,
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "config": {key: getattr(args, key) for key in ('concurrency', 'duration', 'workers', 'no_cache', 'seed')},
+        "runs": []
+    }
+    baseline = {}
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = {(run['mode'], run['size']): run for run in json.load(f)['runs']}
+
+    if args.url:
+        run = asyncio.run(load(args.url, pool, args.concurrency, args.duration))
+        run.update({"mode": "external", "size": None, "startup_s": 0.0, "rss_mb": None})
+        results['runs'].append(run)
+        print_run(run, baseline.get(('external', None)))
+    else:
+        datasets = [(None, args.data)] if args.data else [
+            (int(size), None) for size in args.sizes.split(',') if size.strip()
+        ]
+        for size, path in datasets:
+            if path is None:
+                print(f"Preparing {size} article dataset...")
+                path = synthetic_dataset(size, args.data_dir, args.seed)
+            else:
+                with open(path, 'r', encoding='utf-8') as f:
+                    size = len(json.load(f).get('articles', []))
+            for mode in args.modes.split(','):
+                mode = mode.strip()
+                run = dict(mode=mode, size=size, **run_server(mode, path, pool, args))
+                results['runs'].append(run)
+                print_run(run, baseline.get((mode, size)))
+
+    output = args.output or os.path.join(PROJECT_DIR, 'bench_results', f"{commit or 'results'}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2)
+    print(f"\n✓ Results saved to {output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,185 @@
+"""
+Request metrics in the Prometheus text format
+
+Every request's latency and response size are recorded in per-endpoint
+histograms, next to a counter per endpoint, method and status. /metrics
+exposes them together with gauges for the loaded snapshot: its article
+count, how long it took to load and how old the scrape behind it is.
+Metrics are kept per process, so a Prometheus server should scrape
+every worker (or run a single worker per instance).
+"""
+import time
+import threading
+from datetime import datetime
+
+from flask import g, request
+
+# Histogram bucket upper bounds: latency in seconds, sizes in bytes
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Label used for requests that matched no route, so 404 scans can't add label values
+UNMATCHED = 'unmatched'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _labels(**labels):
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in labels.items()) + '}'
+
+
+def _number(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Histogram:
+    """Cumulative-bucket histogram of one label set"""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        index = 0
+        for bound in self.buckets:
+            if value <= bound:
+                break
+            index += 1
+        self.counts[index] += 1
+        self.sum += value
+        self.count += 1
+
+    def lines(self, name, labels):
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float('inf'),), self.counts):
+            cumulative += count
+            yield f"{name}_bucket{_labels(**labels, le=_number(bound))} {cumulative}"
+        yield f"{name}_sum{_labels(**labels)} {_number(self.sum)}"
+        yield f"{name}_count{_labels(**labels)} {self.count}"
+
+
+def scrape_age(scraped_at, now=None):
+    """Seconds since an ISO scraped_at timestamp (naive ones are local time, as the scraper writes them)"""
+    if not scraped_at:
+        return None
+    try:
+        scraped = datetime.fromisoformat(scraped_at.replace('Z', '+00:00'))
+    except (TypeError, ValueError, AttributeError):
+        return None
+    return (now if now is not None else time.time()) - scraped.timestamp()
+
+
+class Metrics:
+    """Request counters and histograms, plus snapshot gauges read at render time"""
+
+    def __init__(self, store, response_cache=None):
+        self.store = store
+        self.response_cache = response_cache
+        self.started_at = time.time()
+        self._requests = {}
+        self._latency = {}
+        self._sizes = {}
+        self._lock = threading.Lock()
+
+    def observe(self, endpoint, method, status, seconds, size=None):
+        """Record one finished request (size is None for streamed bodies)"""
+        with self._lock:
+            key = (endpoint, method, status)
+            self._requests[key] = self._requests.get(key, 0) + 1
+            latency = self._latency.get(endpoint)
+            if latency is None:
+                latency = self._latency[endpoint] = Histogram(LATENCY_BUCKETS)
+            latency.observe(seconds)
+            if size is not None:
+                sizes = self._sizes.get(endpoint)
+                if sizes is None:
+                    sizes = self._sizes[endpoint] = Histogram(SIZE_BUCKETS)
+                sizes.observe(size)
+
+    def _metric(self, lines, name, kind, help_text):
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format"""
+        with self._lock:
+            requests = sorted(self._requests.items())
+            latency = [line for endpoint, histogram in sorted(self._latency.items())
+                       for line in histogram.lines('api_request_duration_seconds', {'endpoint': endpoint})]
+            sizes = [line for endpoint, histogram in sorted(self._sizes.items())
+                     for line in histogram.lines('api_response_size_bytes', {'endpoint': endpoint})]
+
+        lines = []
+        self._metric(lines, 'api_requests_total', 'counter', 'Requests by endpoint, method and status code.')
+        for (endpoint, method, status), count in requests:
+            lines.append(f"api_requests_total{_labels(endpoint=endpoint, method=method, status=status)} {count}")
+
+        self._metric(lines, 'api_request_duration_seconds', 'histogram',
+                     'Time from receiving a request to returning its response headers.')
+        lines.extend(latency)
+
+        self._metric(lines, 'api_response_size_bytes', 'histogram', 'Response body sizes, as sent (not streamed).')
+        lines.extend(sizes)
+
+        if self.response_cache is not None:
+            self._metric(lines, 'api_response_cache_hits_total', 'counter', 'Responses served from the response cache.')
+            lines.append(f"api_response_cache_hits_total {self.response_cache.hits}")
+            self._metric(lines, 'api_response_cache_misses_total', 'counter', 'Responses the response cache had to compute.')
+            lines.append(f"api_response_cache_misses_total {self.response_cache.misses}")
+
+        snapshot = self.store.get()
+        now = time.time()
+        self._metric(lines, 'api_articles', 'gauge', 'Articles in the loaded snapshot.')
+        lines.append(f"api_articles {snapshot.data.get('total_articles', 0)}")
+
+        load_seconds = getattr(self.store, 'load_seconds', None)
+        if load_seconds is not None:
+            self._metric(lines, 'api_snapshot_load_seconds', 'gauge', 'Time it took to load the current snapshot.')
+            lines.append(f"api_snapshot_load_seconds {_number(load_seconds)}")
+        self._metric(lines, 'api_snapshot_loads_total', 'counter', 'Snapshots loaded by this process.')
+        lines.append(f"api_snapshot_loads_total {getattr(self.store, 'loads', 0)}")
+        self._metric(lines, 'api_snapshot_age_seconds', 'gauge', 'Seconds since the current snapshot was loaded.')
+        lines.append(f"api_snapshot_age_seconds {_number(now - snapshot.loaded_at)}")
+
+        age = scrape_age(snapshot.data.get('scraped_at'), now)
+        if age is not None:
+            self._metric(lines, 'api_scrape_age_seconds', 'gauge', 'Seconds since the scrape behind the current snapshot.')
+            lines.append(f"api_scrape_age_seconds {_number(age)}")
+
+        self._metric(lines, 'api_process_start_time_seconds', 'gauge', 'Start time of this process, in epoch seconds.')
+        lines.append(f"api_process_start_time_seconds {_number(self.started_at)}")
+        return '\n'.join(lines) + '\n'
+
+    def init_app(self, app):
+        """
+        Time every request and serve the metrics at /metrics
+        Call before the other extensions' init_app: after_request hooks run
+        in reverse order, so the size recorded is the body as finally sent
+        """
+
+        @app.before_request
+        def start_timer():
+            g.metrics_started = time.perf_counter()
+
+        @app.after_request
+        def record_request(response):
+            started = g.pop('metrics_started', None)
+            if started is not None:
+                size = None if response.is_streamed else response.calculate_content_length()
+                self.observe(request.endpoint or UNMATCHED, request.method, response.status_code,
+                             time.perf_counter() - started, size)
+            return response
+
+        def get_metrics():
+            return app.response_class(self.render(), content_type=CONTENT_TYPE,
+                                      headers={'Cache-Control': 'no-store'})
+
+        app.add_url_rule('/metrics', 'get_metrics', get_metrics)
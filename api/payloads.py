@@ -0,0 +1,95 @@
+from article_query import ArticleQuery
+from aggregates import publication_day
+
+# Number of most used tags reported by /api/stats
+TOP_TAGS = 20
+
+# Upper bound for per_page on /api/archive
+MAX_ARCHIVE_PAGE = 100
+
+
+def articles_payload(snapshot, args):
+    """
+    Body of /api/articles for a snapshot and the request's query parameters
+    Raises ValueError with a client-facing message for invalid parameters
+    """
+    query = ArticleQuery(args)
+    return {
+        "success": True,
+        "data": snapshot.query(query),
+        "scraped_at": snapshot.data.get('scraped_at')
+    }
+
+
+def sources_payload(snapshot):
+    """Body of /api/sources"""
+    return {
+        "success": True,
+        "data": {
+            "sources": snapshot.data.get('sources', [])
+        }
+    }
+
+
+def categories_payload(snapshot):
+    """Body of /api/categories"""
+    return {
+        "success": True,
+        "data": {
+            "categories": snapshot.aggregates.get('categories', [])
+        }
+    }
+
+
+def stats_payload(snapshot):
+    """Body of /api/stats"""
+    data = snapshot.data
+    aggregates = snapshot.aggregates
+    return {
+        "success": True,
+        "data": {
+            "total_articles": data.get('total_articles', 0),
+            "sources": data.get('sources', []),
+            "scraped_at": data.get('scraped_at'),
+            "articles_by_source": aggregates.get('by_source', {}),
+            "articles_by_category": aggregates.get('by_category', {}),
+            "articles_by_day": aggregates.get('by_day', {}),
+            "top_tags": [
+                {"tag": tag, "count": count}
+                for tag, count in list(aggregates.get('by_tag', {}).items())[:TOP_TAGS]
+            ]
+        }
+    }
+
+
+def archive_payload(archive, args):
+    """
+    Body of /api/archive: archived articles from all scrapes, newest first
+    Raises ValueError with a client-facing message for invalid parameters
+    """
+    date_from = args.get('date_from')
+    date_to = args.get('date_to')
+    day_from = publication_day(date_from)
+    day_to = publication_day(date_to)
+    if (date_from and day_from is None) or (date_to and day_to is None):
+        raise ValueError("date_from and date_to must be ISO 8601 dates")
+
+    page = max(1, args.get('page', type=int, default=1))
+    per_page = max(1, min(args.get('per_page', type=int, default=10), MAX_ARCHIVE_PAGE))
+
+    # Only the partitions and byte ranges covering this page are read
+    articles, total, days = archive.query(day_from, day_to, (page - 1) * per_page, per_page)
+
+    return {
+        "success": True,
+        "data": {
+            "articles": articles,
+            "days": days,
+            "pagination": {
+                "page": page,
+                "per_page": per_page,
+                "total": total,
+                "total_pages": (total + per_page - 1) // per_page
+            }
+        }
+    }
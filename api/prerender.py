@@ -0,0 +1,244 @@
+"""
+Pre-rendered responses for the most requested URLs
+
+Most traffic hits a handful of URLs whose responses only change when the
+scraper runs: the first page of /api/articles, overall and per category
+and source, plus /api/stats, /api/categories and /api/sources. After each
+scrape this renders them through the API itself and stores the bodies
+next to the articles file, in prerendered/:
+
+- <content hash>.json, plus .json.gz and .json.br (with brotli installed)
+  compressed once at the highest level, for bodies worth compressing
+- api/stats.json, api/categories.json and api/sources.json, stable copies
+  of the endpoints without parameters that Vercel's CDN serves directly
+  (see vercel.json)
+- manifest.json, mapping each URL (path and normalized query) to its
+  files, and naming the scrape they were rendered from
+
+The API serves a listed URL straight from these files, as long as they
+belong to the data it has loaded, and handles everything else as usual.
+
+    python api/prerender.py [all_articles.json]
+"""
+import os
+import sys
+import gzip
+import json
+import time
+import hashlib
+import threading
+from datetime import datetime
+from urllib.parse import urlencode
+
+from flask import request
+
+from http_cache import MIN_COMPRESS_SIZE, _choose_encoding, normalized_query
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; gzip is always available
+    brotli = None
+
+MANIFEST = 'manifest.json'
+
+# Endpoints that take no parameters, copied under stable names for the CDN
+STATIC_ENDPOINTS = ('/api/stats', '/api/categories', '/api/sources')
+
+# File suffix per content coding
+SUFFIXES = {'gzip': '.gz', 'br': '.br'}
+
+
+def prerender_dir(json_path):
+    """Where the pre-rendered responses of an articles file live"""
+    return os.getenv('PRERENDER_DIR') or os.path.join(os.path.dirname(os.path.abspath(json_path)), 'prerendered')
+
+
+def hot_urls(snapshot):
+    """(path, normalized query) of each pre-rendered URL of a snapshot"""
+    urls = [(path, '') for path in ('/api/articles',) + STATIC_ENDPOINTS]
+    urls += [('/api/articles', urlencode({'category': category})) for category in snapshot.aggregates.get('categories', [])]
+    urls += [('/api/articles', urlencode({'source': source})) for source in snapshot.data.get('sources', [])]
+    return urls
+
+
+def _write(path, body):
+    with open(path + '.tmp', 'wb') as f:
+        f.write(body)
+    os.replace(path + '.tmp', path)
+
+
+def prerender(json_path, out_dir=None):
+    """Render the hot URLs of an articles file and write their files and manifest; returns the manifest"""
+    out_dir = out_dir or prerender_dir(json_path)
+    # Render through the API itself, so the bodies are exactly what it would send
+    os.environ['ARTICLES_JSON'] = json_path
+    os.environ.pop('ARTICLES_DB', None)
+    os.environ['PRERENDER_DIR'] = os.devnull
+    import index
+    client = index.app.test_client()
+    snapshot = index.article_store.get()
+    data = snapshot.data
+
+    os.makedirs(os.path.join(out_dir, 'api'), exist_ok=True)
+    previous = load_manifest(out_dir) or {}
+    routes = {}
+    for path, query in hot_urls(snapshot):
+        alias = os.path.join(out_dir, 'api', os.path.basename(path) + '.json') if path in STATIC_ENDPOINTS else None
+        response = client.get(f"{path}?{query}" if query else path)
+        if response.status_code != 200:
+            # Never leave the CDN an older copy of a response that can't be rendered now
+            if alias and os.path.exists(alias):
+                os.remove(alias)
+            continue
+        body = response.get_data()
+        digest = hashlib.sha256(body).hexdigest()[:20]
+        files = {'identity': f"{digest}.json"}
+        if len(body) >= MIN_COMPRESS_SIZE:
+            files['gzip'] = files['identity'] + SUFFIXES['gzip']
+            if brotli is not None:
+                files['br'] = files['identity'] + SUFFIXES['br']
+        # Content-addressed, so a file that exists already has the right content
+        for encoding, name in files.items():
+            target = os.path.join(out_dir, name)
+            if os.path.exists(target):
+                continue
+            if encoding == 'gzip':
+                _write(target, gzip.compress(body, compresslevel=9, mtime=0))
+            elif encoding == 'br':
+                _write(target, brotli.compress(body, quality=11))
+            else:
+                _write(target, body)
+        if alias:
+            _write(alias, body)
+        routes[f"{path}?{query}" if query else path] = {"hash": digest, "size": len(body), "files": files}
+
+    manifest = {
+        "scraped_at": data.get('scraped_at'),
+        "total_articles": data.get('total_articles', 0),
+        "generated_at": datetime.now().isoformat(),
+        "routes": routes
+    }
+    _write(os.path.join(out_dir, MANIFEST), json.dumps(manifest, indent=2, ensure_ascii=False).encode('utf-8'))
+
+    # Drop files neither this manifest nor the previous one uses (running APIs may still serve those)
+    keep = {name for manifest_routes in (routes, previous.get('routes', {}))
+            for route in manifest_routes.values() for name in route['files'].values()}
+    for name in os.listdir(out_dir):
+        if name.endswith(('.json', '.gz', '.br')) and name != MANIFEST and name not in keep:
+            os.remove(os.path.join(out_dir, name))
+    return manifest
+
+
+def load_manifest(directory):
+    try:
+        with open(os.path.join(directory, MANIFEST), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+class PrerenderedResponses:
+    """
+    Serves the pre-rendered bodies of the manifest's URLs, when they were
+    rendered from the snapshot currently loaded
+    """
+
+    def __init__(self, directory, store, check_interval=None):
+        self.directory = directory
+        self.store = store
+        if check_interval is None:
+            check_interval = float(os.getenv('ARTICLES_RELOAD_INTERVAL', '1.0'))
+        self.check_interval = check_interval
+        self.served = 0
+        self._signature = None
+        self._last_check = 0.0
+        self._manifest = None
+        self._bodies = {}
+        self._lock = threading.Lock()
+
+    def _stat_signature(self):
+        try:
+            stat = os.stat(os.path.join(self.directory, MANIFEST))
+        except OSError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def _load(self, manifest):
+        """Every body of a manifest, read once so requests never touch the disk"""
+        bodies = {}
+        for key, route in manifest.get('routes', {}).items():
+            try:
+                bodies[key] = {encoding: _read(os.path.join(self.directory, name))
+                               for encoding, name in route['files'].items()}
+            except OSError:
+                continue
+        return bodies
+
+    def _current(self):
+        if time.monotonic() - self._last_check >= self.check_interval:
+            with self._lock:
+                self._last_check = time.monotonic()
+                signature = self._stat_signature()
+                if signature != self._signature:
+                    manifest = load_manifest(self.directory) if signature else None
+                    self._bodies = self._load(manifest) if manifest else {}
+                    self._manifest = manifest
+                    self._signature = signature
+        return self._manifest, self._bodies
+
+    def find(self, snapshot, path, query, accept_encoding):
+        """(body, content coding or None) for a URL, or None if it wasn't pre-rendered for this snapshot"""
+        manifest, bodies = self._current()
+        if manifest is None:
+            return None
+        variants = bodies.get(f"{path}?{query}" if query else path)
+        if variants is None:
+            return None
+        data = snapshot.data
+        if manifest.get('scraped_at') != data.get('scraped_at') or manifest.get('total_articles') != data.get('total_articles'):
+            return None
+        encoding = _choose_encoding(accept_encoding) if len(variants) > 1 else None
+        if encoding not in variants:
+            encoding = 'gzip' if encoding and 'gzip' in variants else None
+        self.served += 1
+        return variants[encoding or 'identity'], encoding
+
+    def init_app(self, app):
+        """
+        Answer pre-rendered URLs before the view runs
+        Call after http_cache.init_app, so conditional requests still get a 304 first
+        """
+
+        @app.before_request
+        def serve_prerendered():
+            if request.method not in ('GET', 'HEAD'):
+                return None
+            found = self.find(self.store.get(), request.path, normalized_query(),
+                              request.headers.get('Accept-Encoding', ''))
+            if found is None:
+                return None
+            body, encoding = found
+            response = app.response_class(body, mimetype='application/json')
+            if encoding:
+                response.headers['Content-Encoding'] = encoding
+            return response
+
+
+def _read(path):
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+def main():
+    json_path = sys.argv[1] if len(sys.argv) > 1 else os.path.join(
+        os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'all_articles.json')
+    start = time.perf_counter()
+    out_dir = prerender_dir(json_path)
+    manifest = prerender(os.path.abspath(json_path), out_dir)
+    print(f"✓ Pre-rendered {len(manifest['routes'])} responses into {out_dir} ({time.perf_counter() - start:.2f}s)")
+
+
+if __name__ == '__main__':
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    main()
@@ -0,0 +1,107 @@
+import re
+import threading
+from collections import OrderedDict
+
+try:
+    import orjson
+except ImportError:  # orjson is optional; projections are built as plain dicts otherwise
+    orjson = None
+
+# Raw JSON fragments need orjson 3.9.15 or later
+Fragment = getattr(orjson, 'Fragment', None)
+
+# Response shapes for /api/articles: a list of objects, or one array per field
+SHAPES = ('rows', 'columns')
+
+FIELD_PATTERN = re.compile(r'^\w+$')
+
+
+def parse_fields(value):
+    """
+    Parse a comma-separated fields parameter into a sorted tuple of names
+    Returns None when no projection was requested; raises ValueError if invalid
+    """
+    if value is None:
+        return None
+    fields = {name.strip() for name in value.split(',') if name.strip()}
+    if not fields or not all(FIELD_PATTERN.match(name) for name in fields):
+        raise ValueError("fields must be a comma-separated list of article fields")
+    # Sorted like every other JSON object the API returns
+    return tuple(sorted(fields))
+
+
+def field_names(articles):
+    """Every field used by any of the articles, sorted"""
+    names = set()
+    for article in articles:
+        names.update(article)
+    return tuple(sorted(names))
+
+
+def project(articles, fields):
+    """Articles reduced to the given fields (missing fields are left out)"""
+    return [{name: article[name] for name in fields if name in article} for article in articles]
+
+
+def columns(articles, fields):
+    """One array per field, with null where an article lacks the field"""
+    return {name: [article.get(name) for article in articles] for name in fields}
+
+
+class FieldFragments:
+    """
+    Serialized JSON of every article's field values, built lazily per field
+    Projected rows and columns are joined from these fragments instead of
+    re-serializing the articles on every request. Requires orjson.Fragment
+    """
+
+    # Distinct field sets whose serialized rows are kept
+    MAX_ROW_SETS = 16
+
+    def __init__(self, articles):
+        self.articles = articles
+        self._columns = {}
+        self._rows = OrderedDict()
+        self._lock = threading.Lock()
+
+    def column(self, name):
+        """Serialized value of a field for every article (None where it is missing)"""
+        column = self._columns.get(name)
+        if column is None:
+            column = [
+                orjson.dumps(article[name], option=orjson.OPT_SORT_KEYS) if name in article else None
+                for article in self.articles
+            ]
+            self._columns[name] = column
+        return column
+
+    def _row_fragments(self, fields):
+        """Serialized projected object of every article for a field set"""
+        with self._lock:
+            rows = self._rows.get(fields)
+            if rows is not None:
+                self._rows.move_to_end(fields)
+                return rows
+        parts = [(orjson.dumps(name) + b':', self.column(name)) for name in fields]
+        rows = [
+            b'{' + b','.join([key + column[position] for key, column in parts if column[position] is not None]) + b'}'
+            for position in range(len(self.articles))
+        ]
+        with self._lock:
+            self._rows[fields] = rows
+            while len(self._rows) > self.MAX_ROW_SETS:
+                self._rows.popitem(last=False)
+        return rows
+
+    def rows(self, positions, fields):
+        """Projected articles at positions, as one raw JSON array"""
+        rows = self._row_fragments(fields)
+        return Fragment(b'[' + b','.join([rows[position] for position in positions]) + b']')
+
+    def columns(self, positions, fields):
+        """One raw JSON array per field for the articles at positions"""
+        result = {}
+        for name in fields:
+            column = self.column(name)
+            result[name] = Fragment(b'[' + b','.join([column[position] or b'null' for position in positions]) + b']')
+        return result
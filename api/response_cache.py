@@ -0,0 +1,159 @@
+import os
+import threading
+from collections import OrderedDict
+from functools import wraps
+
+from flask import current_app, request
+from flask.json.provider import DefaultJSONProvider
+
+from http_cache import normalized_query
+
+try:
+    import orjson
+except ImportError:  # orjson is optional; Flask's json provider is used otherwise
+    orjson = None
+
+
+class OrjsonProvider(DefaultJSONProvider):
+    """Flask JSON provider that serializes with orjson"""
+
+    def dumps(self, obj, **kwargs):
+        option = orjson.OPT_SORT_KEYS if self.sort_keys else 0
+        return orjson.dumps(obj, default=self.default, option=option).decode('utf-8')
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        option = orjson.OPT_SORT_KEYS if self.sort_keys else 0
+        return self._app.response_class(
+            orjson.dumps(obj, default=self.default, option=option),
+            mimetype=self.mimetype
+        )
+
+
+class _Flight:
+    """A computation other requests for the same key are waiting on"""
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.body = None
+
+
+class ResponseCache:
+    """
+    Bounded LRU of serialized JSON response bodies
+    Entries are keyed by path and normalized query and belong to one snapshot
+    version; the cache is emptied as soon as a newer snapshot is seen.
+    Concurrent misses for the same key are computed only once
+    """
+
+    def __init__(self, store, max_entries=None, max_bytes=None):
+        self.store = store
+        if max_entries is None:
+            max_entries = int(os.getenv('RESPONSE_CACHE_SIZE', '256'))
+        if max_bytes is None:
+            max_bytes = int(os.getenv('RESPONSE_CACHE_MAX_BYTES', str(64 * 1024 * 1024)))
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._size = 0
+        self._version = None
+        self._inflight = {}
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        """Serialize JSON responses with orjson when it is installed"""
+        if orjson is not None:
+            app.json = OrjsonProvider(app)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    def _store(self, key, body):
+        # Oversized bodies would evict everything else for a single entry
+        if len(body) > self.max_bytes // 4:
+            return
+        self._entries[key] = body
+        self._size += len(body)
+        while self._entries and (len(self._entries) > self.max_entries or self._size > self.max_bytes):
+            _, evicted = self._entries.popitem(last=False)
+            self._size -= len(evicted)
+
+    def lookup(self, version, key):
+        """The cached body for key, or None; never computes or waits, so it is safe on an event loop"""
+        with self._lock:
+            if version != self._version:
+                return None
+            body = self._entries.get(key)
+            if body is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+            return body
+
+    def get_or_compute(self, version, key, compute):
+        """
+        Return the cached body for key, or call compute() to produce a response
+        Returns either bytes (cached body) or the response compute() returned
+        """
+        with self._lock:
+            if version != self._version:
+                self._entries.clear()
+                self._size = 0
+                self._version = version
+            body = self._entries.get(key)
+            if body is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return body
+            self.misses += 1
+            # Keyed by version too, so a request for a newer snapshot never waits on an older render
+            flight_key = (version, key)
+            flight = self._inflight.get(flight_key)
+            leader = flight is None
+            if leader:
+                flight = self._inflight[flight_key] = _Flight()
+
+        if not leader:
+            flight.event.wait()
+            if flight.body is not None:
+                return flight.body
+            # The leader's response wasn't cacheable (e.g. an error)
+            return compute()
+
+        try:
+            response = compute()
+            if response.status_code == 200 and response.is_json and not response.is_streamed:
+                flight.body = response.get_data()
+                with self._lock:
+                    if version == self._version:
+                        self._store(key, flight.body)
+            return response
+        finally:
+            with self._lock:
+                self._inflight.pop(flight_key, None)
+            flight.event.set()
+
+    def cached(self, view):
+        """Decorator caching a view's serialized 200 JSON responses"""
+
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if self.max_entries <= 0:
+                return view(*args, **kwargs)
+            key = (request.path, normalized_query())
+            result = self.get_or_compute(
+                self.store.get().version,
+                key,
+                lambda: current_app.make_response(view(*args, **kwargs))
+            )
+            if isinstance(result, bytes):
+                return current_app.response_class(result, mimetype='application/json')
+            return result
+
+        return wrapper
@@ -0,0 +1,119 @@
+import re
+import math
+import heapq
+from bisect import bisect_left
+
+TOKEN_PATTERN = re.compile(r'\w+', re.UNICODE)
+
+# Relative weight of a term occurrence in each field
+FIELD_WEIGHTS = (('title', 2.0), ('description', 1.0), ('tags', 1.5))
+
+# BM25 parameters
+K1 = 1.2
+B = 0.75
+
+# Prefix matches score lower than exact matches and are capped per term
+PREFIX_WEIGHT = 0.5
+MIN_PREFIX_LENGTH = 2
+MAX_PREFIX_EXPANSIONS = 64
+
+
+def tokenize(text):
+    """Split text into lowercase word tokens"""
+    if not text:
+        return []
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+class SearchIndex:
+    """
+    Inverted index over article title, description and tags
+    Queries are AND-ed across terms, each term also matches words it is a
+    prefix of, and results are ranked with BM25
+    """
+
+    def __init__(self, articles):
+        self.size = len(articles)
+        self.postings = {}
+        self.doc_lengths = []
+
+        for position, article in enumerate(articles):
+            frequencies = {}
+            length = 0.0
+            for field, weight in FIELD_WEIGHTS:
+                value = article.get(field)
+                if field == 'tags':
+                    value = ' '.join(t for t in (value or []) if isinstance(t, str))
+                for token in tokenize(value):
+                    frequencies[token] = frequencies.get(token, 0.0) + weight
+                    length += weight
+            self.doc_lengths.append(length)
+            for token, frequency in frequencies.items():
+                self.postings.setdefault(token, {})[position] = frequency
+
+        self.average_length = (sum(self.doc_lengths) / self.size) if self.size else 0.0
+        self.vocabulary = sorted(self.postings)
+
+    def _idf(self, postings):
+        df = len(postings)
+        return math.log(1 + (self.size - df + 0.5) / (df + 0.5))
+
+    def _expand(self, term):
+        """Vocabulary terms matched by a query term, with their weights"""
+        expansions = {}
+        if term in self.postings:
+            expansions[term] = 1.0
+        if len(term) >= MIN_PREFIX_LENGTH:
+            start = bisect_left(self.vocabulary, term)
+            end = bisect_left(self.vocabulary, term + '\U0010ffff', start)
+            candidates = [t for t in self.vocabulary[start:end] if t != term]
+            if len(candidates) > MAX_PREFIX_EXPANSIONS:
+                # Keep the most common completions
+                candidates = heapq.nlargest(MAX_PREFIX_EXPANSIONS, candidates, key=lambda t: len(self.postings[t]))
+            for candidate in candidates:
+                expansions[candidate] = PREFIX_WEIGHT
+        return expansions
+
+    def search(self, query, allowed=None):
+        """
+        Rank articles matching every term of the query
+        allowed optionally restricts the result to a set of positions.
+        Returns positions sorted by descending relevance
+        """
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms:
+            return []
+
+        expanded = [self._expand(term) for term in terms]
+        if any(not e for e in expanded):
+            return []
+
+        # Documents matching each term, intersected from the rarest term up
+        matches = []
+        for expansions in expanded:
+            docs = set()
+            for token in expansions:
+                docs.update(self.postings[token])
+            matches.append(docs)
+        matches.sort(key=len)
+        candidates = matches[0] if allowed is None else matches[0] & allowed
+        for docs in matches[1:]:
+            candidates = candidates & docs
+            if not candidates:
+                return []
+
+        scores = dict.fromkeys(candidates, 0.0)
+        for expansions in expanded:
+            for token, weight in expansions.items():
+                postings = self.postings[token]
+                idf = self._idf(postings) * weight
+                if len(postings) < len(candidates):
+                    hits = [(p, f) for p, f in postings.items() if p in candidates]
+                else:
+                    hits = [(p, postings[p]) for p in candidates if p in postings]
+                for position, frequency in hits:
+                    norm = K1 * (1 - B + B * self.doc_lengths[position] / self.average_length)
+                    scores[position] += idf * frequency * (K1 + 1) / (frequency + norm)
+
+        # Ties keep file order
+        return sorted(scores, key=lambda p: (-scores[p], p))
@@ -0,0 +1,159 @@
+"""
+Semantic search and related articles over the scraper's embeddings
+
+The scraper stores an embedding of every article's title and description,
+plus each article's most similar articles, next to the articles file (see
+embeddings.py). Related articles are read from those precomputed lists.
+Semantic search embeds the query with the same Ollama model, over Ollama's
+HTTP API (OLLAMA_HOST), and ranks all articles by cosine similarity with
+one matrix-vector product; it needs NumPy, related articles don't.
+"""
+import os
+import json
+import time
+import threading
+from functools import lru_cache
+from urllib.error import URLError
+from urllib.request import Request, urlopen
+
+from article import article_id, as_dict
+from embeddings import ArticleEmbeddings, embeddings_paths, np
+
+OLLAMA_HOST = os.getenv('OLLAMA_HOST', 'http://localhost:11434')
+
+# Seconds to wait for Ollama to embed a query
+EMBED_TIMEOUT = 10
+
+# Results per request, and the upper bound for limit
+DEFAULT_LIMIT = 10
+MAX_LIMIT = 50
+
+
+class SemanticUnavailable(Exception):
+    """Semantic search or related articles can't be served by this deployment"""
+
+
+@lru_cache(maxsize=256)
+def embed_query(text, model):
+    """Embedding of a search query, from Ollama"""
+    body = json.dumps({"model": model, "input": text}).encode('utf-8')
+    request = Request(OLLAMA_HOST.rstrip('/') + '/api/embed', data=body, headers={'Content-Type': 'application/json'})
+    try:
+        with urlopen(request, timeout=EMBED_TIMEOUT) as response:
+            return tuple(json.loads(response.read())['embeddings'][0])
+    except (URLError, OSError, ValueError, KeyError, IndexError) as e:
+        raise SemanticUnavailable(f"Could not embed the query with {model}: {e}")
+
+
+def _limit(args):
+    return max(1, min(args.get('limit', type=int, default=DEFAULT_LIMIT), MAX_LIMIT))
+
+
+def _result(article, id, score):
+    return dict(as_dict(article), id=id, score=score)
+
+
+class SemanticIndex:
+    """
+    The embeddings of an articles file, reloaded when the scraper rewrites them
+    Also maps article ids to the articles of the current snapshot
+    """
+
+    def __init__(self, json_path, check_interval=None):
+        self.json_path = json_path
+        self.meta_path = embeddings_paths(json_path)[1]
+        if check_interval is None:
+            check_interval = float(os.getenv('ARTICLES_RELOAD_INTERVAL', '1.0'))
+        self.check_interval = check_interval
+        self._embeddings = None
+        self._signature = None
+        self._last_check = 0.0
+        self._by_id = (None, {})
+        self._lock = threading.Lock()
+
+    def _stat_signature(self):
+        try:
+            stat = os.stat(self.meta_path)
+        except OSError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def get(self):
+        """The current embeddings, or None if none were built"""
+        if time.monotonic() - self._last_check < self.check_interval:
+            return self._embeddings
+        with self._lock:
+            self._last_check = time.monotonic()
+            signature = self._stat_signature()
+            if signature != self._signature:
+                self._embeddings = ArticleEmbeddings.load(self.json_path) if signature else None
+                self._signature = signature
+            return self._embeddings
+
+    def articles_by_id(self, snapshot):
+        """The snapshot's articles by article id, built once per snapshot"""
+        version, by_id = self._by_id
+        if version != snapshot.version:
+            articles = getattr(snapshot, 'articles', None)
+            if articles is None:
+                raise SemanticUnavailable("Semantic search and related articles need the JSON articles file")
+            by_id = {}
+            for article in articles:
+                by_id.setdefault(article_id(article.get('url')), article)
+            self._by_id = (snapshot.version, by_id)
+        return by_id
+
+    def _require(self):
+        embeddings = self.get()
+        if embeddings is None:
+            raise SemanticUnavailable("No embeddings have been built for these articles")
+        return embeddings
+
+    def related_payload(self, snapshot, id, args):
+        """
+        Body of /api/articles/<id>/related
+        Raises LookupError for unknown articles and SemanticUnavailable without embeddings
+        """
+        embeddings = self._require()
+        by_id = self.articles_by_id(snapshot)
+        if id not in by_id:
+            raise LookupError("Article not found")
+        results = [_result(by_id[other], other, score)
+                   for other, score in embeddings.related.get(id, []) if other in by_id][:_limit(args)]
+        return {
+            "success": True,
+            "data": {
+                "id": id,
+                "articles": results,
+                "count": len(results)
+            },
+            "scraped_at": snapshot.data.get('scraped_at')
+        }
+
+    def search_payload(self, snapshot, args):
+        """
+        Body of /api/search/semantic
+        Raises ValueError for a missing query and SemanticUnavailable when it can't be answered
+        """
+        query = (args.get('q') or '').strip()
+        if not query:
+            raise ValueError("q is required")
+        embeddings = self._require()
+        if np is None or embeddings.matrix is None:
+            raise SemanticUnavailable("Semantic search needs NumPy on the server")
+        by_id = self.articles_by_id(snapshot)
+        vector = embed_query(query, embeddings.model)
+        try:
+            matches = embeddings.similar(vector, _limit(args))
+        except ValueError:
+            raise SemanticUnavailable(f"The query embedding doesn't match the stored embeddings ({embeddings.model})")
+        results = [_result(by_id[id], id, score) for id, score in matches if id in by_id]
+        return {
+            "success": True,
+            "data": {
+                "query": query,
+                "articles": results,
+                "count": len(results)
+            },
+            "scraped_at": snapshot.data.get('scraped_at')
+        }
@@ -0,0 +1,147 @@
+import os
+import json
+import time
+import threading
+from collections import OrderedDict
+
+from article import as_dict
+
+try:
+    import orjson
+except ImportError:  # orjson is optional; the json module is used otherwise
+    orjson = None
+
+# NDJSON lines are written out in chunks of about this many bytes
+NDJSON_CHUNK_SIZE = 64 * 1024
+
+# Server-sent events timing, in seconds. A stream ends after SSE_MAX_DURATION
+# (serverless platforms cap request time) and the client resumes with Last-Event-ID
+SSE_POLL_INTERVAL = float(os.getenv('SSE_POLL_INTERVAL', '1.0'))
+SSE_HEARTBEAT_INTERVAL = 15
+SSE_MAX_DURATION = float(os.getenv('SSE_MAX_DURATION', '300'))
+SSE_RETRY_MS = 3000
+
+
+def dumps(payload):
+    """Serialize like the Flask app's JSON provider (sorted keys, compact) to bytes"""
+    if orjson is not None:
+        return orjson.dumps(payload, option=orjson.OPT_SORT_KEYS)
+    return json.dumps(payload, sort_keys=True, separators=(',', ':')).encode('utf-8')
+
+
+def _project(article, fields):
+    if fields is None:
+        return as_dict(article)
+    return {name: article[name] for name in fields if name in article}
+
+
+def ndjson_chunks(articles, fields=None):
+    """Serialize articles one per line, yielding chunks so memory stays constant"""
+    buffer = []
+    size = 0
+    for article in articles:
+        line = dumps(_project(article, fields)) + b'\n'
+        buffer.append(line)
+        size += len(line)
+        if size >= NDJSON_CHUNK_SIZE:
+            yield b''.join(buffer)
+            buffer = []
+            size = 0
+    if buffer:
+        yield b''.join(buffer)
+
+
+def sse_event(event, data, event_id=None):
+    """Format one server-sent event with a JSON data line"""
+    lines = []
+    if event_id is not None:
+        lines.append(b'id: ' + event_id.encode('utf-8'))
+    lines.append(b'event: ' + event.encode('utf-8'))
+    lines.append(b'data: ' + dumps(data))
+    return b'\n'.join(lines) + b'\n\n'
+
+
+class ArticleEvents:
+    """
+    Server-sent events announcing the articles added by each new snapshot
+    Every batch of 'article' events ends with a 'snapshot' event whose id is
+    the data version, so a client resuming with that Last-Event-ID receives
+    exactly the articles added since. The diff needs the article URLs of the
+    version the client last saw; the last few versions seen by this process
+    are kept, and an unknown version gets a 'reset' event instead
+    """
+
+    def __init__(self, store, history=8):
+        self.store = store
+        self.history = history
+        self._urls = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _remember(self, snapshot):
+        with self._lock:
+            if snapshot.version in self._urls:
+                self._urls.move_to_end(snapshot.version)
+                return
+        urls = snapshot.urls()
+        with self._lock:
+            self._urls[snapshot.version] = urls
+            while len(self._urls) > self.history:
+                self._urls.popitem(last=False)
+
+    def _summary(self, snapshot, new_articles):
+        return {
+            "version": snapshot.version,
+            "scraped_at": snapshot.data.get('scraped_at'),
+            "total_articles": snapshot.data.get('total_articles', 0),
+            "new_articles": new_articles
+        }
+
+    def catch_up(self, last_version, snapshot, query):
+        """Events bringing a client from last_version up to snapshot"""
+        if last_version is None or last_version == snapshot.version:
+            return sse_event('snapshot', self._summary(snapshot, 0), snapshot.version)
+        with self._lock:
+            seen = self._urls.get(last_version)
+        if seen is None:
+            # Too old, or from another instance: the client should refetch
+            return sse_event('reset', self._summary(snapshot, None), snapshot.version)
+
+        events = []
+        for article in snapshot.iter_articles(query):
+            if article.get('url') not in seen:
+                events.append(sse_event('article', _project(article, query.fields)))
+        events.append(sse_event('snapshot', self._summary(snapshot, len(events)), snapshot.version))
+        return b''.join(events)
+
+    def events(self, last_version, query):
+        """
+        Event stream for one client, as bytes to send
+        None is yielded whenever the caller should wait SSE_POLL_INTERVAL
+        """
+        yield f'retry: {SSE_RETRY_MS}\n\n'.encode('ascii')
+        started = last_sent = time.monotonic()
+        snapshot = self.store.get()
+        self._remember(snapshot)
+        yield self.catch_up(last_version, snapshot, query)
+        last_version = snapshot.version
+
+        while time.monotonic() - started < SSE_MAX_DURATION:
+            yield None
+            snapshot = self.store.get()
+            now = time.monotonic()
+            if snapshot.version != last_version:
+                self._remember(snapshot)
+                yield self.catch_up(last_version, snapshot, query)
+                last_version = snapshot.version
+                last_sent = now
+            elif now - last_sent >= SSE_HEARTBEAT_INTERVAL:
+                yield b': keep-alive\n\n'
+                last_sent = now
+
+    def stream(self, last_version, query):
+        """events() for WSGI servers, sleeping between polls"""
+        for chunk in self.events(last_version, query):
+            if chunk is None:
+                time.sleep(SSE_POLL_INTERVAL)
+            else:
+                yield chunk
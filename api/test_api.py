@@ -115,6 +115,18 @@ try:
 except Exception as e:
     print(f"Error: {e}")
 
+# Test 10: Facets over filters that match nothing in common
+print("\n10. Testing GET /api/articles?source=The Verge&category=Education&facets=")
+try:
+    response = requests.get(f"{base_url}/api/articles", params={"source": "The Verge", "category": "Education", "facets": ""})
+    print(f"Status: {response.status_code}")
+    assert response.status_code == 200, "facets over an empty intersection must not fail"
+    data = response.json()
+    print(f"Total: {data['data']['total']}")
+    print(f"Facets: {json.dumps(data['data']['facets'])}")
+except Exception as e:
+    print(f"Error: {e}")
+
 print("\n" + "=" * 60)
 print("All tests completed!")
 print("=" * 60)
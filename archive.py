@@ -0,0 +1,246 @@
+"""
+Append-only article archive partitioned by publication day
+
+Each UTC day has an NDJSON segment (YYYY-MM-DD.ndjson) holding one article
+per line, and a sidecar offset index (YYYY-MM-DD.idx) holding the end
+offset of every line as unsigned 64-bit integers. The index is written
+after the line it points to, so a reader that only trusts the index never
+sees a partial record, and a page of records can be read from a
+memory-mapped segment without touching the rest of it.
+
+Compact partitions and apply the retention policy with:
+
+    python archive.py compact archive/
+"""
+import os
+import sys
+import json
+import mmap
+import hashlib
+from array import array
+from datetime import datetime, timedelta, timezone
+from typing import List, Dict, Optional, Tuple
+
+from aggregates import publication_day
+from article import as_dict
+
+SEGMENT_SUFFIX = '.ndjson'
+INDEX_SUFFIX = '.idx'
+OFFSET_SIZE = array('Q').itemsize
+
+# Partitions older than this many days are dropped by compact()
+RETENTION_DAYS = int(os.getenv('ARCHIVE_RETENTION_DAYS', '180'))
+
+
+def _encode(record: Dict) -> bytes:
+    return json.dumps(record, ensure_ascii=False, sort_keys=True, separators=(',', ':')).encode('utf-8') + b'\n'
+
+
+def _digest(line: bytes) -> str:
+    return hashlib.sha1(line).hexdigest()
+
+
+class ArticleArchive:
+    """Day-partitioned NDJSON archive with per-partition offset indexes."""
+
+    def __init__(self, root: str, retention_days: int = RETENTION_DAYS):
+        self.root = root
+        self.retention_days = retention_days
+
+    def _paths(self, day: str) -> Tuple[str, str]:
+        base = os.path.join(self.root, day)
+        return base + SEGMENT_SUFFIX, base + INDEX_SUFFIX
+
+    def partitions(self) -> List[str]:
+        """Days that have an index, oldest first."""
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(name[:-len(INDEX_SUFFIX)] for name in os.listdir(self.root) if name.endswith(INDEX_SUFFIX))
+
+    def count(self, day: str) -> int:
+        """Number of complete records in a partition (from the index size alone)."""
+        try:
+            return os.path.getsize(self._paths(day)[1]) // OFFSET_SIZE
+        except OSError:
+            return 0
+
+    # Writing
+
+    def _read_partition(self, day: str) -> List[bytes]:
+        """Every complete line of a partition, in append order."""
+        segment_path, index_path = self._paths(day)
+        if not os.path.exists(index_path):
+            return []
+        offsets = array('Q')
+        with open(index_path, 'rb') as f:
+            offsets.frombytes(f.read())
+        with open(segment_path, 'rb') as f:
+            content = f.read(offsets[-1] if offsets else 0)
+        lines = []
+        start = 0
+        for end in offsets:
+            lines.append(content[start:end])
+            start = end
+        return lines
+
+    def append(self, articles: List[Dict], scraped_at: Optional[str] = None) -> List[str]:
+        """
+        Append articles to their publication-day partitions.
+        Records identical to one already in the partition are skipped.
+        Returns the days that received new records.
+        """
+        os.makedirs(self.root, exist_ok=True)
+        scraped_at = scraped_at or datetime.now().isoformat()
+        fallback_day = scraped_at[:10]
+
+        by_day = {}
+        for article in articles:
+            record = dict(as_dict(article))
+            record['scraped_at'] = scraped_at
+            day = publication_day(article.get('published_date')) or fallback_day
+            by_day.setdefault(day, []).append(record)
+
+        changed = []
+        for day, records in sorted(by_day.items()):
+            # Compare without scraped_at so re-scraping an unchanged article is a no-op
+            existing = set()
+            for line in self._read_partition(day):
+                record = json.loads(line)
+                record.pop('scraped_at', None)
+                existing.add(_digest(_encode(record)))
+
+            segment_path, index_path = self._paths(day)
+            appended = 0
+            with open(segment_path, 'ab') as segment, open(index_path, 'ab') as index:
+                # Start from the end of the last indexed record, dropping any torn write
+                indexed = self.count(day)
+                end = 0
+                if indexed:
+                    with open(index_path, 'rb') as f:
+                        f.seek((indexed - 1) * OFFSET_SIZE)
+                        end = array('Q', f.read(OFFSET_SIZE))[0]
+                segment.truncate(end)
+                index.truncate(indexed * OFFSET_SIZE)
+                for record in records:
+                    comparable = dict(record)
+                    comparable.pop('scraped_at')
+                    digest = _digest(_encode(comparable))
+                    if digest in existing:
+                        continue
+                    existing.add(digest)
+                    line = _encode(record)
+                    segment.write(line)
+                    segment.flush()
+                    end += len(line)
+                    index.write(array('Q', [end]).tobytes())
+                    index.flush()
+                    appended += 1
+            if appended:
+                changed.append(day)
+        return changed
+
+    def compact(self, days: Optional[List[str]] = None, today: Optional[datetime] = None):
+        """
+        Drop partitions past the retention period and rewrite the given
+        partitions (all of them by default) keeping only the latest record per URL.
+        """
+        today = today or datetime.now(timezone.utc)
+        cutoff = (today - timedelta(days=self.retention_days)).date().isoformat()
+        for day in self.partitions():
+            if day < cutoff:
+                for path in self._paths(day):
+                    if os.path.exists(path):
+                        os.remove(path)
+
+        for day in (days if days is not None else self.partitions()):
+            if day < cutoff or not os.path.exists(self._paths(day)[1]):
+                continue
+            latest = {}
+            for line in self._read_partition(day):
+                url = json.loads(line).get('url') or _digest(line)
+                latest.pop(url, None)
+                latest[url] = line
+
+            segment_path, index_path = self._paths(day)
+            offsets = array('Q')
+            end = 0
+            for line in latest.values():
+                end += len(line)
+                offsets.append(end)
+            with open(segment_path + '.tmp', 'wb') as f:
+                f.writelines(latest.values())
+            with open(index_path + '.tmp', 'wb') as f:
+                offsets.tofile(f)
+            os.replace(segment_path + '.tmp', segment_path)
+            os.replace(index_path + '.tmp', index_path)
+
+    # Reading
+
+    def read_range(self, day: str, start: int, stop: int) -> List[Dict]:
+        """
+        Records [start, stop) of a partition, read through mmap so only the
+        requested byte ranges are touched.
+        """
+        segment_path, index_path = self._paths(day)
+        stop = min(stop, self.count(day))
+        if start >= stop:
+            return []
+        with open(index_path, 'rb') as f:
+            first = max(start - 1, 0)
+            f.seek(first * OFFSET_SIZE)
+            offsets = array('Q', f.read((stop - first) * OFFSET_SIZE))
+        if start > 0:
+            begin, offsets = offsets[0], offsets[1:]
+        else:
+            begin = 0
+
+        records = []
+        with open(segment_path, 'rb') as f:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as segment:
+                for end in offsets:
+                    if end > len(segment):
+                        break
+                    line = segment[begin:end]
+                    begin = end
+                    try:
+                        records.append(json.loads(line))
+                    except ValueError:
+                        # Partition rewritten underneath us by compaction
+                        continue
+        return records
+
+    def query(self, day_from: Optional[str] = None, day_to: Optional[str] = None,
+              offset: int = 0, limit: int = 10) -> Tuple[List[Dict], int, List[str]]:
+        """
+        Page through the archive newest first (latest day, latest append first).
+        Only partitions overlapping the page are opened.
+        Returns (records, total records in range, days in range).
+        """
+        days = [d for d in reversed(self.partitions())
+                if (day_from is None or d >= day_from) and (day_to is None or d <= day_to)]
+        counts = [self.count(d) for d in days]
+        total = sum(counts)
+
+        records = []
+        skip = max(offset, 0)
+        for day, count in zip(days, counts):
+            if len(records) >= limit:
+                break
+            if skip >= count:
+                skip -= count
+                continue
+            # Newest first within the partition: read the tail and reverse it
+            want = limit - len(records)
+            stop = count - skip
+            start = max(stop - want, 0)
+            records.extend(reversed(self.read_range(day, start, stop)))
+            skip = 0
+        return records, total, days
+
+
+if __name__ == '__main__':
+    if len(sys.argv) != 3 or sys.argv[1] != 'compact':
+        print("Usage: python archive.py compact <archive directory>")
+        sys.exit(1)
+    ArticleArchive(sys.argv[2]).compact()
+    print(f"✓ Compacted {sys.argv[2]}")
@@ -0,0 +1,214 @@
+"""
+Compact article record shared by the scraper and the API
+
+An Article stores its known fields in __slots__ instead of a per-article
+dict. Fields that were absent stay unset, so an article converts back to
+exactly the dict it was built from. Tags become tuples, and the repeated
+strings (source, category, author and tag values) are interned, so 100k
+articles share one copy of each. Articles implement the mutable mapping
+interface, so code written for article dicts (.get, [], in) keeps working.
+"""
+import sys
+import hashlib
+from collections.abc import MutableMapping
+from typing import Dict, Iterator, List
+
+# The categories the scraper assigns, and the one used when a value isn't among them
+CATEGORIES = ("Trending", "Technology", "Education", "Careers", "AI & ML")
+DEFAULT_CATEGORY = "Trending"
+
+FIELDS = ('title', 'url', 'description', 'author', 'published_date', 'category', 'tags', 'source',
+          'thumbnail', 'thumbnail_local')
+_FIELD_SET = frozenset(FIELDS)
+
+# Fields whose values repeat across articles and are worth interning
+_INTERNED = frozenset(('author', 'category', 'source'))
+
+# Words left out of tags generated from a title
+STOP_WORDS = {'the', 'a', 'an', 'and', 'or', 'but', 'in', 'on', 'at', 'to', 'for', 'of', 'with', 'from', 'is', 'are',
+              'was', 'were'}
+
+# Shortest description kept as is
+MIN_DESCRIPTION_LENGTH = 10
+
+_intern = sys.intern
+_CATEGORY_NAMES = {category.lower(): category for category in CATEGORIES}
+
+
+def _text(value) -> str:
+    return value.strip() if isinstance(value, str) else ''
+
+
+def _tags(value) -> List[str]:
+    if isinstance(value, str):
+        value = value.split(',')
+    if not isinstance(value, (list, tuple)):
+        return []
+    return [tag.strip() for tag in value if isinstance(tag, str) and tag.strip()]
+
+
+def _normalize(name: str, value):
+    """Stored form of a field value: tags as a tuple, repeated strings interned."""
+    if name == 'tags':
+        if type(value) is list:
+            return tuple([_intern(tag) if type(tag) is str else tag for tag in value])
+    elif name in _INTERNED and type(value) is str:
+        return _intern(value)
+    return value
+
+
+def validation_problems(structured: Dict) -> List[str]:
+    """
+    Rules a model's structured article breaks, before from_scraped falls back
+    to the raw data; an empty list means the output can be used as it is.
+    """
+    problems = []
+    if not _text(structured.get('title')):
+        problems.append('no title')
+    if len(_text(structured.get('description'))) < MIN_DESCRIPTION_LENGTH:
+        problems.append('description too short')
+    if len(_tags(structured.get('tags'))) < 3:
+        problems.append('fewer than 3 tags')
+    if _text(structured.get('category')) not in CATEGORIES:
+        problems.append('category not in the list')
+    return problems
+
+
+class Article(MutableMapping):
+    """One article with slotted fields; unknown fields are kept in a small dict."""
+
+    __slots__ = FIELDS + ('_extra',)
+
+    def __init__(self, **fields):
+        self._extra = None
+        for name, value in fields.items():
+            self[name] = value
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'Article':
+        """Article holding exactly the fields of an article dict."""
+        article = cls.__new__(cls)
+        article._extra = None
+        # The hot path when loading a snapshot: set slots through their descriptors directly
+        for name, value in data.items():
+            setter = _SETTERS.get(name)
+            if setter is None:
+                article[name] = value
+            else:
+                setter(article, _normalize(name, value))
+        return article
+
+    @classmethod
+    def from_scraped(cls, structured: Dict, raw: Dict, source: str) -> 'Article':
+        """
+        Validate an article structured by the model, field by field
+        falling back to the raw scraped data and then to generated values.
+        """
+        article = cls.from_dict(structured)
+        title = _text(structured.get('title')) or _text(raw.get('title')) or 'Untitled'
+        article.title = title
+        article.url = _text(structured.get('url')) or _text(raw.get('url'))
+
+        # The description must never be empty
+        description = _text(structured.get('description'))
+        if len(description) < MIN_DESCRIPTION_LENGTH:
+            description = _text(raw.get('description'))
+        if len(description) < MIN_DESCRIPTION_LENGTH:
+            description = f"Article about {title.lower()}" if title else "No description available"
+        article.description = description
+
+        # At least 3 tags, generated from the title when the model gave too few
+        tags = _tags(structured.get('tags'))
+        if len(tags) < 3:
+            tags = [word for word in title.lower().split() if word not in STOP_WORDS and len(word) > 3][:5] or [source]
+        article['tags'] = tags
+
+        article['author'] = _text(structured.get('author')) or _text(raw.get('author'))
+        article.published_date = structured.get('published_date') or raw.get('published_date')
+        article['category'] = _CATEGORY_NAMES.get(_text(structured.get('category')).lower(), DEFAULT_CATEGORY)
+        article['source'] = _text(structured.get('source')) or _text(raw.get('source')) or source
+        return article
+
+    def to_dict(self) -> Dict:
+        """The article as a plain dict, fields in their usual order."""
+        data = {}
+        for name in FIELDS:
+            try:
+                value = getattr(self, name)
+            except AttributeError:
+                continue
+            data[name] = list(value) if name == 'tags' and isinstance(value, tuple) else value
+        if self._extra:
+            data.update(self._extra)
+        return data
+
+    def __getitem__(self, name: str):
+        if name in _FIELD_SET:
+            try:
+                return getattr(self, name)
+            except AttributeError:
+                raise KeyError(name) from None
+        if self._extra is None:
+            raise KeyError(name)
+        return self._extra[name]
+
+    def __setitem__(self, name: str, value):
+        if name not in _FIELD_SET:
+            if self._extra is None:
+                self._extra = {}
+            self._extra[name] = value
+            return
+        setattr(self, name, _normalize(name, value))
+
+    def __delitem__(self, name: str):
+        if name in _FIELD_SET:
+            try:
+                delattr(self, name)
+            except AttributeError:
+                raise KeyError(name) from None
+        elif self._extra is None:
+            raise KeyError(name)
+        else:
+            del self._extra[name]
+
+    def __contains__(self, name) -> bool:
+        if name in _FIELD_SET:
+            return hasattr(self, name)
+        return self._extra is not None and name in self._extra
+
+    def get(self, name: str, default=None):
+        if name in _FIELD_SET:
+            return getattr(self, name, default)
+        return self._extra.get(name, default) if self._extra is not None else default
+
+    def __iter__(self) -> Iterator[str]:
+        for name in FIELDS:
+            if hasattr(self, name):
+                yield name
+        if self._extra:
+            yield from self._extra
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+    def __repr__(self) -> str:
+        return f"Article({self.to_dict()!r})"
+
+
+# Slot descriptors' setters, by field name
+_SETTERS = {name: getattr(Article, name).__set__ for name in FIELDS}
+
+
+def article_id(url: str) -> str:
+    """Stable short id of an article, derived from its URL."""
+    return hashlib.sha1((url or '').encode('utf-8')).hexdigest()[:12]
+
+
+def as_dict(article) -> Dict:
+    """Plain dict of an Article; dicts are returned as they are."""
+    return article.to_dict() if isinstance(article, Article) else article
+
+
+def to_articles(articles: List[Dict]) -> List[Article]:
+    """Articles parsed from JSON as compact records."""
+    return [Article.from_dict(article) for article in articles]
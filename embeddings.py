@@ -0,0 +1,193 @@
+"""
+Article embeddings for semantic search and related articles
+
+publish_articles() embeds every article's title and description through
+Ollama's embeddings API, in batches, and stores the vectors as one
+contiguous float32 matrix next to the articles file
+(all_articles.embeddings.npy), each row normalized to unit length so a
+dot product is the cosine similarity. The metadata file next to it
+(all_articles.embeddings.json) holds each row's article id and content
+hash, plus every article's most similar articles, computed here once so
+the API answers related-article requests with a lookup.
+
+Vectors are cached by content hash: the previous matrix is read back and
+only new or changed articles are sent to Ollama.
+
+Requires NumPy (pip install numpy); without it the step is skipped.
+"""
+import os
+import json
+import hashlib
+from typing import Dict, List, Optional, Tuple
+
+from article import article_id
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional; without it embeddings are neither built nor searched
+    np = None
+
+EMBED_MODEL = os.getenv('OLLAMA_EMBED_MODEL', 'nomic-embed-text')
+
+# Texts sent to Ollama per request
+EMBED_BATCH_SIZE = int(os.getenv('EMBED_BATCH_SIZE', '64'))
+
+# Related articles stored per article
+RELATED_COUNT = int(os.getenv('RELATED_COUNT', '10'))
+
+# Rows of the similarity matrix computed at a time, bounding memory to block x articles
+SIMILARITY_BLOCK = 1024
+
+
+def embeddings_paths(json_path: str) -> Tuple[str, str]:
+    """Where the matrix and the metadata of an articles file's embeddings live."""
+    base = os.path.splitext(json_path)[0]
+    return base + '.embeddings.npy', base + '.embeddings.json'
+
+
+def embedding_text(article: Dict) -> str:
+    return f"{article.get('title') or ''}\n{article.get('description') or ''}".strip()
+
+
+def content_hash(text: str, model: str) -> str:
+    return hashlib.sha1(f"{model}\0{text}".encode('utf-8')).hexdigest()
+
+
+def normalize_rows(matrix):
+    """Rows scaled to unit length (all-zero rows stay zero)."""
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (matrix / norms).astype(np.float32, copy=False)
+
+
+def top_k(scores, k: int):
+    """Indices and values of the k highest scores along the last axis, highest first."""
+    k = min(k, scores.shape[-1])
+    if k <= 0:
+        empty = np.empty(scores.shape[:-1] + (0,))
+        return empty.astype(np.intp), empty
+    # argpartition finds the top k in linear time; only those k are sorted
+    indices = np.argpartition(-scores, k - 1, axis=-1)[..., :k]
+    values = np.take_along_axis(scores, indices, axis=-1)
+    order = np.argsort(-values, axis=-1, kind='stable')
+    return np.take_along_axis(indices, order, axis=-1), np.take_along_axis(values, order, axis=-1)
+
+
+def related_rows(matrix, k: int) -> List[List[Tuple[int, float]]]:
+    """For each row of a normalized matrix, the k most similar other rows and their cosine similarity."""
+    related = []
+    for start in range(0, len(matrix), SIMILARITY_BLOCK):
+        block = matrix[start:start + SIMILARITY_BLOCK] @ matrix.T
+        # An article isn't related to itself
+        rows = np.arange(len(block))
+        block[rows, start + rows] = -np.inf
+        indices, scores = top_k(block, min(k, len(matrix) - 1))
+        related.extend(list(zip(row_indices.tolist(), row_scores.tolist()))
+                       for row_indices, row_scores in zip(indices, scores))
+    return related
+
+
+def embed_texts(texts: List[str], model: str = EMBED_MODEL) -> List[List[float]]:
+    """Embeddings of texts from Ollama, EMBED_BATCH_SIZE texts per request."""
+    # Imported here: the scraper has Ollama installed, the API only reads the results
+    import ollama
+    vectors = []
+    for start in range(0, len(texts), EMBED_BATCH_SIZE):
+        response = ollama.embed(model=model, input=texts[start:start + EMBED_BATCH_SIZE])
+        vectors.extend(response['embeddings'])
+    return vectors
+
+
+def _load_cache(npy_path: str, meta_path: str, model: str) -> Dict[str, object]:
+    """Vectors of the previous build by content hash; empty if there is none or it used another model."""
+    try:
+        with open(meta_path, 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        matrix = np.load(npy_path)
+    except (OSError, ValueError):
+        return {}
+    hashes = meta.get('hashes', [])
+    if meta.get('model') != model or len(hashes) != len(matrix):
+        return {}
+    return dict(zip(hashes, matrix))
+
+
+def build_embeddings(json_path: str, articles: List[Dict], model: str = EMBED_MODEL) -> Optional[str]:
+    """
+    Embed the articles, reusing cached vectors, and store the matrix and the
+    related-article lists next to json_path. Returns the matrix path.
+    """
+    if np is None:
+        print("✗ NumPy is not installed, skipping embeddings")
+        return None
+    npy_path, meta_path = embeddings_paths(json_path)
+
+    texts = [embedding_text(article) for article in articles]
+    hashes = [content_hash(text, model) for text in texts]
+    vectors = _load_cache(npy_path, meta_path, model)
+    missing = {digest: text for digest, text in zip(hashes, texts) if digest not in vectors}
+    if missing:
+        cached = sum(1 for digest in hashes if digest not in missing)
+        print(f"Embedding {len(missing)} new texts with {model} ({cached} articles cached)...")
+        vectors.update(zip(missing, np.asarray(embed_texts(list(missing.values()), model), dtype=np.float32)))
+
+    dimensions = len(next(iter(vectors.values()))) if vectors else 0
+    matrix = np.empty((len(hashes), dimensions), dtype=np.float32)
+    for row, digest in enumerate(hashes):
+        matrix[row] = vectors[digest]
+    matrix = np.ascontiguousarray(normalize_rows(matrix))
+
+    ids = [article_id(article.get('url')) for article in articles]
+    related = {}
+    for row, neighbours in enumerate(related_rows(matrix, RELATED_COUNT)):
+        own = ids[row]
+        # The same URL twice keeps the first article's list, without the duplicate itself
+        if own not in related:
+            related[own] = [[ids[other], round(score, 4)] for other, score in neighbours if ids[other] != own]
+
+    meta = {'model': model, 'dimensions': dimensions, 'ids': ids, 'hashes': hashes, 'related': related}
+    # The matrix first: readers reload when the metadata changes, and check that the row counts agree
+    with open(npy_path + '.tmp', 'wb') as f:
+        np.save(f, matrix)
+    os.replace(npy_path + '.tmp', npy_path)
+    with open(meta_path + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(meta, f, ensure_ascii=False)
+    os.replace(meta_path + '.tmp', meta_path)
+    print(f"✓ Embeddings saved to {npy_path} ({len(hashes)} x {dimensions})")
+    return npy_path
+
+
+class ArticleEmbeddings:
+    """One build's row ids and related lists, and its matrix when NumPy is available."""
+
+    def __init__(self, model: str, ids: List[str], related: Dict[str, List], matrix=None):
+        self.model = model
+        self.ids = ids
+        self.related = related
+        self.matrix = matrix
+
+    @classmethod
+    def load(cls, json_path: str) -> Optional['ArticleEmbeddings']:
+        """The embeddings stored next to json_path, or None if there are none."""
+        npy_path, meta_path = embeddings_paths(json_path)
+        try:
+            with open(meta_path, 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return None
+        matrix = None
+        if np is not None:
+            try:
+                # Memory-mapped, so worker processes share the pages instead of each holding a copy
+                matrix = np.load(npy_path, mmap_mode='r')
+            except (OSError, ValueError):
+                matrix = None
+            if matrix is not None and len(matrix) != len(meta['ids']):
+                matrix = None
+        return cls(meta['model'], meta['ids'], meta.get('related', {}), matrix)
+
+    def similar(self, vector: List[float], k: int) -> List[Tuple[str, float]]:
+        """Ids and cosine similarities of the k rows closest to vector."""
+        query = normalize_rows(np.asarray(vector, dtype=np.float32))
+        indices, scores = top_k(self.matrix @ query, k)
+        return [(self.ids[index], round(float(score), 4)) for index, score in zip(indices.tolist(), scores.tolist())]
@@ -0,0 +1,228 @@
+"""
+Feed-based article discovery: RSS, Atom and news sitemaps
+
+Sources publish their latest articles in feeds that are a small fraction
+of the size of their homepages. FeedReader fetches a feed with a
+conditional GET (If-None-Match / If-Modified-Since) and parses it
+incrementally as the bytes arrive, closing the connection as soon as it
+has enough articles. An unchanged feed costs a single 304 response: the
+validators and the articles parsed from each feed are kept in a small
+JSON state file, so a 304 still yields the feed's articles.
+"""
+import os
+import re
+import json
+import html
+from datetime import datetime
+from email.utils import parsedate_to_datetime
+from typing import Dict, Iterable, List, Optional
+from xml.etree.ElementTree import Element, ParseError, XMLPullParser
+
+import requests
+
+STATE_PATH = os.getenv('FEED_STATE', 'feed_state.json')
+
+# Articles taken from a feed (the HTML extractors stop at the same number)
+MAX_FEED_ARTICLES = 20
+
+# Bytes handed to the parser at a time, and seconds to wait for a feed
+CHUNK_SIZE = 16 * 1024
+FEED_TIMEOUT = 30
+
+# Longest description kept from a feed, like the HTML extractors' limit
+MAX_DESCRIPTION_LENGTH = 500
+
+ATOM_NS = '{http://www.w3.org/2005/Atom}'
+SITEMAP_NS = '{http://www.sitemaps.org/schemas/sitemap/0.9}'
+
+# Elements holding one article: RSS 2.0, RSS 1.0 (RDF), Atom and sitemap entries
+ITEM_TAGS = frozenset(('item', '{http://purl.org/rss/1.0/}item', ATOM_NS + 'entry', SITEMAP_NS + 'url'))
+
+# Candidate child elements per field (by local name), most specific first
+DESCRIPTION_FIELDS = ('description', 'summary', 'content')
+DATE_FIELDS = ('pubDate', 'published', 'publication_date', 'date', 'updated', 'lastmod')
+
+_TAGS = re.compile(r'<[^>]+>')
+_SPACES = re.compile(r'\s+')
+
+
+def _local(tag: str) -> str:
+    return tag.rsplit('}', 1)[-1]
+
+
+def _text(elem: Optional[Element]) -> str:
+    return (elem.text or '').strip() if elem is not None else ''
+
+
+def _plain(markup: str) -> str:
+    """Text of an HTML fragment, whitespace collapsed."""
+    return _SPACES.sub(' ', html.unescape(_TAGS.sub(' ', markup))).strip()
+
+
+def _excerpt(text: str) -> str:
+    if len(text) <= MAX_DESCRIPTION_LENGTH:
+        return text
+    cut = text[:MAX_DESCRIPTION_LENGTH]
+    end = cut.rfind('. ')
+    return cut[:end + 1] if end > 0 else cut.rsplit(' ', 1)[0] + '...'
+
+
+def _iso_date(value: str) -> str:
+    """RFC 822 dates (RSS) as ISO 8601; other formats are returned as they are."""
+    if value and not value[:4].isdigit():
+        try:
+            return parsedate_to_datetime(value).isoformat()
+        except (TypeError, ValueError):
+            pass
+    return value
+
+
+def _link(item: Element, fields: Dict[str, Element]) -> str:
+    # Atom links carry the URL in href, with rel="alternate" (or no rel) for the article itself
+    for child in item:
+        if _local(child.tag) == 'link' and child.get('href') and child.get('rel', 'alternate') == 'alternate':
+            return child.get('href').strip()
+    return _text(fields.get('link')) or _text(fields.get('loc'))
+
+
+def _author(fields: Dict[str, Element]) -> str:
+    # dc:creator (RSS), <author><name> (Atom) or a plain <author> (RSS, often an email address)
+    creator = _text(fields.get('creator'))
+    if creator:
+        return creator
+    author = fields.get('author')
+    if author is None:
+        return ''
+    return next((_text(child) for child in author if _local(child.tag) == 'name'), '') or _text(author)
+
+
+def parse_item(item: Element, source: str) -> Optional[Dict]:
+    """Article dict of one feed item or sitemap entry, or None if it has no title or URL."""
+    # Direct children win over nested elements with the same name (e.g. media:title)
+    fields = {}
+    for child in item:
+        fields.setdefault(_local(child.tag), child)
+    for child in item.iter():
+        if child is not item:
+            fields.setdefault(_local(child.tag), child)
+
+    title = _plain(_text(fields.get('title')))
+    url = _link(item, fields)
+    if not title or not url:
+        return None
+
+    article = {'url': url, 'title': title, 'source': source}
+    description = next((_plain(_text(fields.get(name))) for name in DESCRIPTION_FIELDS if _text(fields.get(name))), '')
+    if description and description != title:
+        article['description'] = _excerpt(description)
+    author = _author(fields)
+    if author:
+        article['author'] = author
+    published = next((_text(fields.get(name)) for name in DATE_FIELDS if _text(fields.get(name))), '')
+    if published:
+        article['published_date'] = _iso_date(published)
+    return article
+
+
+def parse_feed(chunks: Iterable[bytes], source: str, limit: int = MAX_FEED_ARTICLES) -> List[Dict]:
+    """
+    Articles of an RSS/Atom feed or news sitemap, parsed while its bytes arrive.
+    Stops reading once limit articles were found.
+    """
+    parser = XMLPullParser(events=('end',))
+    articles = []
+    seen_urls = set()
+    for chunk in chunks:
+        parser.feed(chunk)
+        for _, elem in parser.read_events():
+            if elem.tag not in ITEM_TAGS:
+                continue
+            article = parse_item(elem, source)
+            # Parsed items are dropped, so memory stays flat however long the feed is
+            elem.clear()
+            if article is None or article['url'] in seen_urls:
+                continue
+            seen_urls.add(article['url'])
+            articles.append(article)
+            if len(articles) >= limit:
+                return articles
+    try:
+        parser.close()
+    except ParseError as e:
+        # A truncated or malformed tail doesn't invalidate the items before it
+        if not articles:
+            raise
+        print(f"  Warning: ignoring malformed end of feed: {e}")
+    return articles
+
+
+class FeedReader:
+    """Fetches feeds with conditional GET and remembers what they contained."""
+
+    def __init__(self, session: requests.Session, state_path: str = STATE_PATH,
+                 max_articles: int = MAX_FEED_ARTICLES):
+        self.session = session
+        self.state_path = state_path
+        self.max_articles = max_articles
+        # Response bytes read by this reader, for comparing with page fetches
+        self.bytes_read = 0
+
+    def _load_state(self) -> Dict[str, Dict]:
+        if not os.path.exists(self.state_path):
+            return {}
+        try:
+            with open(self.state_path, 'r', encoding='utf-8') as f:
+                return json.load(f).get('feeds', {})
+        except (OSError, ValueError) as e:
+            print(f"✗ Ignoring unreadable feed state {self.state_path}: {e}")
+            return {}
+
+    def _save_entry(self, url: str, entry: Dict):
+        # Re-read before writing: worker processes share the state file
+        feeds = self._load_state()
+        feeds[url] = entry
+        temp_path = f"{self.state_path}.{os.getpid()}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump({'feeds': feeds}, f, ensure_ascii=False)
+        os.replace(temp_path, self.state_path)
+
+    def _chunks(self, response: requests.Response) -> Iterable[bytes]:
+        for chunk in response.iter_content(CHUNK_SIZE):
+            self.bytes_read += len(chunk)
+            yield chunk
+
+    def fetch(self, url: str, source: str) -> List[Dict]:
+        """Articles of one feed; an unchanged feed (304) returns the articles parsed last time."""
+        entry = self._load_state().get(url) or {}
+        headers = {}
+        if entry.get('articles'):
+            if entry.get('etag'):
+                headers['If-None-Match'] = entry['etag']
+            if entry.get('last_modified'):
+                headers['If-Modified-Since'] = entry['last_modified']
+
+        started_at = self.bytes_read
+        with self.session.get(url, headers=headers, stream=True, timeout=FEED_TIMEOUT) as response:
+            if response.status_code == 304 and headers:
+                print(f"✓ Feed not modified: {url}")
+                return [dict(article) for article in entry['articles']]
+            response.raise_for_status()
+            articles = parse_feed(self._chunks(response), source, self.max_articles)
+            validators = {'etag': response.headers.get('ETag'), 'last_modified': response.headers.get('Last-Modified')}
+
+        print(f"✓ Feed {url}: {len(articles)} articles ({(self.bytes_read - started_at) / 1024:.0f} KB read)")
+        if articles:
+            self._save_entry(url, dict(validators, articles=articles, fetched_at=datetime.now().isoformat()))
+        return articles
+
+    def discover(self, source: str, urls: List[str]) -> List[Dict]:
+        """Articles from the first of a source's feeds that yields any; [] if none does."""
+        for url in urls:
+            try:
+                articles = self.fetch(url, source)
+            except (requests.RequestException, ParseError) as e:
+                print(f"✗ Feed {url} failed: {e}")
+                continue
+            if articles:
+                return articles
+        return []
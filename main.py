@@ -3,32 +3,111 @@ from bs4 import BeautifulSoup
 import json
 import ollama
 from datetime import datetime
-from typing import List, Dict
+from typing import List, Dict, Optional, Tuple
 import os
+import sys
+import time
+import socket
+import argparse
+import shutil
+import subprocess
+import multiprocessing
 from dotenv import load_dotenv
 from image_fetcher import get_article_thumbnail
+from thumbnail_store import materialize_thumbnails
+from article import Article, validation_problems
+from storage import ArticleWriter, JSONStorage, SQLiteStorage
+from archive import ArticleArchive
+from scheduler import ScrapeScheduler
+from work_queue import WorkQueue
+from feeds import FeedReader
+from embeddings import build_embeddings
 
 load_dotenv()
 
+# Sources scraped by main() and the daemon: (name, listing page URL)
+SOURCES = [
+    ("The Verge", "https://www.theverge.com/"),
+    ("TechCrunch", "https://techcrunch.com/latest/"),
+    ("CNET", "https://www.cnet.com/"),
+]
+
+# RSS/Atom feeds or news sitemaps per source, tried in order before falling back to the listing page
+SOURCE_FEEDS = {
+    "The Verge": ["https://www.theverge.com/rss/index.xml"],
+    "TechCrunch": ["https://techcrunch.com/feed/"],
+    "CNET": ["https://www.cnet.com/rss/news/"],
+}
+
+# Set SCRAPE_FEEDS=0 to always scrape the listing pages
+USE_FEEDS = os.getenv('SCRAPE_FEEDS', '1').lower() not in ('0', 'false', 'no')
+
+# Work queue used by --workers (see work_queue.py), and how often idle workers poll it
+WORK_QUEUE_DB = os.getenv('WORK_QUEUE_DB', 'work_queue.db')
+WORKER_POLL_INTERVAL = 1.0
+
+# Lowest self-reported confidence accepted from a model tier that can still escalate
+OLLAMA_MIN_CONFIDENCE = float(os.getenv('OLLAMA_MIN_CONFIDENCE', '0.6'))
+
 
 class NewsScraperWithAI:
     """Web scraper for tech news sites that uses Ollama to structure data."""
     
-    def __init__(self, base_url: str = "https://www.theverge.com/", source_name: str = "The Verge", ollama_model: str = None):
+    def __init__(self, base_url: str = "https://www.theverge.com/", source_name: str = "The Verge", ollama_model: str = None,
+                 materialize_thumbnails: bool = None, feed_urls: List[str] = None):
         self.base_url = base_url
         self.source_name = source_name
+        # Feeds to discover articles from, before falling back to the listing page
+        if feed_urls is None:
+            feed_urls = SOURCE_FEEDS.get(source_name, []) if USE_FEEDS else []
+        self.feed_urls = feed_urls
         # Get model from parameter, environment variable, or use default
         self.ollama_model = ollama_model or os.getenv('OLLAMA_MODEL', 'llama3.2:3b')
+        # Tiered mode: models tried smallest first, e.g. OLLAMA_MODELS="qwen2.5:0.5b,llama3.2:3b".
+        # An answer that fails validation escalates to the next model; the last one's answer is always used.
+        tiers = os.getenv('OLLAMA_MODELS', '') if ollama_model is None else ''
+        self.ollama_models = [model.strip() for model in tiers.split(',') if model.strip()] or [self.ollama_model]
+        # Per model: calls, answers used, answers escalated, calls without a usable answer, seconds spent
+        self.tier_stats = {model: {'calls': 0, 'accepted': 0, 'escalated': 0, 'failed': 0, 'seconds': 0.0}
+                           for model in self.ollama_models}
+        # Optionally download thumbnails and store resized variants locally
+        if materialize_thumbnails is None:
+            materialize_thumbnails = os.getenv('MATERIALIZE_THUMBNAILS', '').lower() in ('1', 'true', 'yes')
+        self.materialize_thumbnails = materialize_thumbnails
         self.headers = {
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
         }
+        # Reuse connections across fetches (and across runs in daemon mode)
+        self.session = requests.Session()
+        self.session.headers.update(self.headers)
+        self.feed_reader = FeedReader(self.session)
+        # How long Ollama keeps the model loaded after a request (e.g. "30m"); Ollama's default if unset
+        self.ollama_keep_alive = os.getenv('OLLAMA_KEEP_ALIVE')
     
-    def fetch_page(self) -> BeautifulSoup:
-        """Fetch the main page."""
+    def fetch_html(self) -> bytes:
+        """Fetch the main page's HTML."""
         print(f"Fetching content from {self.base_url}...")
-        response = requests.get(self.base_url, headers=self.headers)
+        response = self.session.get(self.base_url)
         response.raise_for_status()
-        return BeautifulSoup(response.content, 'lxml')
+        return response.content
+    
+    def fetch_page(self) -> BeautifulSoup:
+        """Fetch the main page."""
+        return BeautifulSoup(self.fetch_html(), 'lxml')
+    
+    def read_feeds(self) -> List[Dict]:
+        """Articles from the source's feeds, or [] if it has none or none of them worked."""
+        if not self.feed_urls:
+            return []
+        print(f"Reading feeds of {self.source_name}...")
+        articles = self.feed_reader.discover(self.source_name, self.feed_urls)
+        if not articles:
+            print("No articles from feeds, falling back to the listing page")
+        return articles
+    
+    def discover_articles(self) -> List[Dict]:
+        """The source's latest articles, from its feeds if possible and its listing page otherwise."""
+        return self.read_feeds() or self.extract_articles(self.fetch_page())
     
     def extract_articles_verge(self, soup: BeautifulSoup) -> List[Dict]:
         """Extract article information from The Verge."""
@@ -259,26 +338,56 @@ class NewsScraperWithAI:
         else:
             return self.extract_articles_verge(soup)
     
-    def structure_with_ollama(self, articles: List[Dict]) -> List[Dict]:
-        """Use Ollama to structure and clean the article data."""
-        print(f"\nProcessing {len(articles)} articles with Ollama ({self.ollama_model})...")
+    def structure_with_ollama(self, articles: List[Dict], known_articles: Dict[str, Dict] = None) -> List[Article]:
+        """Use Ollama to structure and clean the article data (reusing known_articles, keyed by URL)."""
+        print(f"\nProcessing {len(articles)} articles with Ollama ({' -> '.join(self.ollama_models)})...")
         
         structured_articles = []
+        known_articles = known_articles or {}
         
         for idx, article in enumerate(articles, 1):
+            known = known_articles.get(article.get('url'))
+            if known is not None:
+                print(f"Reusing article {idx}/{len(articles)}: {article.get('title', 'Untitled')[:50]}...")
+                structured_articles.append(Article.from_dict(known))
+                continue
             print(f"Processing article {idx}/{len(articles)}: {article.get('title', 'Untitled')[:50]}...")
             
-            # Create a prompt for Ollama to structure the data
-            source = article.get('source', self.source_name)
-            prompt = f"""You are a data structuring assistant. Given the following scraped article data from {source}, 
+            structured_articles.append(self.structure_article(article, idx))
+        
+        self.print_tier_report()
+        return structured_articles
+    
+    def print_tier_report(self):
+        """Print how many articles each model tier handled, and how fast."""
+        if not any(stats['calls'] for stats in self.tier_stats.values()):
+            return
+        print(f"\nOllama tiers ({self.source_name}):")
+        for model, stats in self.tier_stats.items():
+            calls = stats['calls']
+            average = stats['seconds'] / calls if calls else 0.0
+            print(f"  {model}: {calls} calls, {stats['accepted']} accepted, {stats['escalated']} escalated, "
+                  f"{stats['failed']} failed, {average:.2f}s avg ({stats['seconds']:.1f}s total)")
+    
+    def structure_article(self, article: Dict, idx: int = None, fetch_thumbnail: bool = True) -> Article:
+        """Structure one article with Ollama, falling back to the scraped data."""
+        # Create a prompt for Ollama to structure the data
+        source = article.get('source', self.source_name)
+        fields = [
+            "- title (string): The article title",
+            "- url (string): The article URL",
+            "- description (string): A brief description or excerpt (1-2 sentences). If no description is provided in the raw data, generate one based on the title and context.",
+            "- author (string): The author name (if available, otherwise empty string)",
+            "- published_date (string): Publication date in ISO format if possible",
+            "- category (string): Choose ONLY ONE category from this exact list: \"Trending\", \"Technology\", \"Education\", \"Careers\", \"AI & ML\". Pick the most appropriate one based on the article's content.",
+            "- tags (array): Extract 3-5 relevant tags/keywords from the title and description",
+        ]
+        
+        def build_prompt(field_lines: List[str]) -> str:
+            field_list = "\n".join(field_lines)
+            return f"""You are a data structuring assistant. Given the following scraped article data from {source}, 
 please clean and structure it into a proper JSON format with these fields:
-- title (string): The article title
-- url (string): The article URL
-- description (string): A brief description or excerpt (1-2 sentences). If no description is provided in the raw data, generate one based on the title and context.
-- author (string): The author name (if available, otherwise empty string)
-- published_date (string): Publication date in ISO format if possible
-- category (string): Choose ONLY ONE category from this exact list: "Trending", "Technology", "Education", "Careers", "AI & ML". Pick the most appropriate one based on the article's content.
-- tags (array): Extract 3-5 relevant tags/keywords from the title and description
+{field_list}
 
 CRITICAL RULES:
 1. The description field must NEVER be empty. If the raw data has no description, create a brief 1-2 sentence description based on the title.
@@ -294,119 +403,100 @@ Raw data:
 {json.dumps(article, indent=2)}
 
 Return ONLY valid JSON, no explanation or markdown formatting."""
+        
+        prompt = build_prompt(fields)
+        # Tiers that can escalate also rate their own answer
+        tiered_prompt = build_prompt(fields + [
+            "- confidence (number): How sure you are of the category and description, from 0 to 1"
+        ])
 
+        structured_article = None
+        for tier, model in enumerate(self.ollama_models):
+            last_tier = tier == len(self.ollama_models) - 1
+            stats = self.tier_stats[model]
+            started = time.perf_counter()
             try:
-                # Call Ollama API
-                response = ollama.chat(
-                    model=self.ollama_model,
-                    messages=[
-                        {
-                            'role': 'user',
-                            'content': prompt
-                        }
-                    ]
-                )
-                
-                # Extract the response content
-                structured_content = response['message']['content']
-                
-                # Try to parse as JSON with robust extraction
-                try:
-                    # Remove markdown code blocks if present
-                    if '```json' in structured_content:
-                        structured_content = structured_content.split('```json')[1].split('```')[0].strip()
-                    elif '```' in structured_content:
-                        structured_content = structured_content.split('```')[1].split('```')[0].strip()
-                    
-                    # Extract JSON object from response - find first { and last }
-                    json_start = structured_content.find('{')
-                    json_end = structured_content.rfind('}')
-                    
-                    if json_start != -1 and json_end != -1 and json_start < json_end:
-                        structured_content = structured_content[json_start:json_end+1].strip()
-                    
-                    structured_article = json.loads(structured_content)
-                    
-                    # Validate required fields with strict rules, use original data as fallback
-                    if not structured_article.get('title'):
-                        structured_article['title'] = article.get('title', 'Untitled')
-                    if not structured_article.get('url'):
-                        structured_article['url'] = article.get('url', '')
-                    
-                    # Description validation - must not be empty
-                    description = structured_article.get('description', '').strip()
-                    if not description or len(description) < 10:
-                        # Try original description
-                        original_desc = article.get('description', '').strip()
-                        if original_desc and len(original_desc) >= 10:
-                            structured_article['description'] = original_desc
-                        else:
-                            # Generate from title as last resort
-                            title = structured_article.get('title', '')
-                            structured_article['description'] = f"Article about {title.lower()}" if title else "No description available"
-                    
-                    # Tags validation - must have at least 3 tags
-                    tags = structured_article.get('tags', [])
-                    if not tags or len(tags) < 3:
-                        # Generate basic tags from title
-                        title_words = structured_article.get('title', '').lower().split()
-                        # Filter out common words
-                        stop_words = {'the', 'a', 'an', 'and', 'or', 'but', 'in', 'on', 'at', 'to', 'for', 'of', 'with', 'from', 'is', 'are', 'was', 'were'}
-                        meaningful_words = [w for w in title_words if w not in stop_words and len(w) > 3][:5]
-                        structured_article['tags'] = meaningful_words if meaningful_words else [source]
-                    
-                    if not structured_article.get('author'):
-                        structured_article['author'] = article.get('author', '')
-                    if not structured_article.get('published_date'):
-                        structured_article['published_date'] = article.get('published_date', None)
-                    if not structured_article.get('category'):
-                        structured_article['category'] = 'Trending'
-                    
-                    # Fetch thumbnail for the article
-                    print(f"  → Fetching thumbnail...")
-                    thumbnail = get_article_thumbnail(
-                        structured_article.get('title', ''),
-                        structured_article.get('category')
-                    )
-                    
-                    if thumbnail:
-                        structured_article['thumbnail'] = thumbnail
-                        print(f"  ✓ Thumbnail added")
-                    else:
-                        structured_article['thumbnail'] = None
-                        print(f"  ✗ No thumbnail found")
-                    
-                    structured_articles.append(structured_article)
-                except (json.JSONDecodeError, ValueError) as e:
-                    print(f"  Warning: Could not parse Ollama response for article {idx}: {str(e)[:50]}")
-                    # Use original data with all available fields
-                    enriched_article = {
-                        'title': article.get('title', 'Untitled'),
-                        'url': article.get('url', ''),
-                        'description': article.get('description', ''),
-                        'author': article.get('author', ''),
-                        'published_date': article.get('published_date', None),
-                        'category': 'Trending',
-                        'tags': article.get('tags', []),
-                        'source': article.get('source', self.source_name)
-                    }
-                    
-                    # Fetch thumbnail
-                    thumbnail = get_article_thumbnail(
-                        enriched_article.get('title', ''),
-                        enriched_article.get('category')
-                    )
-                    enriched_article['thumbnail'] = thumbnail
-                    
-                    structured_articles.append(enriched_article)
-                
+                candidate = self.ask_ollama(model, prompt if last_tier else tiered_prompt)
+                confidence = candidate.pop('confidence', None)
+                problems = validation_problems(candidate)
+                if not last_tier and isinstance(confidence, (int, float)) and confidence < OLLAMA_MIN_CONFIDENCE:
+                    problems.append(f"confidence {confidence}")
+            except (json.JSONDecodeError, ValueError) as e:
+                print(f"  Warning: Could not parse {model} response for article {idx or article.get('url', '')}: {str(e)[:50]}")
+                candidate, problems = None, ['unparseable response']
             except Exception as e:
-                print(f"  Error processing with Ollama: {e}")
-                # Fall back to original article data
-                article['thumbnail'] = None
-                structured_articles.append(article)
+                print(f"  Error processing with Ollama ({model}): {e}")
+                candidate, problems = None, ['request failed']
+            stats['calls'] += 1
+            stats['seconds'] += time.perf_counter() - started
+            
+            # A smaller tier's answer is kept in case every larger one fails
+            if candidate is not None:
+                structured_article = candidate
+            if last_tier or not problems:
+                stats['accepted' if candidate is not None else 'failed'] += 1
+                break
+            stats['escalated'] += 1
+            print(f"  → {model}: {', '.join(problems)}; escalating to {self.ollama_models[tier + 1]}")
         
-        return structured_articles
+        # Validate every field, using the original data as fallback
+        structured_article = Article.from_scraped(structured_article or {}, article, source)
+        
+        # Fetch thumbnail for the article
+        if fetch_thumbnail:
+            self.add_thumbnail(structured_article)
+        
+        return structured_article
+    
+    def ask_ollama(self, model: str, prompt: str) -> Dict:
+        """Send the prompt to one model and parse the JSON object in its answer."""
+        response = ollama.chat(
+            model=model,
+            messages=[
+                {
+                    'role': 'user',
+                    'content': prompt
+                }
+            ],
+            keep_alive=self.ollama_keep_alive
+        )
+        
+        # Extract the response content
+        structured_content = response['message']['content']
+        
+        # Remove markdown code blocks if present
+        if '```json' in structured_content:
+            structured_content = structured_content.split('```json')[1].split('```')[0].strip()
+        elif '```' in structured_content:
+            structured_content = structured_content.split('```')[1].split('```')[0].strip()
+        
+        # Extract JSON object from response - find first { and last }
+        json_start = structured_content.find('{')
+        json_end = structured_content.rfind('}')
+        
+        if json_start != -1 and json_end != -1 and json_start < json_end:
+            structured_content = structured_content[json_start:json_end+1].strip()
+        
+        structured_article = json.loads(structured_content)
+        if not isinstance(structured_article, dict):
+            raise ValueError("response is not a JSON object")
+        return structured_article
+    
+    def add_thumbnail(self, article: Dict) -> Dict:
+        """Look up a thumbnail for an article and store it on the article."""
+        print(f"  → Fetching thumbnail...")
+        thumbnail = get_article_thumbnail(
+            article.get('title', ''),
+            article.get('category')
+        )
+        
+        if thumbnail:
+            article['thumbnail'] = thumbnail
+            print(f"  ✓ Thumbnail added")
+        else:
+            article['thumbnail'] = None
+            print(f"  ✗ No thumbnail found")
+        return article
     
     def save_to_json(self, data: List[Dict], filename: str = "articles.json", source: str = None):
         """Save structured data to JSON file."""
@@ -417,20 +507,20 @@ Return ONLY valid JSON, no explanation or markdown formatting."""
             'articles': data
         }
         
-        with open(filename, 'w', encoding='utf-8') as f:
-            json.dump(output, f, indent=2, ensure_ascii=False)
+        JSONStorage(filename).save(output)
         
         print(f"\n✓ Data saved to {filename}")
         print(f"✓ Total articles: {len(data)}")
     
-    def run(self, output_file: str = "verge_articles.json"):
-        """Run the complete scraping and processing pipeline."""
+    def run(self, output_file: str = "verge_articles.json", known_articles: Dict[str, Dict] = None,
+            sink: ArticleWriter = None):
+        """
+        Run the complete scraping and processing pipeline (output_file=None skips writing it).
+        The finished articles are also appended to sink, e.g. the combined file's writer.
+        """
         try:
-            # Step 1: Fetch the page
-            soup = self.fetch_page()
-            
-            # Step 2: Extract articles
-            articles = self.extract_articles(soup)
+            # Steps 1-2: Read the feeds, or fetch the page and extract articles
+            articles = self.discover_articles()
             print(f"\n✓ Extracted {len(articles)} articles")
             
             if not articles:
@@ -438,15 +528,23 @@ Return ONLY valid JSON, no explanation or markdown formatting."""
                 return
             
             # Step 3: Structure with Ollama
-            structured_articles = self.structure_with_ollama(articles)
+            structured_articles = self.structure_with_ollama(articles, known_articles)
             
             # Step 4: Add source to each article
             for article in structured_articles:
                 if 'source' not in article:
                     article['source'] = self.source_name
             
-            # Step 5: Save to JSON
-            self.save_to_json(structured_articles, output_file)
+            # Step 5: Store resized thumbnails locally (optional)
+            if self.materialize_thumbnails:
+                materialize_thumbnails(structured_articles)
+            
+            # Step 6: Save to JSON
+            if output_file:
+                self.save_to_json(structured_articles, output_file)
+            if sink is not None:
+                for article in structured_articles:
+                    sink.write(article)
             
             return structured_articles
             
@@ -457,6 +555,75 @@ Return ONLY valid JSON, no explanation or markdown formatting."""
             raise
 
 
+def combined_writer() -> ArticleWriter:
+    """Writer for all_articles.json, for runs that stream articles into it as each source finishes."""
+    return JSONStorage('all_articles.json').writer({'sources': [name for name, _ in SOURCES]})
+
+
+def publish_articles(all_articles: List[Dict], writer: ArticleWriter = None) -> Dict:
+    """
+    Save the combined articles and update the prebuilt snapshot, database and archive.
+    writer is a combined_writer() the articles were already streamed into; without one they are written here.
+    """
+    if writer is None:
+        writer = combined_writer()
+        for article in all_articles:
+            writer.write(article)
+    # The articles stay the records they were scraped as; each consumer converts one at a time
+    combined_output = {
+        'sources': [name for name, _ in SOURCES],
+        'scraped_at': datetime.now().isoformat(),
+        'total_articles': writer.count,
+        # Precomputed so the API's stats and categories endpoints don't scan the articles
+        'aggregates': writer.aggregates.result(),
+        'articles': all_articles
+    }
+    
+    # Embeddings for semantic search and related articles; written before the JSON
+    # file, so an API that sees the new articles also sees their embeddings
+    if os.getenv('BUILD_EMBEDDINGS', '1').lower() not in ('0', 'false', 'no'):
+        try:
+            build_embeddings('all_articles.json', all_articles)
+        except Exception as e:
+            print(f"✗ Could not build embeddings: {e}")
+    
+    # Moving the finished file into place is atomic: the API sees the old file or the new one
+    writer.commit({key: combined_output[key] for key in ('scraped_at', 'total_articles', 'aggregates')})
+    print(f"\n✓ Combined data saved to all_articles.json")
+    
+    # Prebuild the API's parsed and indexed snapshot so cold starts skip that work
+    api_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'api')
+    result = subprocess.run([sys.executable, os.path.join(api_dir, 'build_snapshot.py'), 'all_articles.json'])
+    if result.returncode != 0:
+        # The API checks the snapshot against the JSON, so a stale one is ignored rather than served
+        print(f"✗ Building the API snapshot failed (exit code {result.returncode}); the API will parse all_articles.json instead")
+    
+    # Render the most requested API responses to pre-compressed files, served without running a view
+    result = subprocess.run([sys.executable, os.path.join(api_dir, 'prerender.py'), 'all_articles.json'])
+    if result.returncode != 0:
+        # The CDN serves prerendered/api/ without checking it against the data, so stale files must go
+        prerendered_dir = os.getenv('PRERENDER_DIR') or 'prerendered'
+        print(f"✗ Pre-rendering API responses failed (exit code {result.returncode}); removing {prerendered_dir} "
+              f"so every request is handled dynamically")
+        shutil.rmtree(prerendered_dir, ignore_errors=True)
+    
+    # Also upsert into the SQLite database when one is configured
+    database_path = os.getenv('ARTICLES_DB')
+    if database_path:
+        SQLiteStorage(database_path).save(combined_output)
+        print(f"✓ Articles upserted into {database_path}")
+    
+    # Keep history in the day-partitioned archive when one is configured
+    archive_dir = os.getenv('ARTICLES_ARCHIVE_DIR')
+    if archive_dir:
+        archive = ArticleArchive(archive_dir)
+        changed_days = archive.append(all_articles, combined_output['scraped_at'])
+        archive.compact(changed_days)
+        print(f"✓ Archived to {archive_dir} ({len(changed_days)} partitions updated)")
+    
+    return combined_output
+
+
 def main():
     """Main function to run the scraper."""
     print("="*60)
@@ -465,66 +632,212 @@ def main():
     
     all_articles = []
     
-    # Scrape The Verge
-    print("\n[1/3] Scraping The Verge...")
-    print("-"*60)
-    verge_scraper = NewsScraperWithAI(
-        base_url="https://www.theverge.com/",
-        source_name="The Verge"
-    )
-    verge_articles = verge_scraper.run(output_file="temp_verge.json")
-    if verge_articles:
-        all_articles.extend(verge_articles)
-    
-    # Scrape TechCrunch
-    print("\n[2/3] Scraping TechCrunch...")
-    print("-"*60)
-    techcrunch_scraper = NewsScraperWithAI(
-        base_url="https://techcrunch.com/latest/",
-        source_name="TechCrunch"
-    )
-    techcrunch_articles = techcrunch_scraper.run(output_file="temp_techcrunch.json")
-    if techcrunch_articles:
-        all_articles.extend(techcrunch_articles)
-    
-    # Scrape CNET
-    print("\n[3/3] Scraping CNET...")
-    print("-"*60)
-    cnet_scraper = NewsScraperWithAI(
-        base_url="https://www.cnet.com/",
-        source_name="CNET"
-    )
-    cnet_articles = cnet_scraper.run(output_file="temp_cnet.json")
-    if cnet_articles:
-        all_articles.extend(cnet_articles)
-    
-    # Combine all articles into one file
-    print("\n" + "="*60)
-    print("Combining all articles...")
-    print("="*60)
-    
-    combined_output = {
-        'sources': ['The Verge', 'TechCrunch', 'CNET'],
-        'scraped_at': datetime.now().isoformat(),
-        'total_articles': len(all_articles),
-        'articles': all_articles
-    }
-    
-    with open('all_articles.json', 'w', encoding='utf-8') as f:
-        json.dump(combined_output, f, indent=2, ensure_ascii=False)
+    # Each source's articles are streamed into the combined file as soon as the source is done;
+    # nothing replaces all_articles.json unless the whole run succeeds
+    with combined_writer() as writer:
+        # Scrape The Verge
+        print("\n[1/3] Scraping The Verge...")
+        print("-"*60)
+        verge_scraper = NewsScraperWithAI(
+            base_url="https://www.theverge.com/",
+            source_name="The Verge"
+        )
+        verge_articles = verge_scraper.run(output_file=None, sink=writer)
+        if verge_articles:
+            all_articles.extend(verge_articles)
+        
+        # Scrape TechCrunch
+        print("\n[2/3] Scraping TechCrunch...")
+        print("-"*60)
+        techcrunch_scraper = NewsScraperWithAI(
+            base_url="https://techcrunch.com/latest/",
+            source_name="TechCrunch"
+        )
+        techcrunch_articles = techcrunch_scraper.run(output_file=None, sink=writer)
+        if techcrunch_articles:
+            all_articles.extend(techcrunch_articles)
+        
+        # Scrape CNET
+        print("\n[3/3] Scraping CNET...")
+        print("-"*60)
+        cnet_scraper = NewsScraperWithAI(
+            base_url="https://www.cnet.com/",
+            source_name="CNET"
+        )
+        cnet_articles = cnet_scraper.run(output_file=None, sink=writer)
+        if cnet_articles:
+            all_articles.extend(cnet_articles)
+        
+        # Finish the combined file
+        print("\n" + "="*60)
+        print("Combining all articles...")
+        print("="*60)
+        
+        publish_articles(all_articles, writer)
     
-    print(f"\n✓ Combined data saved to all_articles.json")
     print(f"✓ Total articles from all sources: {len(all_articles)}")
     print(f"  - The Verge: {len(verge_articles) if verge_articles else 0}")
     print(f"  - TechCrunch: {len(techcrunch_articles) if techcrunch_articles else 0}")
     print(f"  - CNET: {len(cnet_articles) if cnet_articles else 0}")
+
+
+def run_daemon():
+    """Keep scraping each source on its own adaptive interval (see scheduler.py)."""
+    print("="*60)
+    print("Tech News Scraper - daemon mode")
+    print("="*60)
+    
+    # Keep Ollama's model loaded between runs unless configured otherwise
+    os.environ.setdefault('OLLAMA_KEEP_ALIVE', '30m')
+    
+    # One scraper per source for the daemon's lifetime, so HTTP connections stay pooled
+    scrapers = {name: NewsScraperWithAI(base_url=url, source_name=name) for name, url in SOURCES}
+    
+    existing = []
+    if os.path.exists('all_articles.json'):
+        existing = JSONStorage('all_articles.json').load().get('articles', [])
     
-    # Clean up temp files
-    import os
-    for temp_file in ['temp_verge.json', 'temp_techcrunch.json', 'temp_cnet.json']:
-        if os.path.exists(temp_file):
-            os.remove(temp_file)
+    def scrape(name: str) -> List[Dict]:
+        print(f"\nScraping {name}...")
+        print("-"*60)
+        # Articles already structured in an earlier run skip Ollama and the thumbnail lookup
+        return scrapers[name].run(output_file=None, known_articles=scheduler.known_articles(name))
+    
+    scheduler = ScrapeScheduler([name for name, _ in SOURCES], scrape, publish_articles, existing)
+    scheduler.run_forever()
+
+
+def _structure_tasks(source: str, articles: List[Dict]) -> List:
+    return [
+        ('structure', {'source': source, 'position': position, 'article': article}, f"{source}:{position}")
+        for position, article in enumerate(articles)
+    ]
+
+
+def handle_task(task: Dict, scrapers: Dict[str, NewsScraperWithAI]) -> Tuple[Optional[Dict], List]:
+    """Run one queued task; returns its result and the (kind, payload, key) tasks that follow from it."""
+    payload = task['payload']
+    source = payload['source']
+    scraper = scrapers[source]
+    
+    if task['kind'] == 'fetch':
+        # Feeds carry the articles already, so the extract step is only needed for listing pages
+        articles = scraper.read_feeds()
+        if articles:
+            print(f"✓ Found {len(articles)} articles in {source}'s feeds")
+            return None, _structure_tasks(source, articles)
+        html = scraper.fetch_html().decode('utf-8', errors='replace')
+        return None, [('extract', {'source': source, 'html': html}, source)]
+    
+    if task['kind'] == 'extract':
+        # The CPU-bound parse, which is why the pool uses processes rather than threads
+        articles = scraper.extract_articles(BeautifulSoup(payload['html'], 'lxml'))
+        print(f"✓ Extracted {len(articles)} articles from {source}")
+        return None, _structure_tasks(source, articles)
+    
+    if task['kind'] == 'structure':
+        print(f"Processing article: {payload['article'].get('title', 'Untitled')[:50]}...")
+        article = scraper.structure_article(payload['article'], fetch_thumbnail=False)
+        return None, [('thumbnail', dict(payload, article=article.to_dict()), f"{source}:{payload['position']}")]
+    
+    if task['kind'] == 'thumbnail':
+        article = scraper.add_thumbnail(Article.from_dict(payload['article']))
+        if scraper.materialize_thumbnails:
+            materialize_thumbnails([article])
+        return dict(payload, article=article.to_dict()), []
+    
+    raise ValueError(f"Unknown task kind: {task['kind']}")
+
+
+def _worker_id(pid: int = None) -> str:
+    return f"{socket.gethostname()}:{pid or os.getpid()}"
+
+
+def run_worker(queue_path: str, run_id: str):
+    """Claim and run queued tasks until the run has none left (one worker process)."""
+    owner = _worker_id()
+    queue = WorkQueue(queue_path)
+    scrapers = {name: NewsScraperWithAI(base_url=url, source_name=name) for name, url in SOURCES}
+    
+    while True:
+        task = queue.claim(owner, run_id=run_id)
+        if task is None:
+            if not queue.unfinished(run_id):
+                break
+            time.sleep(WORKER_POLL_INTERVAL)
+            continue
+        try:
+            result, follow_ups = handle_task(task, scrapers)
+        except Exception as e:
+            status = queue.fail(task, owner, f"{type(e).__name__}: {e}"[:500])
+            print(f"✗ {task['kind']} task {task['key']} failed (attempt {task['attempts']}, now {status}): {e}")
+            continue
+        if not queue.complete(task, owner, result, follow_ups):
+            print(f"✗ Lease on {task['kind']} task {task['key']} was lost; its result was dropped")
+    for scraper in scrapers.values():
+        scraper.print_tier_report()
+    queue.close()
+
+
+def run_workers(processes: int):
+    """Scrape every source through the work queue with a pool of worker processes."""
+    print("="*60)
+    print(f"Tech News Scraper - {processes} worker processes")
+    print("="*60)
+    
+    queue = WorkQueue(WORK_QUEUE_DB)
+    run_id = queue.latest_unfinished_run()
+    if run_id:
+        print(f"Resuming unfinished run {run_id}")
+    else:
+        run_id = datetime.now().isoformat()
+        for name, _ in SOURCES:
+            queue.enqueue(run_id, 'fetch', {'source': name}, key=name)
+    
+    # Keep the pool full until the run is finished, replacing workers that died
+    workers = {}
+    while queue.unfinished(run_id):
+        for slot in range(processes):
+            process = workers.get(slot)
+            if process is not None and process.is_alive():
+                continue
+            if process is not None and process.exitcode != 0:
+                # Its leased task would otherwise wait for the lease to expire
+                released = queue.release(_worker_id(process.pid))
+                print(f"✗ Worker {process.pid} exited with code {process.exitcode} ({released} task(s) released)")
+            process = multiprocessing.Process(target=run_worker, args=(WORK_QUEUE_DB, run_id))
+            process.start()
+            workers[slot] = process
+        time.sleep(WORKER_POLL_INTERVAL)
+    for process in workers.values():
+        process.join()
+    
+    for failure in queue.failures(run_id):
+        print(f"✗ {failure['kind']} {failure['key']} failed after {failure['attempts']} attempts: {failure['error']}")
+    
+    order = {name: index for index, (name, _) in enumerate(SOURCES)}
+    results = sorted(queue.results(run_id, 'thumbnail'), key=lambda r: (order.get(r['source'], len(order)), r['position']))
+    all_articles = [result['article'] for result in results]
+    queue.close()
+    if not all_articles:
+        print("No articles were scraped.")
+        return
+    
+    publish_articles(all_articles)
+    print(f"✓ Total articles from all sources: {len(all_articles)}")
+    for name, _ in SOURCES:
+        print(f"  - {name}: {sum(1 for result in results if result['source'] == name)}")
 
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Tech News Scraper with Ollama AI Processing")
+    parser.add_argument('--daemon', action='store_true', help="keep scraping each source on an adaptive schedule")
+    parser.add_argument('--workers', type=int, metavar='N',
+                        help="scrape through the SQLite work queue with N worker processes")
+    args = parser.parse_args()
+    if args.daemon:
+        run_daemon()
+    elif args.workers:
+        run_workers(args.workers)
+    else:
+        main()
@@ -0,0 +1,177 @@
+"""
+Adaptive per-source scrape scheduling for the scraper's daemon mode
+
+Every source is scraped on its own interval. After a run that found new
+articles, the interval is re-derived from the source's observed publishing
+rate so that each run picks up about TARGET_NEW_ARTICLES new ones; after a
+run that found nothing new (or failed) the interval doubles. Intervals stay
+between MIN_INTERVAL and MAX_INTERVAL. The schedule is saved to a small JSON
+state file after every run, so a restarted daemon picks up where it left off.
+
+Started from main.py:
+
+    python main.py --daemon
+"""
+import os
+import json
+import time
+from typing import Callable, Dict, List, Optional
+
+# Interval bounds and starting point, in seconds
+MIN_INTERVAL = float(os.getenv('SCRAPE_MIN_INTERVAL', '300'))
+MAX_INTERVAL = float(os.getenv('SCRAPE_MAX_INTERVAL', '21600'))
+BASE_INTERVAL = float(os.getenv('SCRAPE_BASE_INTERVAL', '1800'))
+
+# New articles a run should ideally find, and the backoff factor for runs that find none
+TARGET_NEW_ARTICLES = float(os.getenv('SCRAPE_TARGET_NEW', '3'))
+BACKOFF_FACTOR = 2.0
+
+# Weight of the latest run in the smoothed publishing rate
+RATE_SMOOTHING = 0.5
+
+STATE_PATH = os.getenv('SCHEDULER_STATE', 'scheduler_state.json')
+
+
+class SourceSchedule:
+    """Scheduling state of one source."""
+
+    FIELDS = ('interval', 'next_run', 'last_run', 'rate', 'last_new', 'failures')
+
+    def __init__(self, name: str, interval: float = BASE_INTERVAL, next_run: float = 0.0,
+                 last_run: Optional[float] = None, rate: Optional[float] = None,
+                 last_new: int = 0, failures: int = 0):
+        self.name = name
+        self.interval = interval
+        self.next_run = next_run
+        self.last_run = last_run
+        # Smoothed new articles per hour
+        self.rate = rate
+        self.last_new = last_new
+        self.failures = failures
+
+    def to_dict(self) -> Dict:
+        return {field: getattr(self, field) for field in self.FIELDS}
+
+    def record_run(self, new_articles: int, now: float):
+        """Adapt the interval to a successful run that found new_articles."""
+        elapsed = now - self.last_run if self.last_run is not None else self.interval
+        self.failures = 0
+        self.last_new = new_articles
+        self.last_run = now
+        if new_articles > 0:
+            observed = new_articles * 3600.0 / max(elapsed, 1.0)
+            self.rate = observed if self.rate is None else RATE_SMOOTHING * observed + (1 - RATE_SMOOTHING) * self.rate
+            self.interval = TARGET_NEW_ARTICLES * 3600.0 / self.rate
+        else:
+            self.interval *= BACKOFF_FACTOR
+        self.interval = min(max(self.interval, MIN_INTERVAL), MAX_INTERVAL)
+        self.next_run = now + self.interval
+
+    def record_failure(self, now: float):
+        """Back off after a failed run."""
+        self.failures += 1
+        self.interval = min(max(self.interval * BACKOFF_FACTOR, MIN_INTERVAL), MAX_INTERVAL)
+        self.next_run = now + self.interval
+
+
+class ScrapeScheduler:
+    """
+    Runs scrape(source) for whichever source is due next, forever.
+
+    scrape returns the source's current articles. After each run the new
+    articles are merged into the per-source lists and publish(articles) is
+    called with all of them, so results are committed source by source
+    instead of once per full sweep.
+    """
+
+    def __init__(self, sources: List[str], scrape: Callable[[str], List[Dict]],
+                 publish: Callable[[List[Dict]], None], articles: List[Dict] = None,
+                 state_path: str = STATE_PATH):
+        self.sources = list(sources)
+        self.scrape = scrape
+        self.publish = publish
+        self.state_path = state_path
+        self.articles = {name: [] for name in self.sources}
+        for article in articles or []:
+            if article.get('source') in self.articles:
+                self.articles[article['source']].append(article)
+        self.schedules = self._load_state()
+
+    def _load_state(self) -> Dict[str, SourceSchedule]:
+        saved = {}
+        if os.path.exists(self.state_path):
+            try:
+                with open(self.state_path, 'r', encoding='utf-8') as f:
+                    saved = json.load(f).get('sources', {})
+            except (OSError, ValueError) as e:
+                print(f"✗ Ignoring unreadable scheduler state {self.state_path}: {e}")
+        schedules = {}
+        for name in self.sources:
+            values = saved.get(name) or {}
+            schedules[name] = SourceSchedule(name, **{k: v for k, v in values.items() if k in SourceSchedule.FIELDS})
+        return schedules
+
+    def _save_state(self):
+        state = {'sources': {name: schedule.to_dict() for name, schedule in self.schedules.items()}}
+        temp_path = f"{self.state_path}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f, indent=2)
+        os.replace(temp_path, self.state_path)
+
+    def known_articles(self, name: str) -> Dict[str, Dict]:
+        """Articles of a source already scraped, by URL."""
+        return {article['url']: article for article in self.articles.get(name, []) if article.get('url')}
+
+    def all_articles(self) -> List[Dict]:
+        return [article for name in self.sources for article in self.articles[name]]
+
+    def next_due(self) -> SourceSchedule:
+        return min(self.schedules.values(), key=lambda schedule: schedule.next_run)
+
+    def run_source(self, name: str, now: float = None) -> int:
+        """Scrape one source, publish the merged result and reschedule it. Returns the number of new articles."""
+        schedule = self.schedules[name]
+        try:
+            articles = self.scrape(name)
+        except Exception as e:
+            print(f"✗ Scraping {name} failed: {e}")
+            articles = None
+
+        now = time.time() if now is None else now
+        if not articles:
+            # Keep the articles from the last good run
+            schedule.record_failure(now)
+            self._save_state()
+            print(f"✗ No articles from {name}, next run in {schedule.interval / 60:.0f} min")
+            return 0
+
+        known = self.known_articles(name)
+        new_articles = sum(1 for article in articles if article.get('url') not in known)
+        # A source's first run has nothing to compare against, so it keeps the base interval
+        if known:
+            schedule.record_run(new_articles, now)
+        else:
+            schedule.last_run = now
+            schedule.next_run = now + schedule.interval
+
+        self.articles[name] = articles
+        if new_articles:
+            self.publish(self.all_articles())
+        self._save_state()
+        print(f"✓ {name}: {new_articles} new, next run in {schedule.interval / 60:.0f} min")
+        return new_articles
+
+    def run_forever(self):
+        """Scrape each source whenever it is due."""
+        print(f"Scheduling {', '.join(self.sources)} (state in {self.state_path})")
+        try:
+            while True:
+                schedule = self.next_due()
+                delay = schedule.next_run - time.time()
+                if delay > 0:
+                    print(f"Next: {schedule.name} in {delay / 60:.1f} min")
+                    time.sleep(delay)
+                self.run_source(schedule.name)
+        except KeyboardInterrupt:
+            self._save_state()
+            print("\nScheduler stopped")
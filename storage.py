@@ -0,0 +1,448 @@
+"""
+Storage backends for scraped articles
+
+JSONStorage rewrites all_articles.json on every run (the original format),
+streaming the articles through an ArticleWriter into a temporary file that
+is renamed into place once complete, so readers never see a partial file.
+SQLiteStorage upserts articles into a SQLite database in WAL mode with
+indexes on source, category and publication time and an FTS5 index for
+search, so writes are incremental and the API can query it concurrently.
+
+Export a database back to the JSON format with:
+
+    python storage.py export articles.db all_articles.json
+"""
+import os
+import re
+import sys
+import json
+import sqlite3
+import threading
+from datetime import datetime, timezone
+from typing import List, Dict, Optional, Tuple, Iterator, Set
+
+from aggregates import Aggregates, compute_aggregates
+from article import as_dict
+
+TOKEN_PATTERN = re.compile(r'\w+', re.UNICODE)
+
+# Same relative weights as the in-memory search index (title, description, tags)
+FTS_WEIGHTS = (2.0, 1.0, 1.5)
+
+# Write JSON without indentation (smaller and faster, but harder to diff)
+COMPACT_JSON = os.getenv('JSON_COMPACT', '').lower() in ('1', 'true', 'yes')
+
+# Columns stored next to the full article JSON so they can be filtered on
+ARTICLE_COLUMNS = ('url', 'title', 'description', 'author', 'published_date', 'category', 'source', 'thumbnail')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS articles (
+    id INTEGER PRIMARY KEY,
+    url TEXT NOT NULL UNIQUE,
+    title TEXT,
+    description TEXT,
+    author TEXT,
+    published_date TEXT,
+    published_ts REAL,
+    category TEXT,
+    source TEXT,
+    tags TEXT,
+    thumbnail TEXT,
+    data TEXT NOT NULL,
+    first_seen TEXT NOT NULL,
+    updated_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_articles_source ON articles(source COLLATE NOCASE);
+CREATE INDEX IF NOT EXISTS idx_articles_category ON articles(category COLLATE NOCASE);
+CREATE INDEX IF NOT EXISTS idx_articles_published ON articles(published_ts);
+
+CREATE VIRTUAL TABLE IF NOT EXISTS articles_fts USING fts5(
+    title, description, tags,
+    content='articles', content_rowid='id', tokenize='unicode61'
+);
+CREATE TRIGGER IF NOT EXISTS articles_ai AFTER INSERT ON articles BEGIN
+    INSERT INTO articles_fts(rowid, title, description, tags)
+    VALUES (new.id, new.title, new.description, new.tags);
+END;
+CREATE TRIGGER IF NOT EXISTS articles_ad AFTER DELETE ON articles BEGIN
+    INSERT INTO articles_fts(articles_fts, rowid, title, description, tags)
+    VALUES ('delete', old.id, old.title, old.description, old.tags);
+END;
+CREATE TRIGGER IF NOT EXISTS articles_au AFTER UPDATE ON articles BEGIN
+    INSERT INTO articles_fts(articles_fts, rowid, title, description, tags)
+    VALUES ('delete', old.id, old.title, old.description, old.tags);
+    INSERT INTO articles_fts(rowid, title, description, tags)
+    VALUES (new.id, new.title, new.description, new.tags);
+END;
+
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+
+def published_timestamp(value: Optional[str]) -> Optional[float]:
+    """Epoch seconds of an ISO publication date (naive dates are UTC)."""
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except (ValueError, TypeError, AttributeError):
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
+
+
+def fts_query(search: str) -> Optional[str]:
+    """Turn free text into an FTS5 query: every word required, prefix matching."""
+    terms = TOKEN_PATTERN.findall(search.lower())
+    if not terms:
+        return None
+    return ' AND '.join(f'"{term}"*' for term in dict.fromkeys(terms))
+
+
+class ArticleWriter:
+    """
+    Writes a JSON document with an "articles" list one article at a time.
+
+    Fields known up front go before the list and the rest (totals,
+    aggregates) after it. Everything goes to a temporary file that commit()
+    renames into place; used as a context manager, the file is committed on
+    success and discarded on error. The indented output is byte for byte
+    what json.dump(indent=2) writes for the same fields.
+    """
+
+    def __init__(self, path: str, header: Dict = None, compact: bool = None):
+        self.path = path
+        self.compact = COMPACT_JSON if compact is None else compact
+        self.count = 0
+        # Counted as articles are written, so the trailer doesn't need them all in memory
+        self.aggregates = Aggregates()
+        self.temp_path = f"{path}.{os.getpid()}.tmp"
+        self._file = open(self.temp_path, 'w', encoding='utf-8')
+        self._fields = 0
+        self._file.write('{')
+        for key, value in (header or {}).items():
+            self._field(key, value)
+        self._key('articles')
+        self._file.write('[')
+
+    def _dumps(self, value, level: int) -> str:
+        if self.compact:
+            return json.dumps(value, ensure_ascii=False, separators=(',', ':'))
+        return json.dumps(value, indent=2, ensure_ascii=False).replace('\n', '\n' + '  ' * level)
+
+    def _key(self, key: str):
+        separator = ',' if self._fields else ''
+        self._fields += 1
+        if self.compact:
+            self._file.write(f"{separator}{json.dumps(key)}:")
+        else:
+            self._file.write(f"{separator}\n  {json.dumps(key)}: ")
+
+    def _field(self, key: str, value):
+        self._key(key)
+        self._file.write(self._dumps(value, 1))
+
+    def write(self, article: Dict):
+        """Append one article to the list."""
+        self.aggregates.add(article)
+        separator = ',' if self.count else ''
+        if self.compact:
+            self._file.write(separator + self._dumps(as_dict(article), 0))
+        else:
+            self._file.write(f"{separator}\n    {self._dumps(as_dict(article), 2)}")
+        self.count += 1
+
+    def commit(self, trailer: Dict = None):
+        """Close the list, add the trailing fields and move the finished file into place."""
+        if not self.compact and self.count:
+            self._file.write('\n  ')
+        self._file.write(']')
+        for key, value in (trailer or {}).items():
+            self._field(key, value)
+        self._file.write('}' if self.compact else '\n}')
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._file.close()
+        os.replace(self.temp_path, self.path)
+
+    def abort(self):
+        """Discard the partial file (does nothing once committed)."""
+        if not self._file.closed:
+            self._file.close()
+            os.remove(self.temp_path)
+
+    def __enter__(self) -> 'ArticleWriter':
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self.abort()
+        elif not self._file.closed:
+            self.commit()
+        return False
+
+
+class JSONStorage:
+    """Stores the combined scraper output as a single JSON document."""
+
+    def __init__(self, path: str = 'all_articles.json', compact: bool = None):
+        self.path = path
+        self.compact = compact
+
+    def writer(self, header: Dict = None) -> ArticleWriter:
+        """A writer that streams articles into the file, replacing it on commit."""
+        return ArticleWriter(self.path, header, self.compact)
+
+    def save(self, output: Dict):
+        """Rewrite the whole file with the given combined output, keeping its field order."""
+        keys = list(output)
+        split = keys.index('articles') if 'articles' in keys else len(keys)
+        with self.writer({key: output[key] for key in keys[:split]}) as writer:
+            for article in output.get('articles', []):
+                writer.write(article)
+            writer.commit({key: output[key] for key in keys[split + 1:]})
+
+    def load(self) -> Dict:
+        with open(self.path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+
+class SQLiteStorage:
+    """Stores articles in SQLite, upserting by URL."""
+
+    def __init__(self, path: str = 'articles.db'):
+        self.path = path
+        self._local = threading.local()
+        with self.connection() as conn:
+            conn.executescript(SCHEMA)
+
+    def connection(self) -> sqlite3.Connection:
+        """Per-thread connection (sqlite3 connections can't be shared across threads)."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.row_factory = sqlite3.Row
+            # WAL lets the API read while the scraper writes
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def _get_meta(self, key: str, default=None):
+        row = self.connection().execute('SELECT value FROM meta WHERE key = ?', (key,)).fetchone()
+        return json.loads(row['value']) if row else default
+
+    def save(self, output: Dict):
+        """Upsert the articles of a combined output and refresh the metadata."""
+        now = datetime.now().isoformat()
+        conn = self.connection()
+        with conn:
+            for article in output.get('articles', []):
+                if not article.get('url'):
+                    continue
+                values = [article.get(column) for column in ARTICLE_COLUMNS]
+                conn.execute(
+                    """
+                    INSERT INTO articles (url, title, description, author, published_date, category, source,
+                                          thumbnail, published_ts, tags, data, first_seen, updated_at)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                    ON CONFLICT(url) DO UPDATE SET
+                        title = excluded.title,
+                        description = excluded.description,
+                        author = excluded.author,
+                        published_date = excluded.published_date,
+                        category = excluded.category,
+                        source = excluded.source,
+                        thumbnail = excluded.thumbnail,
+                        published_ts = excluded.published_ts,
+                        tags = excluded.tags,
+                        data = excluded.data,
+                        updated_at = excluded.updated_at
+                    WHERE articles.data IS NOT excluded.data
+                    """,
+                    values + [
+                        published_timestamp(article.get('published_date')),
+                        ' '.join(t for t in (article.get('tags') or []) if isinstance(t, str)),
+                        json.dumps(as_dict(article), ensure_ascii=False, sort_keys=True),
+                        now,
+                        now
+                    ]
+                )
+
+            sources = self._get_meta('sources', [])
+            sources += [s for s in output.get('sources', []) if s not in sources]
+            aggregates = compute_aggregates(self.all_articles())
+            revision = self._get_meta('revision', 0) + 1
+            for key, value in (('sources', sources), ('scraped_at', output.get('scraped_at')),
+                               ('aggregates', aggregates), ('revision', revision)):
+                conn.execute(
+                    'INSERT INTO meta (key, value) VALUES (?, ?) ON CONFLICT(key) DO UPDATE SET value = excluded.value',
+                    (key, json.dumps(value, ensure_ascii=False))
+                )
+
+    def revision(self) -> int:
+        """Counter bumped by every save; cheap to poll for changes."""
+        return self._get_meta('revision', 0)
+
+    def metadata(self) -> Dict:
+        """Sources, scrape time, article count and aggregates of the database."""
+        aggregates = self._get_meta('aggregates') or compute_aggregates(self.all_articles())
+        return {
+            'sources': self._get_meta('sources', []),
+            'scraped_at': self._get_meta('scraped_at'),
+            'total_articles': aggregates.get('total_articles', 0),
+            'aggregates': aggregates
+        }
+
+    def all_articles(self) -> List[Dict]:
+        """Every stored article, in insertion order."""
+        rows = self.connection().execute('SELECT data FROM articles ORDER BY id')
+        return [json.loads(row['data']) for row in rows]
+
+    def _filter_clauses(self, source: str = None, category: str = None, search: str = None,
+                        date_from: float = None, date_to: float = None, tag: str = None, day: str = None):
+        """JOIN, WHERE conditions, parameters and default order for a set of filters; None if nothing can match."""
+        joins = ''
+        where = []
+        params = []
+        order = 'a.id'
+
+        if search:
+            match = fts_query(search)
+            if match is None:
+                return None
+            joins = 'JOIN articles_fts ON articles_fts.rowid = a.id'
+            where.append('articles_fts MATCH ?')
+            params.append(match)
+            order = 'bm25(articles_fts, %s, %s, %s), a.id' % FTS_WEIGHTS
+        if source:
+            where.append('a.source = ? COLLATE NOCASE')
+            params.append(source)
+        if category:
+            where.append('a.category = ? COLLATE NOCASE')
+            params.append(category)
+        if date_from is not None:
+            where.append('a.published_ts >= ?')
+            params.append(date_from)
+        if date_to is not None:
+            where.append('a.published_ts <= ?')
+            params.append(date_to)
+        if tag:
+            where.append("EXISTS (SELECT 1 FROM json_each(a.data, '$.tags') t WHERE t.value = ? COLLATE NOCASE)")
+            params.append(tag)
+        if day:
+            where.append("date(a.published_ts, 'unixepoch') = ?")
+            params.append(day)
+        return joins, where, params, order
+
+    def query(self, source: str = None, category: str = None, search: str = None,
+              date_from: float = None, date_to: float = None, after: Tuple = None,
+              feed_order: bool = False, limit: int = None, offset: int = 0,
+              tag: str = None, day: str = None) -> Tuple[List[Dict], int]:
+        """
+        Filter articles and return (page of articles, total matches).
+        Results are ordered by relevance when searching, by feed order
+        (newest first, then URL) when feed_order is set, otherwise by
+        insertion order. after seeks past a feed sort key (-timestamp or
+        inf for undated articles, URL).
+        """
+        clauses = self._filter_clauses(source, category, search, date_from, date_to, tag, day)
+        if clauses is None:
+            return [], 0
+        joins, where, params, order = clauses
+
+        where_sql = ('WHERE ' + ' AND '.join(where)) if where else ''
+        conn = self.connection()
+        total = conn.execute(f'SELECT COUNT(*) FROM articles a {joins} {where_sql}', params).fetchone()[0]
+
+        if feed_order:
+            order = 'a.published_ts IS NULL, a.published_ts DESC, a.url'
+            if after is not None:
+                sort_value, url = after
+                if sort_value == float('inf'):
+                    where.append('(a.published_ts IS NULL AND a.url > ?)')
+                    params.append(url)
+                else:
+                    where.append('(a.published_ts IS NULL OR a.published_ts < ? OR (a.published_ts = ? AND a.url > ?))')
+                    params.extend([-sort_value, -sort_value, url])
+                where_sql = 'WHERE ' + ' AND '.join(where)
+
+        sql = f'SELECT a.data FROM articles a {joins} {where_sql} ORDER BY {order}'
+        if limit is not None:
+            sql += ' LIMIT ? OFFSET ?'
+            params.extend([limit, offset])
+        rows = conn.execute(sql, params).fetchall()
+        return [json.loads(row['data']) for row in rows], total
+
+    def iter_query(self, source: str = None, category: str = None, search: str = None,
+                   date_from: float = None, date_to: float = None,
+                   tag: str = None, day: str = None) -> Iterator[Dict]:
+        """Like query() without paging, yielding articles one row at a time."""
+        clauses = self._filter_clauses(source, category, search, date_from, date_to, tag, day)
+        if clauses is None:
+            return
+        joins, where, params, order = clauses
+        where_sql = ('WHERE ' + ' AND '.join(where)) if where else ''
+        for row in self.connection().execute(f'SELECT a.data FROM articles a {joins} {where_sql} ORDER BY {order}', params):
+            yield json.loads(row['data'])
+
+    def facet_counts(self, dimensions: List[str], limit: int = 20, **filters) -> Dict[str, Dict[str, int]]:
+        """Most frequent values of each dimension (source, category, tag, day) among the filtered articles."""
+        clauses = self._filter_clauses(**filters)
+        if clauses is None:
+            return {dimension: {} for dimension in dimensions}
+        joins, where, params, _ = clauses
+        where_sql = ('WHERE ' + ' AND '.join(where)) if where else ''
+        facets = {}
+        for dimension in dimensions:
+            # Values are labelled with their spelling in the first stored article, like the in-memory
+            # index: with one MIN() in the query, SQLite takes the bare value column from that row
+            facet_joins = joins
+            first = 'MIN(a.id)'
+            if dimension == 'tag':
+                facet_joins += " JOIN json_each(a.data, '$.tags') f"
+                value, group = 'f.value', 'f.value COLLATE NOCASE'
+                # The first tag with that spelling within the first article
+                first = 'MIN((a.id << 16) + f.key)'
+            elif dimension == 'day':
+                value = group = "date(a.published_ts, 'unixepoch')"
+            else:
+                value, group = f'a.{dimension}', f'a.{dimension} COLLATE NOCASE'
+            rows = self.connection().execute(
+                f"""
+                SELECT {value} AS value, {first} AS first, COUNT(*) AS count FROM articles a {facet_joins} {where_sql}
+                GROUP BY {group} HAVING value IS NOT NULL AND value != ''
+                ORDER BY count DESC, {group} LIMIT ?
+                """,
+                params + [limit]
+            ).fetchall()
+            facets[dimension] = {row['value']: row['count'] for row in rows}
+        return facets
+
+    def urls(self) -> Set[str]:
+        """URLs of every stored article."""
+        return {row['url'] for row in self.connection().execute('SELECT url FROM articles')}
+
+    def export_json(self, path: str):
+        """Write the database in the all_articles.json format."""
+        metadata = self.metadata()
+        articles = self.all_articles()
+        JSONStorage(path).save({
+            'sources': metadata['sources'],
+            'scraped_at': metadata['scraped_at'],
+            'total_articles': len(articles),
+            'aggregates': metadata['aggregates'],
+            'articles': articles
+        })
+
+
+if __name__ == '__main__':
+    if len(sys.argv) != 4 or sys.argv[1] != 'export':
+        print("Usage: python storage.py export <database> <output.json>")
+        sys.exit(1)
+    SQLiteStorage(sys.argv[2]).export_json(sys.argv[3])
+    print(f"✓ Exported {sys.argv[2]} to {sys.argv[3]}")
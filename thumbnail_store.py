@@ -0,0 +1,214 @@
+import os
+import io
+import json
+import math
+import hashlib
+import requests
+
+try:
+    from PIL import Image
+except ImportError:  # Pillow is optional; the stage is skipped without it
+    Image = None
+
+# Directory where downloaded thumbnails are stored (content-addressed)
+THUMBNAIL_DIR = os.getenv('THUMBNAIL_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'thumbnails'))
+
+# Fixed card-sized widths and the formats generated for each of them
+VARIANT_WIDTHS = (160, 320, 640)
+VARIANT_FORMATS = (('webp', 'WEBP', 'webp'), ('jpeg', 'JPEG', 'jpg'))
+VARIANT_QUALITY = 80
+
+MANIFEST_NAME = 'manifest.json'
+
+_BASE83 = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz#$%*+,-.:;=?@[]^_{|}~"
+
+
+def _base83(value, length):
+    """Encode an integer as a fixed-length base83 string"""
+    return ''.join(_BASE83[(value // (83 ** (length - i - 1))) % 83] for i in range(length))
+
+
+def _srgb_to_linear(value):
+    value = value / 255
+    if value <= 0.04045:
+        return value / 12.92
+    return ((value + 0.055) / 1.055) ** 2.4
+
+
+def _linear_to_srgb(value):
+    value = max(0.0, min(1.0, value))
+    if value <= 0.0031308:
+        return int(value * 12.92 * 255 + 0.5)
+    return int((1.055 * (value ** (1 / 2.4)) - 0.055) * 255 + 0.5)
+
+
+def encode_blurhash(image, x_components=4, y_components=3):
+    """
+    Encode a PIL image as a BlurHash string
+    The image is downscaled first, the hash only carries a few DCT components
+    """
+    small = image.convert('RGB')
+    small.thumbnail((32, 32))
+    width, height = small.size
+    pixels = [(_srgb_to_linear(r), _srgb_to_linear(g), _srgb_to_linear(b)) for r, g, b in small.getdata()]
+
+    factors = []
+    for j in range(y_components):
+        for i in range(x_components):
+            normalisation = 1 if i == 0 and j == 0 else 2
+            r = g = b = 0.0
+            for y in range(height):
+                cos_y = math.cos(math.pi * j * y / height)
+                row = y * width
+                for x in range(width):
+                    basis = normalisation * math.cos(math.pi * i * x / width) * cos_y
+                    pr, pg, pb = pixels[row + x]
+                    r += basis * pr
+                    g += basis * pg
+                    b += basis * pb
+            scale = 1 / (width * height)
+            factors.append((r * scale, g * scale, b * scale))
+
+    dc, ac = factors[0], factors[1:]
+    blurhash = _base83((x_components - 1) + (y_components - 1) * 9, 1)
+
+    if ac:
+        actual_max = max(abs(c) for factor in ac for c in factor)
+        quantised_max = max(0, min(82, int(math.floor(actual_max * 166 - 0.5))))
+        max_value = (quantised_max + 1) / 166
+    else:
+        quantised_max = 0
+        max_value = 1
+    blurhash += _base83(quantised_max, 1)
+
+    blurhash += _base83((_linear_to_srgb(dc[0]) << 16) + (_linear_to_srgb(dc[1]) << 8) + _linear_to_srgb(dc[2]), 4)
+
+    for factor in ac:
+        quantised = [
+            max(0, min(18, int(math.floor(math.copysign(abs(c / max_value) ** 0.5, c) * 9 + 9.5))))
+            for c in factor
+        ]
+        blurhash += _base83(quantised[0] * 19 * 19 + quantised[1] * 19 + quantised[2], 2)
+
+    return blurhash
+
+
+class ThumbnailStore:
+    """Content-addressed on-disk store of resized article thumbnails."""
+
+    def __init__(self, root=THUMBNAIL_DIR, widths=VARIANT_WIDTHS):
+        self.root = root
+        self.widths = widths
+        self.manifest_path = os.path.join(root, MANIFEST_NAME)
+        self.manifest = self._load_manifest()
+        # URLs this store added, merged into the manifest on disk when saving
+        self._updated = set()
+        self.headers = {
+            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+        }
+
+    def _load_manifest(self):
+        """Load the source URL -> stored thumbnail record mapping"""
+        try:
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+    def save_manifest(self):
+        """Atomically write the manifest next to the stored images"""
+        os.makedirs(self.root, exist_ok=True)
+        # Re-read before writing: worker processes share the manifest
+        manifest = self._load_manifest()
+        manifest.update((url, self.manifest[url]) for url in self._updated)
+        self.manifest = manifest
+        tmp_path = f"{self.manifest_path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.manifest, f, indent=2, ensure_ascii=False)
+        os.replace(tmp_path, self.manifest_path)
+
+    def _is_complete(self, record):
+        """Check that every variant of a stored record still exists on disk"""
+        return all(os.path.exists(os.path.join(self.root, v['path'])) for v in record.get('variants', []))
+
+    def materialize(self, url):
+        """
+        Download a thumbnail once and store its resized variants
+        Returns the record to attach to the article, or None on failure
+        """
+        cached = self.manifest.get(url)
+        if cached and self._is_complete(cached):
+            return cached
+
+        response = requests.get(url, headers=self.headers, timeout=15)
+        response.raise_for_status()
+        content = response.content
+        digest = hashlib.sha256(content).hexdigest()
+
+        # Same image bytes behind a different URL: reuse the stored variants
+        for record in self.manifest.values():
+            if record.get('hash') == digest and self._is_complete(record):
+                self.manifest[url] = record
+                self._updated.add(url)
+                return record
+
+        image = Image.open(io.BytesIO(content))
+        image.load()
+        if image.mode not in ('RGB', 'L'):
+            image = image.convert('RGB')
+
+        relative_dir = os.path.join(digest[:2], digest)
+        os.makedirs(os.path.join(self.root, relative_dir), exist_ok=True)
+
+        # Never upscale; fall back to the original width for tiny images
+        widths = [w for w in self.widths if w < image.width] or [image.width]
+
+        variants = []
+        for width in widths:
+            height = max(1, round(image.height * width / image.width))
+            resized = image.resize((width, height), Image.LANCZOS) if width != image.width else image
+            for fmt, pil_format, extension in VARIANT_FORMATS:
+                relative_path = os.path.join(relative_dir, f"{width}.{extension}")
+                resized.save(os.path.join(self.root, relative_path), pil_format, quality=VARIANT_QUALITY)
+                variants.append({
+                    'width': width,
+                    'height': height,
+                    'format': fmt,
+                    'path': relative_path.replace(os.sep, '/')
+                })
+
+        record = {
+            'hash': digest,
+            'width': image.width,
+            'height': image.height,
+            'blurhash': encode_blurhash(image),
+            'variants': variants
+        }
+        self.manifest[url] = record
+        self._updated.add(url)
+        return record
+
+
+def materialize_thumbnails(articles, store=None):
+    """Pipeline stage: attach locally stored thumbnail variants to each article"""
+    if Image is None:
+        print("  ✗ Pillow is not installed, skipping thumbnail materialization")
+        return articles
+
+    store = store or ThumbnailStore()
+    print(f"\nMaterializing thumbnails into {store.root}...")
+
+    stored = 0
+    for article in articles:
+        url = article.get('thumbnail')
+        if not url:
+            continue
+        try:
+            article['thumbnail_local'] = store.materialize(url)
+            stored += 1
+        except Exception as e:
+            print(f"  ✗ Could not materialize thumbnail for {article.get('title', 'Untitled')[:40]}: {e}")
+
+    store.save_manifest()
+    print(f"✓ Materialized {stored} thumbnails")
+    return articles
@@ -0,0 +1,263 @@
+"""
+Durable SQLite work queue with leases
+
+Tasks belong to a run and have a kind (fetch, extract, structure,
+thumbnail), a JSON payload and an optional key that is unique per run and
+kind, so enqueuing the same work twice is a no-op. A worker claims a task
+by taking a lease on it; completing the task and enqueuing the tasks that
+follow from it happen in one transaction. A failed task is retried with
+exponential backoff until it runs out of attempts, and a task whose lease
+expires (its worker crashed or hung) can be claimed again by any worker,
+so a crashed worker loses nothing.
+
+Show the state of a queue with:
+
+    python work_queue.py stats work_queue.db
+"""
+import os
+import sys
+import json
+import time
+import sqlite3
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# Seconds a claimed task stays leased to its worker
+LEASE_SECONDS = float(os.getenv('WORK_QUEUE_LEASE', '600'))
+
+# Attempts per task, and the delay before the first retry (doubled for each further one)
+MAX_ATTEMPTS = int(os.getenv('WORK_QUEUE_MAX_ATTEMPTS', '3'))
+RETRY_DELAY = 5.0
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    run_id TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    key TEXT,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL,
+    available_at REAL NOT NULL,
+    lease_owner TEXT,
+    lease_expires REAL,
+    result TEXT,
+    error TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    UNIQUE (run_id, kind, key)
+);
+CREATE INDEX IF NOT EXISTS idx_tasks_ready ON tasks (status, available_at);
+CREATE INDEX IF NOT EXISTS idx_tasks_run ON tasks (run_id, status);
+"""
+
+# Statuses of tasks that still have to run
+UNFINISHED = ('pending', 'leased')
+
+# (kind, payload, key) of a task to enqueue
+TaskSpec = Tuple[str, Dict, Optional[str]]
+
+
+def _loads(value: Optional[str]):
+    return json.loads(value) if value is not None else None
+
+
+class WorkQueue:
+    """Leased task queue in a SQLite database, safe to share between processes."""
+
+    def __init__(self, path: str = 'work_queue.db', lease_seconds: float = LEASE_SECONDS,
+                 max_attempts: int = MAX_ATTEMPTS):
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        # Transactions are managed explicitly, so claims can take the write lock up front
+        self.conn = sqlite3.connect(path, timeout=30, isolation_level=None)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def _transaction(self):
+        return _Transaction(self.conn)
+
+    def _insert(self, run_id: str, tasks: Iterable[TaskSpec], now: float) -> int:
+        added = 0
+        for kind, payload, key in tasks:
+            cursor = self.conn.execute(
+                """
+                INSERT OR IGNORE INTO tasks (run_id, kind, key, payload, max_attempts, available_at, created_at, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                (run_id, kind, key, json.dumps(payload, ensure_ascii=False), self.max_attempts, now, now, now)
+            )
+            added += cursor.rowcount
+        return added
+
+    def enqueue(self, run_id: str, kind: str, payload: Dict, key: str = None) -> bool:
+        """Add a task; returns False if the run already has a task of this kind and key."""
+        with self._transaction():
+            return self._insert(run_id, [(kind, payload, key)], time.time()) > 0
+
+    def claim(self, owner: str, kinds: Iterable[str] = None, run_id: str = None) -> Optional[Dict]:
+        """
+        Lease the next ready task to owner, or return None if none is ready.
+        Tasks whose lease expired are ready again, unless they are out of attempts.
+        With run_id, only that run's tasks are claimed, never leftovers of an older run.
+        """
+        now = time.time()
+        filters = ''
+        params = [now, now]
+        if run_id is not None:
+            filters += " AND run_id = ?"
+            params.append(run_id)
+        if kinds:
+            kinds = list(kinds)
+            filters += f" AND kind IN ({', '.join('?' * len(kinds))})"
+            params += kinds
+
+        # BEGIN IMMEDIATE takes the write lock, so two workers can't claim the same task
+        with self._transaction():
+            self.conn.execute(
+                """
+                UPDATE tasks SET status = 'failed', error = 'lease expired', lease_owner = NULL, updated_at = ?
+                WHERE status = 'leased' AND lease_expires <= ? AND attempts >= max_attempts
+                """,
+                (now, now)
+            )
+            row = self.conn.execute(
+                f"""
+                SELECT * FROM tasks
+                WHERE ((status = 'pending' AND available_at <= ?) OR (status = 'leased' AND lease_expires <= ?)){filters}
+                ORDER BY available_at, id
+                LIMIT 1
+                """,
+                params
+            ).fetchone()
+            if row is None:
+                return None
+            self.conn.execute(
+                """
+                UPDATE tasks SET status = 'leased', lease_owner = ?, lease_expires = ?, attempts = attempts + 1, updated_at = ?
+                WHERE id = ?
+                """,
+                (owner, now + self.lease_seconds, now, row['id'])
+            )
+
+        task = dict(row)
+        task['payload'] = _loads(task['payload'])
+        task['attempts'] += 1
+        return task
+
+    def complete(self, task: Dict, owner: str, result=None, follow_ups: Iterable[TaskSpec] = ()) -> bool:
+        """
+        Mark a leased task done and enqueue the tasks that follow from it, atomically.
+        Returns False (and changes nothing) if owner no longer holds the lease.
+        """
+        now = time.time()
+        with self._transaction():
+            cursor = self.conn.execute(
+                """
+                UPDATE tasks SET status = 'done', result = ?, error = NULL, lease_owner = NULL, lease_expires = NULL,
+                                 updated_at = ?
+                WHERE id = ? AND status = 'leased' AND lease_owner = ?
+                """,
+                (json.dumps(result, ensure_ascii=False) if result is not None else None, now, task['id'], owner)
+            )
+            if cursor.rowcount == 0:
+                return False
+            self._insert(task['run_id'], follow_ups, now)
+        return True
+
+    def fail(self, task: Dict, owner: str, error: str) -> str:
+        """Record a failed attempt; the task is retried later or, out of attempts, marked failed. Returns its status."""
+        now = time.time()
+        with self._transaction():
+            row = self.conn.execute(
+                "SELECT attempts, max_attempts FROM tasks WHERE id = ? AND status = 'leased' AND lease_owner = ?",
+                (task['id'], owner)
+            ).fetchone()
+            if row is None:
+                return 'lost'
+            status = 'pending' if row['attempts'] < row['max_attempts'] else 'failed'
+            delay = RETRY_DELAY * 2 ** (row['attempts'] - 1)
+            self.conn.execute(
+                """
+                UPDATE tasks SET status = ?, error = ?, available_at = ?, lease_owner = NULL, lease_expires = NULL,
+                                 updated_at = ?
+                WHERE id = ?
+                """,
+                (status, error, now + delay, now, task['id'])
+            )
+        return status
+
+    def release(self, owner: str) -> int:
+        """Make the tasks leased to owner (e.g. a worker known to have died) claimable right away."""
+        with self._transaction():
+            cursor = self.conn.execute(
+                "UPDATE tasks SET lease_expires = ? WHERE status = 'leased' AND lease_owner = ?",
+                (time.time(), owner)
+            )
+        return cursor.rowcount
+
+    def unfinished(self, run_id: str) -> int:
+        """Number of tasks of a run still pending or leased."""
+        row = self.conn.execute(
+            "SELECT COUNT(*) FROM tasks WHERE run_id = ? AND status IN (?, ?)", (run_id,) + UNFINISHED
+        ).fetchone()
+        return row[0]
+
+    def latest_unfinished_run(self) -> Optional[str]:
+        """The most recently created run that still has work left, if any."""
+        row = self.conn.execute(
+            "SELECT run_id FROM tasks WHERE status IN (?, ?) ORDER BY created_at DESC LIMIT 1", UNFINISHED
+        ).fetchone()
+        return row['run_id'] if row else None
+
+    def results(self, run_id: str, kind: str) -> List:
+        """Results of a run's completed tasks of one kind, in the order they were enqueued."""
+        rows = self.conn.execute(
+            "SELECT result FROM tasks WHERE run_id = ? AND kind = ? AND status = 'done' ORDER BY id", (run_id, kind)
+        )
+        return [_loads(row['result']) for row in rows]
+
+    def failures(self, run_id: str) -> List[Dict]:
+        """Kind, key, attempts and last error of a run's failed tasks."""
+        rows = self.conn.execute(
+            "SELECT kind, key, attempts, error FROM tasks WHERE run_id = ? AND status = 'failed' ORDER BY id", (run_id,)
+        )
+        return [dict(row) for row in rows]
+
+    def stats(self, run_id: str = None) -> Dict[str, Dict[str, int]]:
+        """Task counts by kind and status, for one run or the whole queue."""
+        where, params = ('WHERE run_id = ?', (run_id,)) if run_id else ('', ())
+        stats = {}
+        for row in self.conn.execute(f"SELECT kind, status, COUNT(*) AS n FROM tasks {where} GROUP BY kind, status", params):
+            stats.setdefault(row['kind'], {})[row['status']] = row['n']
+        return stats
+
+
+class _Transaction:
+    """BEGIN IMMEDIATE ... COMMIT, rolled back on error."""
+
+    def __init__(self, conn: sqlite3.Connection):
+        self.conn = conn
+
+    def __enter__(self):
+        self.conn.execute('BEGIN IMMEDIATE')
+        return self.conn
+
+    def __exit__(self, exc_type, exc, tb):
+        self.conn.execute('ROLLBACK' if exc_type else 'COMMIT')
+        return False
+
+
+if __name__ == '__main__':
+    if len(sys.argv) not in (3, 4) or sys.argv[1] != 'stats':
+        print("Usage: python work_queue.py stats <database> [run_id]")
+        sys.exit(1)
+    queue = WorkQueue(sys.argv[2])
+    for kind, counts in sorted(queue.stats(sys.argv[3] if len(sys.argv) == 4 else None).items()):
+        print(f"{kind}: " + ', '.join(f"{status} {count}" for status, count in sorted(counts.items())))